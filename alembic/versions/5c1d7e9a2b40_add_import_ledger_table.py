@@ -0,0 +1,29 @@
+"""add import ledger table
+
+Revision ID: 5c1d7e9a2b40
+Revises: 0f034f02b3ed
+Create Date: 2026-10-18 10:12:04.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d7e9a2b40'
+down_revision = '0f034f02b3ed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('import_ledger',
+                    sa.Column('aoi_hash', sa.String(length=64), nullable=False),
+                    sa.Column('item_type_id', sa.String(length=50), nullable=False),
+                    sa.Column('acquired', sa.DateTime(), nullable=True),
+                    sa.Column('published', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('aoi_hash', 'item_type_id'))
+
+
+def downgrade() -> None:
+    op.drop_table('import_ledger')
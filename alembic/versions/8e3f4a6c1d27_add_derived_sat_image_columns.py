@@ -0,0 +1,46 @@
+"""add derived sat image columns
+
+Revision ID: 8e3f4a6c1d27
+Revises: 5c1d7e9a2b40
+Create Date: 2026-10-18 11:02:47.530911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3f4a6c1d27'
+down_revision = '5c1d7e9a2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sat_images', sa.Column('geom_3035',
+                                          geoalchemy2.types.Geometry(srid=3035, spatial_index=False),
+                                          nullable=True))
+    op.add_column('sat_images', sa.Column('lat', sa.Float(), nullable=True))
+    op.add_column('sat_images', sa.Column('lon', sa.Float(), nullable=True))
+    op.add_column('sat_images', sa.Column('area_sqkm', sa.Float(), nullable=True))
+
+    # backfill the images imported before the columns existed
+    op.execute("""
+        UPDATE sat_images
+        SET geom_3035 = ST_Transform(geom, 3035),
+            lat = ST_Y(centroid),
+            lon = ST_X(centroid),
+            area_sqkm = round((ST_Area(ST_Transform(geom, 3035)) / 1000000)::numeric, 3)
+        WHERE geom_3035 IS NULL
+    """)
+
+    op.create_index('idx_sat_images_geom_3035', 'sat_images', ['geom_3035'], postgresql_using='gist')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sat_images_geom_3035', table_name='sat_images', postgresql_using='gist')
+    op.drop_column('sat_images', 'area_sqkm')
+    op.drop_column('sat_images', 'lon')
+    op.drop_column('sat_images', 'lat')
+    op.drop_column('sat_images', 'geom_3035')
@@ -0,0 +1,36 @@
+"""add filtered images tables
+
+Revision ID: a6d2f9c3b871
+Revises: f3a8c5d2e914
+Create Date: 2026-10-18 14:22:40.913562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f9c3b871'
+down_revision = 'f3a8c5d2e914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('filter_sets',
+                    sa.Column('key', sa.String(length=64), nullable=False),
+                    sa.Column('created', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('key'),
+                    prefixes=['UNLOGGED'])
+    op.create_table('filtered_images',
+                    sa.Column('filter_key', sa.String(length=64), nullable=False),
+                    sa.Column('sat_image_id', sa.String(length=50), nullable=False),
+                    sa.Column('time_acquired', sa.DateTime(), nullable=False),
+                    sa.ForeignKeyConstraint(['filter_key'], ['filter_sets.key'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('filter_key', 'sat_image_id'),
+                    prefixes=['UNLOGGED'])
+
+
+def downgrade() -> None:
+    op.drop_table('filtered_images')
+    op.drop_table('filter_sets')
@@ -0,0 +1,31 @@
+"""drop sat images geom 3035
+
+Revision ID: a9c4e7f1b253
+Revises: f6b3d8e2a417
+Create Date: 2026-10-18 19:03:52.617284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e7f1b253'
+down_revision = 'f6b3d8e2a417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # no query reads the reprojected copy of the footprints, the measures are generated from geom
+    op.drop_index('idx_sat_images_geom_3035', table_name='sat_images', postgresql_using='gist')
+    op.drop_column('sat_images', 'geom_3035')
+
+
+def downgrade() -> None:
+    op.add_column('sat_images', sa.Column('geom_3035',
+                                          geoalchemy2.types.Geometry(srid=3035, spatial_index=False),
+                                          nullable=True))
+    op.execute('UPDATE sat_images SET geom_3035 = ST_Transform(geom, 3035)')
+    op.create_index('idx_sat_images_geom_3035', 'sat_images', ['geom_3035'], postgresql_using='gist')
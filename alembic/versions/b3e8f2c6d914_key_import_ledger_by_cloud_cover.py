@@ -0,0 +1,36 @@
+"""key import ledger by cloud cover
+
+Revision ID: b3e8f2c6d914
+Revises: a9c4e7f1b253
+Create Date: 2026-10-18 19:41:15.208376
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f2c6d914'
+down_revision = 'a9c4e7f1b253'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the time interval is no longer part of the key, keep the latest one per search
+    op.execute("""
+        DELETE FROM import_ledger
+        WHERE ctid NOT IN (
+            SELECT DISTINCT ON (aoi_hash, item_type_id, cc) ctid
+            FROM import_ledger
+            ORDER BY aoi_hash, item_type_id, cc, end_date DESC, start_date
+        )
+    """)
+    op.drop_constraint('import_ledger_pkey', 'import_ledger', type_='primary')
+    op.create_primary_key('import_ledger_pkey', 'import_ledger', ['aoi_hash', 'item_type_id', 'cc'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('import_ledger_pkey', 'import_ledger', type_='primary')
+    op.create_primary_key('import_ledger_pkey', 'import_ledger',
+                          ['aoi_hash', 'item_type_id', 'start_date', 'end_date', 'cc'])
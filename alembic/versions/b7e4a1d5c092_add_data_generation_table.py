@@ -0,0 +1,29 @@
+"""add data generation table
+
+Revision ID: b7e4a1d5c092
+Revises: a6d2f9c3b871
+Create Date: 2026-10-18 15:04:11.372815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4a1d5c092'
+down_revision = 'a6d2f9c3b871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('data_generation',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('generation', sa.Integer(), nullable=False),
+                    sa.Column('updated', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.execute('INSERT INTO data_generation (id, generation, updated) VALUES (1, 1, now())')
+
+
+def downgrade() -> None:
+    op.drop_table('data_generation')
@@ -0,0 +1,46 @@
+"""add footprint unions table
+
+Revision ID: c38f6e2a9d17
+Revises: b7e4a1d5c092
+Create Date: 2026-10-18 15:47:52.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision = 'c38f6e2a9d17'
+down_revision = 'b7e4a1d5c092'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('footprint_unions',
+                    sa.Column('country_iso', sa.String(length=3), nullable=False),
+                    sa.Column('sat_id', sa.String(length=50), nullable=False),
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('cc_bucket', sa.Integer(), nullable=False),
+                    sa.Column('geom', geoalchemy2.types.Geometry(geometry_type='MULTIPOLYGON', srid=4326,
+                                                                 spatial_index=False), nullable=False),
+                    sa.ForeignKeyConstraint(['country_iso'], ['countries.iso'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['sat_id'], ['satellites.id']),
+                    sa.PrimaryKeyConstraint('country_iso', 'sat_id', 'day', 'cc_bucket'))
+    op.create_index('idx_footprint_unions_geom', 'footprint_unions', ['geom'], postgresql_using='gist')
+
+    op.execute("""
+        INSERT INTO footprint_unions (country_iso, sat_id, day, cc_bucket, geom)
+        SELECT sat_images_countries.country_iso, sat_images.sat_id,
+               CAST(sat_images.time_acquired AS DATE),
+               CAST(ceil(round(CAST(sat_images.cloud_cover * 10 AS NUMERIC), 6)) AS INTEGER),
+               ST_Multi(ST_Union(sat_images.geom))
+        FROM sat_images JOIN sat_images_countries ON sat_images_countries.sat_image_id = sat_images.id
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_footprint_unions_geom', table_name='footprint_unions', postgresql_using='gist')
+    op.drop_table('footprint_unions')
@@ -0,0 +1,73 @@
+"""add sat image link tables
+
+Revision ID: c4b2e8f05a13
+Revises: 8e3f4a6c1d27
+Create Date: 2026-10-18 11:48:12.204573
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4b2e8f05a13'
+down_revision = '8e3f4a6c1d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sat_images_countries',
+                    sa.Column('sat_image_id', sa.String(length=50), nullable=False),
+                    sa.Column('country_iso', sa.String(length=3), nullable=False),
+                    sa.ForeignKeyConstraint(['sat_image_id'], ['sat_images.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['country_iso'], ['countries.iso'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('sat_image_id', 'country_iso'))
+    op.create_index(op.f('ix_sat_images_countries_country_iso'),
+                    'sat_images_countries', ['country_iso'], unique=False)
+
+    op.create_table('sat_images_cities',
+                    sa.Column('sat_image_id', sa.String(length=50), nullable=False),
+                    sa.Column('city_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['sat_image_id'], ['sat_images.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('sat_image_id', 'city_id'))
+    op.create_index(op.f('ix_sat_images_cities_city_id'),
+                    'sat_images_cities', ['city_id'], unique=False)
+
+    op.create_table('sat_images_land_cover',
+                    sa.Column('sat_image_id', sa.String(length=50), nullable=False),
+                    sa.Column('land_cover_class_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['sat_image_id'], ['sat_images.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['land_cover_class_id'], ['land_cover_classes.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('sat_image_id', 'land_cover_class_id'))
+    op.create_index(op.f('ix_sat_images_land_cover_land_cover_class_id'),
+                    'sat_images_land_cover', ['land_cover_class_id'], unique=False)
+
+    # link the images imported before the tables existed
+    op.execute("""
+        INSERT INTO sat_images_countries (sat_image_id, country_iso)
+        SELECT sat_images.id, countries.iso
+        FROM sat_images JOIN countries ON ST_Intersects(countries.geom, sat_images.geom)
+    """)
+    op.execute("""
+        INSERT INTO sat_images_cities (sat_image_id, city_id)
+        SELECT sat_images.id, cities.id
+        FROM sat_images JOIN cities
+        ON ST_Intersects(ST_Transform(ST_Buffer(ST_Transform(cities.geom, 3035), 30000), 4326), sat_images.geom)
+    """)
+    op.execute("""
+        INSERT INTO sat_images_land_cover (sat_image_id, land_cover_class_id)
+        SELECT sat_images.id, land_cover_classes.id
+        FROM sat_images JOIN land_cover_classes ON ST_Intersects(land_cover_classes.geom, sat_images.geom)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_sat_images_land_cover_land_cover_class_id'), table_name='sat_images_land_cover')
+    op.drop_table('sat_images_land_cover')
+    op.drop_index(op.f('ix_sat_images_cities_city_id'), table_name='sat_images_cities')
+    op.drop_table('sat_images_cities')
+    op.drop_index(op.f('ix_sat_images_countries_country_iso'), table_name='sat_images_countries')
+    op.drop_table('sat_images_countries')
@@ -0,0 +1,55 @@
+"""add city buffers table
+
+Revision ID: d4f1b8a7e350
+Revises: c38f6e2a9d17
+Create Date: 2026-10-18 16:32:08.215907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f1b8a7e350'
+down_revision = 'c38f6e2a9d17'
+branch_labels = None
+depends_on = None
+
+# radius of the buffer the existing city links were computed with
+CITY_BUFFER_RADIUS = 30000
+
+
+def upgrade() -> None:
+    op.create_table('city_buffers',
+                    sa.Column('city_id', sa.Integer(), nullable=False),
+                    sa.Column('radius', sa.Integer(), nullable=False),
+                    sa.Column('geom', geoalchemy2.types.Geometry(geometry_type='POLYGON', srid=4326,
+                                                                 spatial_index=False), nullable=False),
+                    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('city_id', 'radius'))
+    op.create_index('idx_city_buffers_geom', 'city_buffers', ['geom'], postgresql_using='gist')
+
+    op.execute(f"""
+        INSERT INTO city_buffers (city_id, radius, geom)
+        SELECT id, {CITY_BUFFER_RADIUS},
+               ST_Transform(ST_Buffer(ST_Transform(geom, 3035), {CITY_BUFFER_RADIUS}), 4326)
+        FROM cities
+    """)
+
+    op.add_column('sat_images_cities',
+                  sa.Column('radius', sa.Integer(), nullable=False,
+                            server_default=str(CITY_BUFFER_RADIUS)))
+    op.alter_column('sat_images_cities', 'radius', server_default=None)
+    op.drop_constraint('sat_images_cities_pkey', 'sat_images_cities', type_='primary')
+    op.create_primary_key('sat_images_cities_pkey', 'sat_images_cities',
+                          ['sat_image_id', 'city_id', 'radius'])
+
+
+def downgrade() -> None:
+    op.execute(f'DELETE FROM sat_images_cities WHERE radius <> {CITY_BUFFER_RADIUS}')
+    op.drop_constraint('sat_images_cities_pkey', 'sat_images_cities', type_='primary')
+    op.create_primary_key('sat_images_cities_pkey', 'sat_images_cities', ['sat_image_id', 'city_id'])
+    op.drop_column('sat_images_cities', 'radius')
+    op.drop_index('idx_city_buffers_geom', table_name='city_buffers', postgresql_using='gist')
+    op.drop_table('city_buffers')
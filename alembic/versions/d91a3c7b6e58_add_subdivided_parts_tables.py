@@ -0,0 +1,61 @@
+"""add subdivided parts tables
+
+Revision ID: d91a3c7b6e58
+Revises: c4b2e8f05a13
+Create Date: 2026-10-18 12:21:39.771046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import geoalchemy2
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91a3c7b6e58'
+down_revision = 'c4b2e8f05a13'
+branch_labels = None
+depends_on = None
+
+SUBDIVIDE_MAX_VERTICES = 256
+
+
+def upgrade() -> None:
+    op.create_table('country_parts',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('country_iso', sa.String(length=3), nullable=False),
+                    sa.Column('geom', geoalchemy2.types.Geometry(srid=4326, spatial_index=False),
+                              nullable=False),
+                    sa.ForeignKeyConstraint(['country_iso'], ['countries.iso'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index(op.f('ix_country_parts_country_iso'), 'country_parts', ['country_iso'], unique=False)
+    op.create_index('idx_country_parts_geom', 'country_parts', ['geom'], postgresql_using='gist')
+
+    op.create_table('land_cover_parts',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('land_cover_class_id', sa.Integer(), nullable=False),
+                    sa.Column('geom', geoalchemy2.types.Geometry(srid=4326, spatial_index=False),
+                              nullable=False),
+                    sa.ForeignKeyConstraint(['land_cover_class_id'], ['land_cover_classes.id'],
+                                            ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index(op.f('ix_land_cover_parts_land_cover_class_id'),
+                    'land_cover_parts', ['land_cover_class_id'], unique=False)
+    op.create_index('idx_land_cover_parts_geom', 'land_cover_parts', ['geom'], postgresql_using='gist')
+
+    op.execute(f"""
+        INSERT INTO country_parts (country_iso, geom)
+        SELECT iso, ST_Subdivide(geom, {SUBDIVIDE_MAX_VERTICES}) FROM countries
+    """)
+    op.execute(f"""
+        INSERT INTO land_cover_parts (land_cover_class_id, geom)
+        SELECT id, ST_Subdivide(geom, {SUBDIVIDE_MAX_VERTICES}) FROM land_cover_classes
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_land_cover_parts_geom', table_name='land_cover_parts', postgresql_using='gist')
+    op.drop_index(op.f('ix_land_cover_parts_land_cover_class_id'), table_name='land_cover_parts')
+    op.drop_table('land_cover_parts')
+    op.drop_index('idx_country_parts_geom', table_name='country_parts', postgresql_using='gist')
+    op.drop_index(op.f('ix_country_parts_country_iso'), table_name='country_parts')
+    op.drop_table('country_parts')
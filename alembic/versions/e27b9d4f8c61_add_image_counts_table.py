@@ -0,0 +1,44 @@
+"""add image counts table
+
+Revision ID: e27b9d4f8c61
+Revises: d91a3c7b6e58
+Create Date: 2026-10-18 12:58:03.415902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27b9d4f8c61'
+down_revision = 'd91a3c7b6e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('image_counts',
+                    sa.Column('country_iso', sa.String(length=3), nullable=False),
+                    sa.Column('sat_id', sa.String(length=50), nullable=False),
+                    sa.Column('item_type_id', sa.String(length=50), nullable=False),
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('cc_bucket', sa.Integer(), nullable=False),
+                    sa.Column('total', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['country_iso'], ['countries.iso'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['sat_id'], ['satellites.id']),
+                    sa.ForeignKeyConstraint(['item_type_id'], ['item_types.id']),
+                    sa.PrimaryKeyConstraint('country_iso', 'sat_id', 'item_type_id', 'day', 'cc_bucket'))
+
+    op.execute("""
+        INSERT INTO image_counts (country_iso, sat_id, item_type_id, day, cc_bucket, total)
+        SELECT sat_images_countries.country_iso, sat_images.sat_id, sat_images.item_type_id,
+               CAST(sat_images.time_acquired AS DATE),
+               CAST(ceil(round(CAST(sat_images.cloud_cover * 10 AS NUMERIC), 6)) AS INTEGER),
+               count(*)
+        FROM sat_images JOIN sat_images_countries ON sat_images_countries.sat_image_id = sat_images.id
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('image_counts')
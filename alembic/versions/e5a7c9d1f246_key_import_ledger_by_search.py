@@ -0,0 +1,37 @@
+"""key import ledger by search
+
+Revision ID: e5a7c9d1f246
+Revises: d4f1b8a7e350
+Create Date: 2026-10-18 17:05:41.338120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f246'
+down_revision = 'd4f1b8a7e350'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the existing watermarks do not record the time interval and cloud cover they
+    # cover, the next run of every search is a full scan again
+    op.execute('DELETE FROM import_ledger')
+    op.add_column('import_ledger', sa.Column('start_date', sa.Date(), nullable=False))
+    op.add_column('import_ledger', sa.Column('end_date', sa.Date(), nullable=False))
+    op.add_column('import_ledger', sa.Column('cc', sa.Float(), nullable=False))
+    op.drop_constraint('import_ledger_pkey', 'import_ledger', type_='primary')
+    op.create_primary_key('import_ledger_pkey', 'import_ledger',
+                          ['aoi_hash', 'item_type_id', 'start_date', 'end_date', 'cc'])
+
+
+def downgrade() -> None:
+    op.execute('DELETE FROM import_ledger')
+    op.drop_constraint('import_ledger_pkey', 'import_ledger', type_='primary')
+    op.create_primary_key('import_ledger_pkey', 'import_ledger', ['aoi_hash', 'item_type_id'])
+    op.drop_column('import_ledger', 'cc')
+    op.drop_column('import_ledger', 'end_date')
+    op.drop_column('import_ledger', 'start_date')
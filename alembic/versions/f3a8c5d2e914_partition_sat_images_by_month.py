@@ -0,0 +1,93 @@
+"""partition sat images by month
+
+Revision ID: f3a8c5d2e914
+Revises: e27b9d4f8c61
+Create Date: 2026-10-18 13:41:27.508163
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c5d2e914'
+down_revision = 'e27b9d4f8c61'
+branch_labels = None
+depends_on = None
+
+LINK_TABLES = ['sat_images_countries', 'sat_images_cities', 'sat_images_land_cover']
+INDEXES = """
+    CREATE INDEX ix_sat_images_id ON sat_images (id);
+    CREATE INDEX ix_sat_images_cloud_cover ON sat_images (cloud_cover);
+    CREATE INDEX ix_sat_images_time_acquired ON sat_images (time_acquired);
+    CREATE INDEX idx_sat_images_geom ON sat_images USING gist (geom);
+    CREATE INDEX idx_sat_images_centroid ON sat_images USING gist (centroid);
+    CREATE INDEX idx_sat_images_geom_3035 ON sat_images USING gist (geom_3035);
+"""
+
+
+def _rename_old_table():
+    # the unique constraint of a partitioned table has to include the partition key,
+    # so the link tables can no longer reference sat_images.id
+    for table in LINK_TABLES:
+        op.drop_constraint(f'{table}_sat_image_id_fkey', table, type_='foreignkey')
+    op.rename_table('sat_images', 'sat_images_old')
+    op.execute('ALTER TABLE sat_images_old RENAME CONSTRAINT sat_images_pkey TO sat_images_old_pkey')
+    op.execute("""
+        DROP INDEX ix_sat_images_id, ix_sat_images_cloud_cover, ix_sat_images_time_acquired,
+                   idx_sat_images_geom, idx_sat_images_centroid, idx_sat_images_geom_3035
+    """)
+
+
+def upgrade() -> None:
+    _rename_old_table()
+    op.execute("""
+        CREATE TABLE sat_images (
+            LIKE sat_images_old INCLUDING DEFAULTS,
+            PRIMARY KEY (id, time_acquired),
+            FOREIGN KEY (sat_id) REFERENCES satellites (id),
+            FOREIGN KEY (item_type_id) REFERENCES item_types (id)
+        ) PARTITION BY RANGE (time_acquired)
+    """)
+    op.execute('CREATE TABLE sat_images_default PARTITION OF sat_images DEFAULT')
+
+    months = op.get_bind().execute(sa.text("""
+        SELECT DISTINCT CAST(date_trunc('month', time_acquired) AS DATE) FROM sat_images_old
+    """)).scalars().all()
+    for month in months:
+        end = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+        op.execute(f"""
+            CREATE TABLE sat_images_y{month.year:04d}m{month.month:02d} PARTITION OF sat_images
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')
+        """)
+
+    op.execute(INDEXES)
+    op.execute('INSERT INTO sat_images SELECT * FROM sat_images_old')
+    op.drop_table('sat_images_old')
+
+
+def downgrade() -> None:
+    op.rename_table('sat_images', 'sat_images_old')
+    op.execute('ALTER TABLE sat_images_old RENAME CONSTRAINT sat_images_pkey TO sat_images_old_pkey')
+    op.execute("""
+        DROP INDEX ix_sat_images_id, ix_sat_images_cloud_cover, ix_sat_images_time_acquired,
+                   idx_sat_images_geom, idx_sat_images_centroid, idx_sat_images_geom_3035
+    """)
+    op.execute("""
+        CREATE TABLE sat_images (
+            LIKE sat_images_old INCLUDING DEFAULTS,
+            PRIMARY KEY (id),
+            FOREIGN KEY (sat_id) REFERENCES satellites (id),
+            FOREIGN KEY (item_type_id) REFERENCES item_types (id)
+        )
+    """)
+    op.execute(INDEXES)
+    op.execute("""
+        INSERT INTO sat_images SELECT DISTINCT ON (id) * FROM sat_images_old ORDER BY id, time_acquired
+    """)
+    op.execute('DROP TABLE sat_images_old CASCADE')
+
+    for table in LINK_TABLES:
+        op.execute(f'DELETE FROM {table} WHERE sat_image_id NOT IN (SELECT id FROM sat_images)')
+        op.create_foreign_key(f'{table}_sat_image_id_fkey', table, 'sat_images',
+                              ['sat_image_id'], ['id'], ondelete='CASCADE')
@@ -0,0 +1,37 @@
+"""generate sat image measures
+
+Revision ID: f6b3d8e2a417
+Revises: e5a7c9d1f246
+Create Date: 2026-10-18 18:12:36.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b3d8e2a417'
+down_revision = 'e5a7c9d1f246'
+branch_labels = None
+depends_on = None
+
+CENTROID_4326 = 'ST_Transform(ST_Centroid(ST_Transform(geom, 3035)), 4326)'
+MEASURES = {
+    'lat': 'ST_Y({})'.format(CENTROID_4326),
+    'lon': 'ST_X({})'.format(CENTROID_4326),
+    'area_sqkm': 'round(CAST(ST_Area(ST_Transform(geom, 3035)) / 1000000 AS numeric), 3)',
+}
+
+
+def upgrade() -> None:
+    # a plain column can not be altered into a generated one,
+    # the re-added columns are computed for the existing images on the table rewrite
+    for name, expression in MEASURES.items():
+        op.drop_column('sat_images', name)
+        op.add_column('sat_images', sa.Column(name, sa.Float(),
+                                              sa.Computed(expression, persisted=True)))
+
+
+def downgrade() -> None:
+    for name, expression in MEASURES.items():
+        op.execute(f'ALTER TABLE sat_images ALTER COLUMN {name} DROP EXPRESSION')
@@ -45,6 +45,72 @@ def arguments(argv=None):
         default=1.0,
         help="Cloud cover value to be used for filtering. Defaults to 1.0")
 
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        required=False,
+        default=500,
+        help="Optional. Number of image features written to PostGIS per transaction. Defaults to 500."
+        "\nSet to 0 to write every feature in its own transaction.")
+
+    parser.add_argument(
+        "--time_shards",
+        type=int,
+        required=False,
+        default=1,
+        help="Optional. Amount of day aligned sub-windows the time interval is split in,"
+        " they are searched concurrently. Defaults to 1.")
+
+    parser.add_argument(
+        "--tiles",
+        type=int,
+        required=False,
+        default=1,
+        help="Optional. Amount of grid cells per side the AOI is split in,"
+        " the tiles are searched concurrently. Defaults to 1.")
+
+    parser.add_argument(
+        "--max_tile_depth",
+        type=int,
+        required=False,
+        default=0,
+        help="Optional. Max amount of times a tile with more than one page of results"
+        " is split into quadrants. Defaults to 0.")
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=4,
+        help="Optional. Max amount of concurrent searches. Defaults to 4.")
+
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        required=False,
+        default=2,
+        help="Optional. Amount of threads parsing the found features. Defaults to 2.")
+
+    parser.add_argument(
+        "--write_workers",
+        type=int,
+        required=False,
+        default=2,
+        help="Optional. Amount of threads writing batches to PostGIS. Defaults to 2.")
+
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        required=False,
+        default=1000,
+        help="Optional. Max amount of features waiting between pipeline stages. Defaults to 1000.")
+
+    parser.add_argument(
+        "--full_scan",
+        action='store_true',
+        help="Optional. Ignore the import ledger and search the whole time interval"
+        " instead of only the items published since the last import.")
+
     return parser.parse_args(argv)
 
 
@@ -52,6 +118,18 @@ def args_validate(args):
     if pd.to_datetime(args.end_date) < pd.to_datetime(args.start_date):
         raise ValueError('The end date can not be before the start date')
 
+    if args.batch_size < 0:
+        raise ValueError('The batch size can not be negative')
+
+    if args.time_shards < 1 or args.tiles < 1 or args.workers < 1:
+        raise ValueError('The amount of time shards, tiles and workers must be at least 1')
+
+    if args.parse_workers < 1 or args.write_workers < 1 or args.queue_size < 1:
+        raise ValueError('The amount of parse workers, write workers and the queue size must be at least 1')
+
+    if args.max_tile_depth < 0:
+        raise ValueError('The max tile depth can not be negative')
+
     if not args.api_key:
         try:
             args.api_key = os.environ["PL_API_KEY"]
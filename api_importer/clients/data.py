@@ -2,23 +2,47 @@ import requests
 import os
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
-from shapely.geometry import shape
+from shapely.geometry import shape, box, mapping, MultiPolygon
 from geoalchemy2.shape import from_shape
 import pandas as pd
 import json
+import itertools
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 from config import LOGGER
 from database import db
 
 
-class MissingAPIKeyException(BaseException):
-    pass
+ITEM_TYPES = [
+    'Landsat8L1G',
+    'MOD09GA',
+    'MOD09GQ',
+    'MYD09GA',
+    'MYD09GQ',
+    'PSOrthoTile',
+    'PSScene',
+    'REOrthoTile',
+    'REScene',
+    'Sentinel1',
+    'Sentinel2L1C',
+    'SkySatCollect',
+    'SkySatScene',
+    'SkySatVideo']
 
+# amount of most recent feature ids remembered for deduplicating a result stream
+DEDUPE_WINDOW = 10000
 
-def _get_client(client):
-    if client is None:
-        client = DataAPIClient()
-    return client
+# an earlier import of an AOI and item type, every item acquired from start_date until
+# end_date in ISO (YYYY-MM-DD) format and published before published was imported
+Watermark = namedtuple('Watermark', ['start_date', 'end_date', 'published'])
+
+
+class MissingAPIKeyException(BaseException):
+    pass
 
 
 class DataAPIClient(object):
@@ -29,11 +53,13 @@ class DataAPIClient(object):
 
     base_url = "https://api.planet.com/data/v1"
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, pool_maxsize=10):
         """
         :param str api_key:
             Your Planet API key. If not specified, this will be read from the
             PL_API_KEY environment variable.
+        :param int pool_maxsize:
+            Max amount of connections kept open, should match the amount of concurrent searches.
         """
         if api_key is None:
             api_key = os.environ['PL_API_KEY']
@@ -47,7 +73,7 @@ class DataAPIClient(object):
         self.session.auth = (api_key, '')
 
         retries = Retry(total=5, backoff_factor=0.2, status_forcelist=[429, 503])
-        self.session.mount('https://', HTTPAdapter(max_retries=retries))
+        self.session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
 
     def _url(self, endpoint):
         return '{}/{}'.format(self.base_url, endpoint)
@@ -65,8 +91,8 @@ class DataAPIClient(object):
     def _item(self, endpoint, **params):
         return self._get(self._url(endpoint), **params)
 
-    def _payload(self, item_types, start_date, end_date, cc, geometry):
-        """Create search payload with geometry, cloud filter and TOI """
+    def _payload(self, item_types, start_date, end_date, cc, geometry, published_after=None):
+        """Create search payload with geometry, cloud filter and TOI, optionally only for items published since a watermark """
 
         date_range_filter = {
             "type": "DateRangeFilter",
@@ -90,9 +116,20 @@ class DataAPIClient(object):
             "field_name": "geometry",
             "config": geometry}
 
+        filters = [date_range_filter, cloud_filter, geometry_filter]
+
+        if published_after:
+            filters.append({
+                "type": "DateRangeFilter",
+                "field_name": "published",
+                "config": {
+                    "gte": published_after
+                }
+            })
+
         and_filter = {
             "type": "AndFilter",
-            "config": [date_range_filter, cloud_filter, geometry_filter]
+            "config": filters
         }
 
         search_request = {
@@ -101,21 +138,33 @@ class DataAPIClient(object):
         }
         return search_request
 
-    def _query(self, endpoint, key, json_query):
-        """Post and then get for pagination."""
+    def iter_pages(self, endpoint, json_query):
+        """
+        Post and then get for pagination.
+        Yields every result page as soon as it is downloaded,
+        the next page is only requested when the consumer asks for it.
+
+        :param str endpoint
+            Search endpoint to post the query to.
+        :param dict json_query
+            Search request payload.
+        """
 
         url = self._url(endpoint)
         page = self._post(url, json_query)
-        features = page[key]
-
-        # # for testing, please ignore
-        # with open('tests/resources/fake_response_page.json', 'w') as f:
-        #     json.dump(page, f)
+        yield page
 
         while page['_links'].get('_next'):
             LOGGER.info('Paging results...')
             page_url = page['_links'].get('_next')
             page = self._get(page_url)
+            yield page
+
+    def _query(self, endpoint, key, json_query):
+        """Post and then get for pagination, returns the results of all pages in one list."""
+
+        features = []
+        for page in self.iter_pages(endpoint=endpoint, json_query=json_query):
             features += page[key]
 
         return features
@@ -139,13 +188,209 @@ class DataAPIClient(object):
         else:
             return [item for item in item_types]
 
+    def iter_aoi_features(self, aois, start_date, end_date,
+                          cc, item_types=None,
+                          time_shards=1, tiles=1, max_tile_depth=0, workers=4,
+                          published_after=None):
+        """
+        Streams the raw features of the quick search end-point with specified filters
+        for every AOI, all AOIs are searched through this client's session.
+        If no item_types provided, searches for all item_types.
+        Yields (aoi_id, feature) tuples page by page, a feature found for several
+        AOIs is only yielded for the AOI that returned it first.
+
+        The search can be sharded into sub-searches that are paged concurrently by at
+        most workers threads. Every AOI is a sub-search, with time_shards > 1 the time
+        interval is split into day aligned sub-windows, with tiles > 1 every AOI is
+        split into a tiles x tiles grid. A tile whose first page is not its last page
+        is split into quadrants again, up to max_tile_depth times. Results of all
+        sub-searches are merged in arrival order and deduplicated by id, also for
+        images crossing tile or AOI borders.
+
+        With published_after the part of the time interval an earlier import of the AOI
+        and item type covered is only searched for the items published since its watermark,
+        the rest of the time interval is fully searched. Item types sharing a watermark
+        share a sub-search.
+
+        :param dict aois
+            GeoJSON polygons to filter results by, keyed by AOI id.
+        :param str start_date
+            Start date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(gte)
+        :param str end_date
+            End date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(lte)
+        :param float cc
+            Max cloud cover value to filter results by (0.0 - 1.0).
+        :param list item_types
+            Item types to filter results by. Gets all available item_types if none provided.
+        :param int time_shards
+            Amount of sub-windows to split the time interval in.
+        :param int tiles
+            Amount of grid cells per side to split every AOI in.
+        :param int max_tile_depth
+            Max amount of times a dense tile is split into quadrants.
+        :param int workers
+            Max amount of sub-searches paged at the same time.
+        :param dict published_after
+            Per AOI id a dict of item type to ``Watermark``. Items acquired in its time
+            interval are only searched if published at or after its ISO timestamp.
+            Item types without a watermark are fully searched.
+        """
+
+        if not item_types:
+            item_types = ITEM_TYPES
+        published_after = published_after or {}
+
+        tasks = [_SearchTask(aoi=aoi, start_date=window[0], end_date=window[1], geometry=tile, depth=0,
+                             item_types=types, published_after=published)
+                 for aoi, geometry in aois.items()
+                 for watermark, types in _group_by_watermark(item_types, published_after.get(aoi, {}))
+                 for window_start, window_end, published in _watermark_windows(start_date, end_date,
+                                                                                watermark)
+                 for window in _time_windows(window_start, window_end, time_shards)
+                 for tile in _split_geometry(geometry, tiles)]
+
+        def search(task, submit):
+            pages = self._iter_search(task=task, cc=cc)
+            page = next(pages)
+
+            if page['_links'].get('_next') and task.depth < max_tile_depth:
+                quadrants = _split_geometry(task.geometry, 2)
+                if len(quadrants) > 1:
+                    LOGGER.info('Splitting dense tile into {} tiles'.format(len(quadrants)))
+                    for quadrant in quadrants:
+                        submit(task._replace(geometry=quadrant, depth=task.depth + 1))
+                    return
+
+            for page in itertools.chain([page], pages):
+                for feature in page['features']:
+                    yield task.aoi, feature
+
+        def feature_id(item):
+            return item[1]['id']
+
+        if len(tasks) == 1 and not max_tile_depth:
+            return _dedupe(search(tasks[0], submit=None), window=DEDUPE_WINDOW, key=feature_id)
+
+        LOGGER.info('Searching {} sub-searches with {} workers'.format(len(tasks), workers))
+
+        # results of different sub-searches interleave, so remember every id
+        return _dedupe(_run_concurrently(search, tasks, workers), key=feature_id)
+
+    def iter_features(self, start_date, end_date,
+                      cc, geometry, item_types=None,
+                      time_shards=1, tiles=1, max_tile_depth=0, workers=4):
+        """
+        Streams the raw features of the quick search end-point for a single AOI.
+        See ``iter_aoi_features`` for the sharding options.
+
+        :param str start_date
+            Start date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(gte)
+        :param str end_date
+            End date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(lte)
+        :param float cc
+            Max cloud cover value to filter results by (0.0 - 1.0).
+        :param dict geometry
+            A GeoJSON polygon to filter results by.
+        :param list item_types
+            Item types to filter results by. Gets all available item_types if none provided.
+        :param int time_shards
+            Amount of sub-windows to split the time interval in.
+        :param int tiles
+            Amount of grid cells per side to split every AOI in.
+        :param int max_tile_depth
+            Max amount of times a dense tile is split into quadrants.
+        :param int workers
+            Max amount of sub-searches paged at the same time.
+        """
+        features = self.iter_aoi_features(aois={None: geometry},
+                                          start_date=start_date,
+                                          end_date=end_date,
+                                          cc=cc,
+                                          item_types=item_types,
+                                          time_shards=time_shards,
+                                          tiles=tiles,
+                                          max_tile_depth=max_tile_depth,
+                                          workers=workers)
+        return (feature for _, feature in features)
+
+    def _iter_search(self, task, cc):
+        """Yields every page of a single quick search for the time window, geometry and item types of task."""
+
+        endpoint = 'quick-search'
+
+        payload = self._payload(start_date=task.start_date,
+                                end_date=task.end_date,
+                                cc=cc,
+                                geometry=task.geometry,
+                                item_types=task.item_types,
+                                published_after=task.published_after)
+
+        return self.iter_pages(endpoint=endpoint, json_query=payload)
+
+    def get_aoi_features(self, aois, start_date, end_date,
+                         cc, item_types=None,
+                         time_shards=1, tiles=1, max_tile_depth=0, workers=4,
+                         published_after=None):
+        """
+        Gets all features from quick search end-point with specified filters for every AOI.
+        If no item_types provided, searches for all item_types
+        Filters for unique features based on id, across all AOIs.
+        Yields (aoi_id, ``ImageDataFeature``) tuples while later pages are still being downloaded.
+
+        :param dict aois
+            GeoJSON polygons to filter results by, keyed by AOI id.
+        :param str start_date
+            Start date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(gte)
+        :param str end_date
+            End date of the time interval to filter search results by,
+            in ISO (YYYY-MM-DD)(lte)
+        :param float cc
+            Max cloud cover value to filter results by (0.0 - 1.0).
+        :param list item_types
+            Item types to filter results by. Gets all available item_types if none provided.
+        :param int time_shards
+            Amount of sub-windows to split the time interval in.
+        :param int tiles
+            Amount of grid cells per side to split every AOI in.
+        :param int max_tile_depth
+            Max amount of times a dense tile is split into quadrants.
+        :param int workers
+            Max amount of sub-searches paged at the same time.
+        :param dict published_after
+            Per AOI id a dict of item type to ISO timestamp, only items published
+            at or after it are searched.
+
+        """
+
+        total = 0
+        for aoi, feature in self.iter_aoi_features(aois=aois,
+                                                   start_date=start_date,
+                                                   end_date=end_date,
+                                                   cc=cc,
+                                                   item_types=item_types,
+                                                   time_shards=time_shards,
+                                                   tiles=tiles,
+                                                   max_tile_depth=max_tile_depth,
+                                                   workers=workers,
+                                                   published_after=published_after):
+            total += 1
+            yield aoi, ImageDataFeature(feature, client=self)
+
+        LOGGER.info('Found {} unique image features'.format(total))
+
     def get_features(self, start_date, end_date,
-                     cc, geometry, item_types=None):
+                     cc, geometry, item_types=None,
+                     time_shards=1, tiles=1, max_tile_depth=0, workers=4):
         """
         Gets all features from quick search end-point with specified filters.
         If no item_types provided, searches for all item_types
         Filters for unique features based on id.
-        Yields ``ImageDataFeature`` instances.
+        Yields ``ImageDataFeature`` instances while later pages are still being downloaded.
 
         :param str start_date
             Start date of the time interval to filter search results by, 
@@ -159,82 +404,328 @@ class DataAPIClient(object):
             A GeoJSON polygon to filter results by.
         :param list item_types
             Item types to filter results by. Gets all available item_types if none provided.
+        :param int time_shards
+            Amount of sub-windows to split the time interval in.
+        :param int tiles
+            Amount of grid cells per side to split every AOI in.
+        :param int max_tile_depth
+            Max amount of times a dense tile is split into quadrants.
+        :param int workers
+            Max amount of sub-searches paged at the same time.
 
         """
 
-        endpoint = 'quick-search'
-        key = 'features'
-        if not item_types:
-            item_types = [
-                'Landsat8L1G',
-                'MOD09GA',
-                'MOD09GQ',
-                'MYD09GA',
-                'MYD09GQ',
-                'PSOrthoTile',
-                'PSScene',
-                'REOrthoTile',
-                'REScene',
-                'Sentinel1',
-                'Sentinel2L1C',
-                'SkySatCollect',
-                'SkySatScene',
-                'SkySatVideo']
-
-        payload = self._payload(start_date=start_date,
-                                end_date=end_date,
-                                cc=cc,
-                                geometry=geometry,
-                                item_types=item_types)
+        features = self.get_aoi_features(aois={None: geometry},
+                                         start_date=start_date,
+                                         end_date=end_date,
+                                         cc=cc,
+                                         item_types=item_types,
+                                         time_shards=time_shards,
+                                         tiles=tiles,
+                                         max_tile_depth=max_tile_depth,
+                                         workers=workers)
+        for _, feature in features:
+            yield feature
 
-        features = self._query(endpoint=endpoint,
-                               json_query=payload,
-                               key=key)
 
-        # # for testing, please ignore
-        # with open('tests/resources/fake_response_small_aoi.json', 'w') as f:
-        #     json.dump(features, f)
+def _time_windows(start_date, end_date, shards):
+    """
+    Splits the time interval into at most shards consecutive day aligned windows.
+    Windows share their border dates, like the full interval they are gte/lte.
+
+    :param str start_date
+        Start date in ISO (YYYY-MM-DD) format.
+    :param str end_date
+        End date in ISO (YYYY-MM-DD) format.
+    :param int shards
+        Amount of windows to create.
 
-        features_unique = list({v['id']: v for v in features}.values())
+    returns list of (start_date, end_date) tuples in ISO (YYYY-MM-DD) format.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - start).days
+    shards = max(1, min(shards, days))
 
-        LOGGER.info('Found {} unique image features'.format(len(features_unique)))
+    borders = [start + timedelta(days=round(i * days / shards)) for i in range(shards + 1)]
+    return [(borders[i].strftime("%Y-%m-%d"), borders[i + 1].strftime("%Y-%m-%d"))
+            for i in range(shards)]
 
-        for feature in features_unique:
-            yield ImageDataFeature(feature)
+
+def _split_geometry(geometry, tiles):
+    """
+    Splits a GeoJSON geometry into the parts that fall in a tiles x tiles grid
+    over its bounding box. Grid cells that do not overlap the geometry are dropped.
+
+    :param dict geometry
+        A GeoJSON polygon or multipolygon.
+    :param int tiles
+        Amount of grid cells per side.
+
+    returns list of GeoJSON geometries.
+    """
+    if tiles <= 1:
+        return [geometry]
+
+    geom = shape(geometry)
+    min_x, min_y, max_x, max_y = geom.bounds
+    width = (max_x - min_x) / tiles
+    height = (max_y - min_y) / tiles
+
+    parts = []
+    for i in range(tiles):
+        for j in range(tiles):
+            cell = box(min_x + i * width, min_y + j * height,
+                       min_x + (i + 1) * width, min_y + (j + 1) * height)
+            part = _polygonal(geom.intersection(cell))
+            if not part.is_empty:
+                parts.append(mapping(part))
+    return parts
+
+
+def _polygonal(geom):
+    """Returns only the (multi)polygon parts of geom, an intersection can also produce lines and points."""
+    if geom.geom_type in ('Polygon', 'MultiPolygon'):
+        return geom
+    polygons = [g for g in getattr(geom, 'geoms', []) if g.geom_type == 'Polygon']
+    return MultiPolygon(polygons)
+
+
+def _group_by_watermark(item_types, watermarks):
+    """
+    Groups item types by their watermark, so item types with the same
+    watermark are searched together.
+
+    :param list item_types
+        Item types to search.
+    :param dict watermarks
+        ``Watermark`` per item type, item types without one get None.
+
+    returns list of (watermark, item_types) tuples.
+    """
+    groups = OrderedDict()
+    for item_type in item_types:
+        groups.setdefault(watermarks.get(item_type), []).append(item_type)
+    return list(groups.items())
+
+
+def _watermark_windows(start_date, end_date, watermark):
+    """
+    Splits the time interval into the part covered by the watermark, searched for the
+    items published since the watermark, and the parts before and after it, fully searched.
+    Windows share their border dates, like the full interval they are gte/lte.
+
+    :param str start_date
+        Start date in ISO (YYYY-MM-DD) format.
+    :param str end_date
+        End date in ISO (YYYY-MM-DD) format.
+    :param Watermark watermark
+        Earlier import of the searched item types, None searches the whole interval.
+
+    returns list of (start_date, end_date, published_after) tuples, published_after is None
+    for the fully searched windows.
+    """
+    if watermark is None:
+        return [(start_date, end_date, None)]
+
+    # ISO dates compare like the dates they represent
+    covered_start = max(start_date, watermark.start_date)
+    covered_end = min(end_date, watermark.end_date)
+    if covered_start >= covered_end:
+        return [(start_date, end_date, None)]
+
+    windows = []
+    if start_date < covered_start:
+        windows.append((start_date, covered_start, None))
+    windows.append((covered_start, covered_end, watermark.published))
+    if covered_end < end_date:
+        windows.append((covered_end, end_date, None))
+    return windows
+
+
+_SearchTask = namedtuple('_SearchTask', ['aoi', 'start_date', 'end_date', 'geometry', 'depth',
+                                         'item_types', 'published_after'])
+
+_ITEM, _ERROR, _DONE = range(3)
+
+
+def _run_concurrently(func, tasks, workers):
+    """
+    Iterates func(task, submit) for every task on workers threads and yields
+    the produced items in arrival order. func can call submit(task) to add
+    follow-up tasks, they are picked up by the same workers.
+    Items pass through a bounded queue, so a slow consumer blocks the workers
+    instead of letting results pile up in memory.
+    An exception raised by func is re-raised in the consumer.
+
+    :param function func
+        Called with a task and the submit function, returns an iterable of items.
+    :param list tasks
+        Tasks to call func with.
+    :param int workers
+        Max amount of tasks iterated at the same time.
+    """
+    pending = queue.Queue()
+    for task in tasks:
+        pending.put(task)
+
+    items = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    lock = threading.Lock()
+    unfinished = [pending.qsize()]
+
+    def submit(task):
+        with lock:
+            unfinished[0] += 1
+        pending.put(task)
+
+    def put(kind, value):
+        while not stop.is_set():
+            try:
+                items.put((kind, value), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def worker():
+        try:
+            while not stop.is_set():
+                try:
+                    task = pending.get(timeout=0.1)
+                except queue.Empty:
+                    with lock:
+                        if not unfinished[0]:
+                            return
+                    continue
+                try:
+                    for item in func(task, submit):
+                        if stop.is_set():
+                            return
+                        put(_ITEM, item)
+                finally:
+                    with lock:
+                        unfinished[0] -= 1
+        except Exception as e:
+            put(_ERROR, e)
+        finally:
+            put(_DONE, None)
+
+    workers = max(1, workers)
+    executor = ThreadPoolExecutor(workers)
+    for _ in range(workers):
+        executor.submit(worker)
+
+    try:
+        running = workers
+        while running:
+            kind, value = items.get()
+            if kind == _DONE:
+                running -= 1
+            elif kind == _ERROR:
+                raise value
+            else:
+                yield value
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def _to_timestamp(value):
+    return pd.to_datetime(value) if value is not None else None
+
+
+def _dedupe(features, window=None, key=None):
+    """
+    Yields the features with an id that was not yielded before.
+    With a window only the last window ids are remembered. Duplicates of a
+    single search only show up around page borders, so a bounded window
+    keeps memory flat for any amount of results.
+
+    :param iterable features
+        Raw features from the Data API.
+    :param int window
+        Amount of most recent ids to remember, remembers all ids if None.
+    :param function key
+        Returns the id of an item, defaults to the id of a raw feature.
+    """
+    seen = OrderedDict()
+    for feature in features:
+        feature_id = key(feature) if key else feature['id']
+        if feature_id in seen:
+            continue
+        seen[feature_id] = None
+        if window and len(seen) > window:
+            seen.popitem(last=False)
+        yield feature
 
 
 class ImageDataFeature:
     """
     Represents a image feature its metadata. 
     Imported from Planets Data API.
+    Only keeps the fields that are persisted, the raw API response is dropped after parsing.
     """
 
-    def __init__(self, image_feature, client=None):
+    __slots__ = ('id', 'sat_id', 'time_acquired', 'published', 'satellite', 'pixel_res',
+                 'item_type_id', 'asset_types', 'cloud_cover', 'clear_confidence_percent',
+                 'geom', 'client')
+
+    def __init__(self, image_feature, client=None, time_acquired=None, published=None):
         """
         :param dict image_feature:
             The JSON api response from the DataAPIClient
         :param DataAPIClient client:
-            A specific client instance to use. Will be created if not specified.
+            The client that found the feature, if any.
+        :param Timestamp time_acquired:
+            Already parsed acquired timestamp, parsed from image_feature if not specified.
+        :param Timestamp published:
+            Already parsed published timestamp, parsed from image_feature if not specified.
+        """
+        self.client = client
+
+        properties = image_feature["properties"]
+        self.id = str(image_feature["id"])
+        self.sat_id = str(properties["satellite_id"])
+        self.time_acquired = time_acquired if time_acquired is not None \
+            else pd.to_datetime(properties["acquired"])
+        self.published = published if published is not None \
+            else _to_timestamp(properties.get("published"))
+        self.satellite = str(properties["provider"]).title()
+        self.pixel_res = float(properties["pixel_resolution"])
+        self.item_type_id = str(properties["item_type"])
+        self.asset_types = list(image_feature["assets"])
+        self.cloud_cover = float(properties["cloud_cover"]) \
+            if "cloud_cover" in properties else 0.0
+        self.clear_confidence_percent = int(properties["clear_confidence_percent"]) \
+            if "clear_confidence_percent" in properties else 0
+        self.geom = shape(image_feature["geometry"])
+
+    @classmethod
+    def from_features(cls, image_features, client=None):
+        """
+        Parses a batch of features, the timestamps of all features are parsed at once.
+
+        :param list image_features:
+            JSON api responses from the DataAPIClient
+        :param DataAPIClient client:
+            The client that found the features, if any.
+
+        returns list of ``ImageDataFeature``
         """
-        self.client = _get_client(client)
-
-        for key, value in image_feature.items():
-            setattr(self, key, value)
-        self.id = str(self.id)
-        self.sat_id = str(self.properties["satellite_id"])
-        self.time_acquired = pd.to_datetime(self.properties["acquired"])
-        self.satellite = str(self.properties["provider"]).title()
-        self.pixel_res = float(self.properties["pixel_resolution"])
-        self.item_type_id = str(self.properties["item_type"])
-        self.asset_types = list(self.assets)
-        self.cloud_cover = float(self.properties["cloud_cover"]) \
-            if "cloud_cover" in self.properties else 0.0
-        self.clear_confidence_percent = int(self.properties["clear_confidence_percent"]) \
-            if "clear_confidence_percent" in self.properties else 0
-        self.geom = shape(self.geometry)
+        if not image_features:
+            return []
+
+        acquired = pd.to_datetime([f["properties"]["acquired"] for f in image_features],
+                                  utc=True, format='ISO8601')
+        published = pd.to_datetime([f["properties"].get("published") for f in image_features],
+                                   utc=True, format='ISO8601')
+
+        return [cls(feature, client=client,
+                    time_acquired=acquired[i],
+                    published=None if pd.isnull(published[i]) else published[i])
+                for i, feature in enumerate(image_features)]
 
     def to_dict(self):
-        return vars(self)
+        return {key: getattr(self, key) for key in self.__slots__ if key != 'client'}
 
     def to_satellite_model(self):
         satellite = db.Satellite(
@@ -255,6 +746,10 @@ class ImageDataFeature:
             item_type_id=self.item_type_id
         )
         db.sql_alch_commit(sat_image)
+        with db.session_scope() as session:
+            db.link_sat_images(session, [self.id])
+            db.refresh_footprint_unions(session, [self.id])
+            db.refresh_image_counts(session, [self.id])
 
     def to_item_asset_model(self):
         def get_asset_types():
@@ -268,3 +763,58 @@ class ImageDataFeature:
         for asset in get_asset_types():
             item_type.assets.append(asset)
         db.sql_alch_commit(item_type)
+
+
+def to_postgis_bulk(features):
+    """
+    Writes a batch of ``ImageDataFeature`` instances to PostGIS.
+    Collects the unique rows of every table in the batch and writes them
+    with one multi-row insert per table in a single transaction,
+    together with the country, city and land cover links of the new images
+    and their image counts and footprint unions.
+
+    :param list features
+        ImageDataFeature instances to write.
+    """
+    satellites = {}
+    item_types = {}
+    asset_types = set()
+    items_assets = set()
+    sat_images = {}
+
+    for feature in features:
+        satellites[feature.sat_id] = {
+            'id': feature.sat_id,
+            'name': feature.satellite,
+            'pixel_res': feature.pixel_res}
+        item_types[feature.item_type_id] = {
+            'id': feature.item_type_id,
+            'sat_id': feature.sat_id}
+        for asset_id in feature.asset_types:
+            asset_types.add(asset_id)
+            items_assets.add((feature.item_type_id, asset_id))
+        geom = from_shape(feature.geom, srid=4326)
+        sat_images[feature.id] = {
+            'id': feature.id,
+            'clear_confidence_percent': feature.clear_confidence_percent,
+            'cloud_cover': feature.cloud_cover,
+            'time_acquired': feature.time_acquired,
+            'centroid': geom,
+            'geom': geom,
+            'sat_id': feature.sat_id,
+            'item_type_id': feature.item_type_id}
+
+    with db.session_scope() as session:
+        # concurrent batches lock the new rows in the same order, they can not deadlock
+        db.bulk_insert(session, db.Satellite.__table__,
+                       [satellites[i] for i in sorted(satellites)])
+        db.bulk_insert(session, db.ItemType.__table__,
+                       [item_types[i] for i in sorted(item_types)])
+        db.bulk_insert(session, db.AssetType.__table__,
+                       [{'id': i} for i in sorted(asset_types)])
+        db.bulk_insert(session, db.items_assets,
+                       [{'item_id': i, 'asset_id': a} for i, a in sorted(items_assets)])
+        db.bulk_insert(session, db.SatImage.__table__, list(sat_images.values()))
+        db.link_sat_images(session, list(sat_images))
+        db.refresh_footprint_unions(session, list(sat_images))
+        db.refresh_image_counts(session, list(sat_images))
@@ -1,4 +1,7 @@
 from database import db
+import requests
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import shape
@@ -8,12 +11,6 @@ from config import LOGGER
 from database import db
 
 
-def _get_client(client):
-    if client is None:
-        client = GeojsonXYZClient()
-    return client
-
-
 class GeojsonXYZClient(object):
     """
     Base client for working with the geojson-xyz API
@@ -21,6 +18,16 @@ class GeojsonXYZClient(object):
     """
     base_url = "https://d2ad6b4ur7yvpq.cloudfront.net"
 
+    def __init__(self, pool_maxsize=10):
+        """
+        :param int pool_maxsize:
+            Max amount of connections kept open.
+        """
+        self.session = requests.Session()
+
+        retries = Retry(total=5, backoff_factor=0.2, status_forcelist=[429, 503])
+        self.session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
+
     def _url(self, endpoint):
         return '{}/{}'.format(self.base_url, endpoint)
 
@@ -38,7 +45,7 @@ class GeojsonXYZClient(object):
 
         LOGGER.info('{} countries found'.format(len(features)))
         for f in features:
-            yield CountryFeature(f)
+            yield CountryFeature(f, client=self)
 
     def get_cities(self):
         endpoint = "naturalearth-3.3.0/ne_50m_populated_places.geojson"
@@ -46,7 +53,7 @@ class GeojsonXYZClient(object):
             .to_dict(orient='records')
         LOGGER.info('{} cities found'.format(len(features)))
         for f in features:
-            yield CityFeature(f)
+            yield CityFeature(f, client=self)
 
     def get_rivers_lakes(self):
         endpoint = "naturalearth-3.3.0/ne_50m_rivers_lake_centerlines.geojson"
@@ -81,9 +88,9 @@ class CountryFeature:
         :param dict land_cover_feature:
             A dictionary containing metadata of a country feature.
         :param GeometryXYZClient client:
-            A specific client instance to use. Will be created if not specified.
+            The client that found the feature, if any.
         """
-        self.client = _get_client(client)
+        self.client = client
 
         for key, value in country_feature.items():
             setattr(self, key, value)
@@ -112,9 +119,9 @@ class CityFeature:
         :param dict land_cover_feature:
             A dictionary containing metadata of a city feature.
         :param GeometryXYZClient client:
-            A specific client instance to use. Will be created if not specified.
+            The client that found the feature, if any.
         """
-        self.client = _get_client(client)
+        self.client = client
 
         for key, value in city_feature.items():
             setattr(self, key, value)
@@ -0,0 +1,163 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import LOGGER
+
+
+class PipelineError(Exception):
+    """Raised by a ``Pipeline`` when one of its stages failed."""
+
+    def __init__(self, stage, error):
+        """
+        :param str stage
+            Name of the stage that failed.
+        :param Exception error
+            The exception raised in the stage.
+        """
+        super().__init__("Stage '{}' failed: {!r}".format(stage, error))
+        self.stage = stage
+        self.error = error
+
+
+_END = object()
+
+
+class Pipeline:
+    """
+    Runs a source iterable through stages of worker threads.
+    Stages are connected by bounded queues, a slow stage blocks the stages
+    and source before it instead of letting items pile up in memory.
+    Iterating the pipeline yields the results of the last stage in arrival order.
+    The first failing stage stops the pipeline and is raised as ``PipelineError``.
+    """
+
+    def __init__(self, source, name='source', maxsize=1000):
+        """
+        :param iterable source
+            Items fed into the first stage, iterated in its own thread.
+        :param str name
+            Name of the source stage used in errors.
+        :param int maxsize
+            Default max amount of items waiting in the queue after a stage.
+        """
+        self.source = source
+        self.name = name
+        self.maxsize = maxsize
+        self.stages = []
+
+    def add_stage(self, name, func, workers=1, batch_size=None, maxsize=None):
+        """
+        Adds a stage that calls func for every item of the previous stage.
+
+        :param str name
+            Name of the stage used in errors.
+        :param function func
+            Called with an item, or with a list of items if batch_size is set,
+            returns the item passed on to the next stage.
+        :param int workers
+            Amount of threads calling func.
+        :param int batch_size
+            Amount of items collected per worker before func is called with the list.
+        :param int maxsize
+            Max amount of results waiting for the next stage, defaults to the pipeline maxsize.
+
+        returns the pipeline, so stages can be chained.
+        """
+        self.stages.append((name, func, max(1, workers), batch_size, maxsize or self.maxsize))
+        return self
+
+    def __iter__(self):
+        stop = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.maxsize)] + \
+            [queue.Queue(maxsize=stage[4]) for stage in self.stages]
+
+        def fail(name, error):
+            if not errors:
+                LOGGER.error('Pipeline stage {} failed: {!r}'.format(name, error))
+                errors.append(PipelineError(name, error))
+            stop.set()
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def end(q, consumers):
+            for _ in range(consumers):
+                put(q, _END)
+
+        def consumers_of(index):
+            return self.stages[index][2] if index < len(self.stages) else 1
+
+        def run_source():
+            try:
+                for item in self.source:
+                    if not put(queues[0], item):
+                        break
+            except Exception as e:
+                fail(self.name, e)
+            finally:
+                close = getattr(self.source, 'close', None)
+                if close:
+                    close()
+                end(queues[0], consumers_of(0))
+
+        def run_stage(index, running):
+            name, func, workers, batch_size, _ = self.stages[index]
+            source, target = queues[index], queues[index + 1]
+            batch = []
+            try:
+                while True:
+                    item = get(source)
+                    if item is _END:
+                        break
+                    if not batch_size:
+                        put(target, func(item))
+                        continue
+                    batch.append(item)
+                    if len(batch) == batch_size:
+                        put(target, func(batch))
+                        batch = []
+                if batch and not stop.is_set():
+                    put(target, func(batch))
+            except Exception as e:
+                fail(name, e)
+            finally:
+                with running[1]:
+                    running[0] -= 1
+                    last = not running[0]
+                if last:
+                    end(target, consumers_of(index + 1))
+
+        executor = ThreadPoolExecutor(1 + sum(stage[2] for stage in self.stages))
+        try:
+            executor.submit(run_source)
+            for index, stage in enumerate(self.stages):
+                running = [stage[2], threading.Lock()]
+                for _ in range(stage[2]):
+                    executor.submit(run_stage, index, running)
+
+            while True:
+                item = get(queues[-1])
+                if item is _END:
+                    break
+                yield item
+            if errors:
+                raise errors[0] from errors[0].error
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
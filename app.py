@@ -2,20 +2,18 @@ import streamlit as st
 
 
 from app import maps, plots, query, filters
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from config import POSTGIS_URL
+from database import db
 
 APP_TITLE = "Planets Satellite Imagery"
 APP_SUB_TITLE = 'Source: Planet  https://developers.planet.com/docs/apis/data/'
 
 
-@st.experimental_singleton
 def app_db_session():
-    """Database session to use in app with streamlit caching decorator"""
-    engine = create_engine(POSTGIS_URL, echo=False)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """
+    Database session of the streamlit script thread. Sessions are not thread-safe,
+    every script thread gets its own session of the shared engine's pool.
+    """
+    return db.get_scoped_session()
 
 
 def main():
@@ -25,9 +23,11 @@ def main():
 
     session = app_db_session()
 
-    # small queries for filters
-    sat_name_list = query.query_distinct_satellite_names(session)
-    country_list = query.query_all_countries(session)
+    # small queries for filters, memoized until the next import
+    generation = db.get_data_generation(session)
+    sat_name_list = query.query_distinct_satellite_names(session, generation)
+    country_list = query.query_all_countries(session, generation)
+    radius_list = query.query_city_buffer_radii(session, generation)
 
     # add sidebar with filters
     sat_names = filters.display_sat_name_filter(sat_name_list)
@@ -35,26 +35,39 @@ def main():
     time_interval = filters.display_time_interval_filter()
     cloud_cover = filters.display_cloud_cover_filter()
     country_name = filters.display_country_filter(country_list=country_list)
+    radius = filters.display_city_buffer_filter(radius_list)
+    coverage_engine = filters.display_coverage_engine_filter()
+    if coverage_engine == 'Grid':
+        resolution = filters.display_grid_resolution_filter()
 
     # convert minute to proper offset alias
     if time_interval == 'Minute':
         time_interval = 'T'
 
-    # query postgis
-    gdf_images = query.query_sat_images_with_filter(_session=session,
-                                                    sat_names=sat_names,
-                                                    cloud_cover=cloud_cover,
-                                                    start_date=start_date,
-                                                    end_date=end_date,
-                                                    country_name=country_name)
-    lat_lon_lst = query.get_lat_lon_from_images(gdf_images)
+    # query postgis, the heat maps only need the image locations
+    df_points = query.query_image_points_with_filter(_session=session,
+                                                     sat_names=sat_names,
+                                                     cloud_cover=cloud_cover,
+                                                     start_date=start_date,
+                                                     end_date=end_date,
+                                                     country_name=country_name)
+    lat_lon_lst = query.get_lat_lon_from_images(df_points)
+
+    df_counts = query.query_image_counts(_session=session,
+                                         sat_names=sat_names,
+                                         cloud_cover=cloud_cover,
+                                         start_date=start_date,
+                                         end_date=end_date,
+                                         country_name=country_name)
+    total_images = int(df_counts['total'].sum())
 
     gdf_cities = query.query_cities_with_filters(_session=session,
                                                  sat_names=sat_names,
                                                  cloud_cover=cloud_cover,
                                                  start_date=start_date,
                                                  end_date=end_date,
-                                                 country_name=country_name)
+                                                 country_name=country_name,
+                                                 radius=radius)
 
     gdf_land_cover = query.query_land_cover_classes_with_filters(_session=session,
                                                                  sat_names=sat_names,
@@ -62,22 +75,39 @@ def main():
                                                                  start_date=start_date,
                                                                  end_date=end_date,
                                                                  country_name=country_name)
-    gdf_land_cover_coverage = query.query_land_cover_classes_with_filters_image_coverage(_session=session,
-                                                                                         sat_names=sat_names,
-                                                                                         cloud_cover=cloud_cover,
-                                                                                         start_date=start_date,
-                                                                                         end_date=end_date,
-                                                                                         country_name=country_name)
+    if coverage_engine == 'Grid':
+        gdf_land_cover_coverage = query.query_land_cover_grid_coverage(_session=session,
+                                                                       sat_names=sat_names,
+                                                                       cloud_cover=cloud_cover,
+                                                                       start_date=start_date,
+                                                                       end_date=end_date,
+                                                                       country_name=country_name,
+                                                                       resolution=resolution)
+    else:
+        gdf_land_cover_coverage = query.query_land_cover_classes_with_filters_image_coverage(_session=session,
+                                                                                             sat_names=sat_names,
+                                                                                             cloud_cover=cloud_cover,
+                                                                                             start_date=start_date,
+                                                                                             end_date=end_date,
+                                                                                             country_name=country_name)
     gdf_land_cover_dissolved = query.query_land_cover_geom_dissolved(_session=session,
                                                                      country_name=country_name)
-    if len(gdf_images.index) == 0:
+    if total_images == 0:
         st.write('No Images available for selected filters')
     else:
         st.subheader(
             f"What is the amount of Planets satellite imagery in {country_name} from {start_date} \
                 to {end_date} for {', '.join(sat_names)} satellites?")
-        st.write('Total Satellite Images: {}'.format(len(gdf_images.index)))
-        plots.plot_images_per_satellite(df_images=gdf_images)
+        st.write('Total Satellite Images: {}'.format(total_images))
+        plots.plot_images_per_satellite(df_counts=df_counts)
+
+        # the footprints are only read for the maps drawing them
+        gdf_images = query.query_sat_images_with_filter(_session=session,
+                                                        sat_names=sat_names,
+                                                        cloud_cover=cloud_cover,
+                                                        start_date=start_date,
+                                                        end_date=end_date,
+                                                        country_name=country_name)
 
         st.subheader(
             f"Which areas in {country_name} are most captured by {', '.join(sat_names)} satellites\
@@ -91,13 +121,13 @@ def main():
             f"When are areas in {country_name} most captured by {', '.join(sat_names)} satellites\
                  from {start_date} to {end_date}?")
         maps.heatmap_time_series(map=maps.create_basemap(lat_lon_list=lat_lon_lst),
-                                 gdf=gdf_images,
+                                 gdf=df_points,
                                  sat_name=sat_names,
                                  start_date=start_date,
                                  end_date=end_date,
                                  time_interval=time_interval)
         st.write(
-            f"Total images for each major city in {country_name} with 30km buffer radius \
+            f"Total images for each major city in {country_name} with {radius / 1000:g}km buffer radius \
                 from {start_date} to {end_date} for {', '.join(sat_names)} satellites")
 
         st.caption('This also displays cities near the borders due to the buffer polygon around the city\
@@ -127,6 +157,10 @@ def main():
 
         plots.plot_land_cover_image_coverage(gdf_land_cover_coverage)
 
+        if coverage_engine == 'Grid' and len(gdf_land_cover_coverage.index) > 0:
+            st.caption(f'Approximated on a {resolution} m grid, each percentage is off by at most \
+                {gdf_land_cover_coverage["error_percentage"].max()} percentage points')
+
         st.subheader(
             f"Where is the coverage of each land cover classification {country_name}\
                  from {start_date} to {end_date} for {', '.join(sat_names)} satellites?")
@@ -144,4 +178,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # returns the connection of the script thread's session to the pool
+        db.Session.remove()
@@ -0,0 +1,197 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from config import LOGGER, CACHE_DIR, CACHE_MAX_BYTES, CACHE_DISK_MAX_BYTES
+from database import db
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    '''
+    estimates the memory size of a (Geo)DataFrame, geometries count 16 bytes per coordinate.
+    '''
+    nbytes = int(df.memory_usage(index=True, deep=True).sum())
+    if isinstance(df, gpd.GeoDataFrame):
+        nbytes += int(shapely.get_num_coordinates(df.geometry.to_numpy()).sum()) * 16
+    return nbytes
+
+
+def _lists_from_arrays(df: pd.DataFrame) -> pd.DataFrame:
+    '''Parquet returns list columns as numpy arrays, the queries return lists.'''
+    for column in df.columns[df.dtypes == object]:
+        first = next((i for i in df[column] if i is not None), None)
+        if isinstance(first, np.ndarray):
+            df[column] = df[column].map(lambda i: i.tolist() if isinstance(i, np.ndarray) else i)
+    return df
+
+
+class ResultCache:
+    '''
+    Cache of query result frames with an in-memory LRU and Parquet files on disk,
+    both evicting the least recently used results beyond their byte limit.
+    The files are written atomically, so app replicas can share the directory.
+    '''
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES,
+                 disk_max_bytes=CACHE_DISK_MAX_BYTES):
+        '''
+        :param str directory
+            Directory of the Parquet files, disables the disk cache if None.
+        :param int max_bytes
+            Max estimated size of the results kept in memory.
+        :param int disk_max_bytes
+            Max size of the Parquet files.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        gets a copy of the cached frame of key, from memory or disk.
+
+        returns (Geo)DataFrame or None if not cached.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0].copy()
+
+        df = self._read(key)
+        if df is not None:
+            self._remember(key, df)
+            return df.copy()
+        return None
+
+    def put(self, key, df):
+        '''
+        caches df under key in memory and on disk.
+        '''
+        self._remember(key, df.copy())
+        self._write(key, df)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _remember(self, key, df):
+        nbytes = frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def _path(self, key, geo):
+        return os.path.join(self.directory, key + ('.geo.parquet' if geo else '.parquet'))
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+        for geo in (True, False):
+            path = self._path(key, geo)
+            try:
+                df = gpd.read_parquet(path) if geo else pd.read_parquet(path)
+            except (FileNotFoundError, OSError):
+                continue
+            os.utime(path)
+            return _lists_from_arrays(df)
+        return None
+
+    def _write(self, key, df):
+        if not self.directory:
+            return
+        geo = isinstance(df, gpd.GeoDataFrame)
+        path = self._path(key, geo)
+        tmp = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            LOGGER.warning('Could not write cached result {}: {!r}'.format(path, e))
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict_files()
+
+    def _evict_files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.parquet'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(i[1] for i in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+RESULT_CACHE = ResultCache()
+
+
+def cache_key(name, arguments, generation):
+    '''
+    sha256 hash of the function name, its arguments and the data generation.
+    '''
+    key = json.dumps([name, arguments, generation], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def cached(func=None, cache=None):
+    '''
+    Caches the (Geo)DataFrame results of a query function in the result cache.
+    Like streamlit's memo, arguments starting with an underscore are not part of the key,
+    the data generation read through the _session argument is.
+    '''
+    if func is None:
+        return functools.partial(cached, cache=cache)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result_cache = cache or RESULT_CACHE
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name: value for name, value in bound.arguments.items()
+                     if not name.startswith('_')}
+        generation = db.get_data_generation(bound.arguments['_session'])
+        key = cache_key(func.__qualname__, arguments, generation)
+
+        df = result_cache.get(key)
+        if df is not None:
+            return df
+        t1 = time.time()
+        df = func(*args, **kwargs)
+        result_cache.put(key, df)
+        LOGGER.info(f'cached {func.__name__} of generation {generation} '
+                    f'in {time.time() - t1} seconds')
+        return df
+
+    return wrapper
@@ -0,0 +1,136 @@
+import math
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# equal area projection the grid is laid out in
+GRID_CRS = 3035
+# finer grids take seconds for the footprints of a country
+GRID_RESOLUTIONS = [1000, 2000, 5000]
+# max cells tested at once, bounds the memory of the cell center coordinates
+RASTERIZE_BLOCK_CELLS = 2 ** 20
+
+
+def grid_axes(bounds: tuple, resolution: float) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    gets the x and y coordinates of the centers of the grid cells covering bounds.
+    '''
+    minx, miny, maxx, maxy = bounds
+    xs = np.arange(minx + resolution / 2, maxx + resolution / 2, resolution)
+    ys = np.arange(miny + resolution / 2, maxy + resolution / 2, resolution)
+    return xs, ys
+
+
+def rasterize(geom, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    '''
+    gets the boolean mask of the grid cells whose center lies in geom,
+    only the cells within the bounds of geom are tested, in blocks of rows.
+    '''
+    mask = np.zeros((len(ys), len(xs)), dtype=bool)
+    if geom is None or geom.is_empty:
+        return mask
+
+    minx, miny, maxx, maxy = geom.bounds
+    cols = slice(np.searchsorted(xs, minx), np.searchsorted(xs, maxx, side='right'))
+    first_row, last_row = np.searchsorted(ys, miny), np.searchsorted(ys, maxy, side='right')
+    block_rows = max(1, RASTERIZE_BLOCK_CELLS // max(1, cols.stop - cols.start))
+    shapely.prepare(geom)
+    for start in range(first_row, last_row, block_rows):
+        rows = slice(start, min(start + block_rows, last_row))
+        x, y = np.meshgrid(xs[cols], ys[rows])
+        mask[rows, cols] = shapely.contains_xy(geom, x, y)
+    return mask
+
+
+def rasterize_edge(geom, xs: np.ndarray, ys: np.ndarray, resolution: float) -> np.ndarray:
+    '''
+    gets the boolean mask of the grid cells within half a cell diagonal of the boundary of geom,
+    which includes every cell the boundary crosses.
+    '''
+    if geom is None or geom.is_empty:
+        return np.zeros((len(ys), len(xs)), dtype=bool)
+    return rasterize(geom.boundary.buffer(resolution * math.sqrt(2) / 2), xs, ys)
+
+
+def coverage_bound(covered: int, total: int, covered_edge: int, total_edge: int) -> float:
+    '''
+    gets the max difference in percentage points between the grid and the exact coverage.
+    The true covered and class area lie within the cell counts plus or minus their edge cells,
+    the bound is the furthest ratio within these intervals.
+    '''
+    coverage = covered / total
+    if total_edge >= total:
+        return 100.0
+    high = min(1.0, (covered + covered_edge) / (total - total_edge))
+    low = max(0.0, (covered - covered_edge) / (total + total_edge))
+    return 100 * max(high - coverage, coverage - low)
+
+
+def grid_coverage(gdf_land_cover: gpd.GeoDataFrame,
+                  gdf_footprints: gpd.GeoDataFrame,
+                  resolution: float = 1000) -> gpd.GeoDataFrame:
+    '''
+    Approximates the percentage of every land cover class covered by the footprints
+    on an equal area grid of resolution meters. A cell belongs to a geometry if its center
+    does, coverage is the amount of covered class cells per class cell.
+
+    A cell no boundary crosses lies completely in or outside of a geometry, so only the
+    cells crossed by the class boundary can be counted wrong for the class area, and only
+    the class cells crossed by the class or a footprint boundary for the covered area.
+    Bounding both areas by these cells gives the max error of the percentage compared to
+    the exact coverage in EPSG:3035, reported as error_percentage.
+
+    :param GeoDataFrame gdf_land_cover
+        Dissolved land cover class geometries with featureclass and geom columns.
+    :param GeoDataFrame gdf_footprints
+        Footprint geometries, e.g. the daily footprint unions.
+    :param float resolution
+        Size of the grid cells in meters.
+
+    returns GeoDataFrame with featureclass, coverage_percentage and error_percentage
+    of the classes covered by any footprint, with their part covered by the footprints as geom.
+    '''
+    columns = ['featureclass', 'geom', 'coverage_percentage', 'error_percentage']
+    if gdf_land_cover.empty or gdf_footprints.empty:
+        return gpd.GeoDataFrame(pd.DataFrame(columns=columns), geometry='geom',
+                                crs=gdf_land_cover.crs)
+
+    land_cover = gdf_land_cover.geometry.to_crs(GRID_CRS).to_numpy()
+    footprints = gdf_footprints.geometry.to_crs(GRID_CRS).to_numpy()
+    xs, ys = grid_axes(shapely.total_bounds(land_cover), resolution)
+
+    covered = np.zeros((len(ys), len(xs)), dtype=bool)
+    footprint_edge = np.zeros((len(ys), len(xs)), dtype=bool)
+    for footprint in footprints:
+        covered |= rasterize(footprint, xs, ys)
+        footprint_edge |= rasterize_edge(footprint, xs, ys, resolution)
+
+    # the covered part of every class is drawn, like the exact coverage
+    footprint_union = shapely.union_all(gdf_footprints.geometry.to_crs(gdf_land_cover.crs).to_numpy())
+
+    rows = []
+    for featureclass, geom, class_geom in zip(gdf_land_cover['featureclass'], land_cover,
+                                              gdf_land_cover.geometry.to_numpy()):
+        cells = rasterize(geom, xs, ys)
+        total = int(cells.sum())
+        if not total:
+            continue
+        hits = int((cells & covered).sum())
+        if not hits:
+            continue
+
+        class_edge = rasterize_edge(geom, xs, ys, resolution)
+        error = coverage_bound(covered=hits,
+                               total=total,
+                               covered_edge=int((class_edge | (footprint_edge & cells)).sum()),
+                               total_edge=int(class_edge.sum()))
+        rows.append({'featureclass': featureclass,
+                     'geom': shapely.intersection(class_geom, footprint_union),
+                     'coverage_percentage': round(100 * hits / total, 3),
+                     # rounded up, with the rounding of the coverage percentage
+                     'error_percentage': math.ceil(error * 1000 + 0.5) / 1000})
+
+    return gpd.GeoDataFrame(pd.DataFrame(rows, columns=columns), geometry='geom',
+                            crs=gdf_land_cover.crs)
@@ -2,7 +2,9 @@ import streamlit as st
 from datetime import datetime, timedelta
 import geopandas as gpd
 import pandas as pd
-from database.db import Country
+from app.coverage import GRID_RESOLUTIONS
+from app.query import CountryEntry
+from config import CITY_BUFFER_RADII
 
 def display_sat_name_filter(sat_name_list: list[str]) -> list[str]:
     return st.sidebar.multiselect('Satellite Providers', sat_name_list, default=sat_name_list)
@@ -19,7 +21,7 @@ def display_cloud_cover_filter() -> float:
     return st.sidebar.slider('Cloud Cover Threshold', 0.0, 1.0, step=0.1, value=1.0)
 
 
-def display_country_filter(country_list: list[Country]) -> str:
+def display_country_filter(country_list: list[CountryEntry]) -> str:
     country_names = [i.name for i in country_list]
     default_index = country_names.index('Germany')
     return st.sidebar.selectbox('Country', country_names, index=default_index)
@@ -29,6 +31,20 @@ def display_time_interval_filter():
     default_index = options_list.index('Hour')
     return st.sidebar.selectbox('Time Interval', options_list, index=default_index)
 
+def display_city_buffer_filter(radius_list: list[int]) -> int:
+    radius_list = radius_list or CITY_BUFFER_RADII
+    default = CITY_BUFFER_RADII[0]
+    default_index = radius_list.index(default) if default in radius_list else 0
+    return st.sidebar.selectbox('City Buffer Radius', radius_list, index=default_index,
+                                format_func=lambda radius: f'{radius / 1000:g} km')
+
+def display_coverage_engine_filter() -> str:
+    return st.sidebar.radio('Coverage Engine', ['Exact', 'Grid'], index=0,
+                            help='Grid approximates the land cover coverage on an equal area grid')
+
+def display_grid_resolution_filter() -> int:
+    return st.sidebar.select_slider('Grid Resolution (m)', GRID_RESOLUTIONS, value=1000)
+
 def filter_gdf_images(
     gdf_images: gpd.GeoDataFrame, start_date: datetime, end_date: datetime, sat_names: list[str], cloud_cover: float) -> gpd.GeoDataFrame:
     """filters the dataframe with set up streamlit filters"""
@@ -5,16 +5,14 @@ import pandas as pd
 import streamlit as st
 
 
-def plot_images_per_satellite(df_images: pd.DataFrame) -> st.plotly_chart:
+def plot_images_per_satellite(df_counts: pd.DataFrame) -> st.plotly_chart:
+    """plots the total images per satellite of the image counts (sat_name, total)"""
 
     # create fig to plot on
     fig = go.Figure()
 
-    for sat_name in df_images['sat_name'].unique():
-        df = df_images[df_images['sat_name'] == sat_name]
-        grouped_sat_df = df.groupby('sat_name').count()
-
-        fig.add_trace(go.Bar(x=grouped_sat_df.index, y=grouped_sat_df['id'], name=sat_name))
+    for sat_name, total in zip(df_counts['sat_name'], df_counts['total']):
+        fig.add_trace(go.Bar(x=[sat_name], y=[total], name=sat_name))
 
     fig.update_layout(title='Total amount of satellite images per satellite',
                       xaxis_title='Satellite',
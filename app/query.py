@@ -1,34 +1,285 @@
-from sqlalchemy import func, select
+from sqlalchemy import func, and_
 from sqlalchemy.orm import session
+from collections import namedtuple
+from dataclasses import dataclass
 import datetime
+import hashlib
+import json
 import geopandas as gpd
+import pandas as pd
 import streamlit as st
 import time
-from database.db import SatImage, Satellite, City, Country, LandCoverClass
-from shapely import wkb
+from app import cache, coverage
+from database import db
+from database.db import SatImage, Satellite, City, CityBuffer, Country, LandCoverClass, ImageCount, \
+    sat_images_cities, sat_images_land_cover, filtered_images
+import numpy as np
+import shapely
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.shape import to_shape
 
-from config import LOGGER
+from config import LOGGER, QUERY_CHUNK_SIZE, QUERY_TIMING, CITY_BUFFER_RADII
+
+WKB_DECODE_SLICE = 10000
+
+# country of the sidebar, bbox is (minx, miny, maxx, maxy) in EPSG:4326
+CountryEntry = namedtuple('CountryEntry', ['iso', 'name', 'bbox'])
+
+
+@dataclass(frozen=True)
+class FilterContext:
+    '''
+    The sidebar filters of a dashboard run. The sat images matching them are evaluated
+    once per key into the filtered_images table, the dashboard queries join against it.
+    '''
+    sat_names: tuple
+    cloud_cover: float
+    start_date: datetime.date
+    end_date: datetime.date
+    country_name: str
+
+    @property
+    def key(self) -> str:
+        """sha256 hash of the filters, independent of the order of the satellite names."""
+        filters = [sorted(self.sat_names), self.cloud_cover, str(self.start_date),
+                   str(self.end_date), self.country_name]
+        return hashlib.sha256(json.dumps(filters).encode('utf-8')).hexdigest()
+
+    def materialize(self) -> str:
+        """
+        stores the matching sat images if not stored yet and returns the key.
+        Runs in its own committed transaction, the app session is shared by the script threads
+        and the chunked reads run on their own connection.
+        """
+        with db.session_scope() as session:
+            db.materialize_filtered_images(session, self.key, list(self.sat_names), self.cloud_cover,
+                                           self.start_date, self.end_date, self.country_name)
+        return self.key
+
+
+def filter_context(sat_names: list,
+                   cloud_cover: float,
+                   start_date: datetime.date,
+                   end_date: datetime.date,
+                   country_name: str) -> FilterContext:
+    '''
+    gets the filter context of the filters with the matching sat images stored.
+    '''
+    context = FilterContext(tuple(sat_names), cloud_cover, start_date, end_date, country_name)
+    context.materialize()
+    return context
+
+
+def join_filtered_images(query, context: FilterContext, sat_image_id):
+    '''
+    restricts query to the sat images of the filter context, joined on sat_image_id.
+    '''
+    return query.join(filtered_images, and_(filtered_images.c.sat_image_id == sat_image_id,
+                                            filtered_images.c.filter_key == context.key))
+
+
+@st.experimental_memo
+def query_all_countries(_session: session.Session, generation: int) -> list[CountryEntry]:
+    '''
+    gets the iso, name and bounding box of all countries, their geometries are not loaded.
+    generation is the data generation, it only keys the memo so imports show up.
+    '''
+    box = func.Box2D(Country.geom)
+    query = _session.query(Country.iso, Country.name, func.ST_XMin(box), func.ST_YMin(box),
+                           func.ST_XMax(box), func.ST_YMax(box))\
+        .order_by(Country.name)
+    return [CountryEntry(iso, name, tuple(bbox)) for iso, name, *bbox in query]
 
 
 @st.experimental_memo
-def query_all_countries(_session: session.Session) -> list[str]:
-    query = _session.query(Country)
-    return [i for i in query]
+def query_country_geom(_session: session.Session, generation: int, iso: str):
+    '''
+    gets the geometry of the country with iso as shapely geometry, only queried once per iso
+    and data generation.
+    '''
+    geom = _session.query(Country.geom).filter(Country.iso == iso).scalar()
+    return to_shape(geom) if geom is not None else None
 
 
 @st.experimental_memo
-def query_distinct_satellite_names(_session: session.Session) -> list[str]:
+def query_distinct_satellite_names(_session: session.Session, generation: int) -> list[str]:
+    '''
+    gets the sorted names of all satellites, memoized per data generation.
+    '''
     query = _session.query(Satellite.name).distinct()
     return sorted([sat.name for sat in query])
 
 
+@st.experimental_memo
+def query_city_buffer_radii(_session: session.Session, generation: int) -> list[int]:
+    '''
+    gets the sorted radii of the city buffers, memoized per data generation.
+    '''
+    query = _session.query(CityBuffer.radius).distinct()
+    return sorted([i.radius for i in query])
+
+
+@cache.cached
+def query_image_counts(_session: session.Session,
+                       sat_names: list,
+                       cloud_cover: float,
+                       start_date: datetime.date,
+                       end_date: datetime.date,
+                       country_name: str) -> pd.DataFrame:
+    '''
+    gets the total images per satellite from the image counts with applied filters.
+    The counts are kept per day and cloud cover bucket of 0.1, filters at midnight of
+    end_date like the sat image queries.
+    '''
+    t1 = time.time()
+    subquery = _session.query(Country.iso).filter(
+        Country.name == country_name).scalar_subquery()
+
+    query = _session.query(Satellite.name.label('sat_name'),
+                           func.sum(ImageCount.total).label('total'))\
+        .join(Satellite, Satellite.id == ImageCount.sat_id)\
+        .filter(ImageCount.country_iso == subquery,
+                Satellite.name.in_(sat_names),
+                ImageCount.day >= start_date,
+                ImageCount.day < end_date,
+                ImageCount.cc_bucket <= round(cloud_cover * 10))\
+        .group_by(Satellite.name)\
+        .order_by(Satellite.name)
+
+    df = pd.read_sql(sql=query.statement, con=query.session.bind)
+    df['total'] = df['total'].astype(int)
+
+    t2 = time.time()
+    LOGGER.info(f'query image counts took {t2-t1} seconds')
+    return df
+
+
 def get_lat_lon_from_images(gdf_images: gpd.GeoDataFrame) -> list[tuple[float]]:
     """gets lon and lat for each row in gdf_images"""
     return [(x, y) for x, y in zip(gdf_images['lat'],
                                    gdf_images['lon'])]
 
 
-@st.experimental_memo
+def _wkb_bytes(value):
+    '''
+    unwraps the WKBElement GeoAlchemy returns for geometry columns of ORM statements and
+    copies the memoryview psycopg2 returns for bytea, shapely decodes neither.
+    '''
+    if isinstance(value, WKBElement):
+        value = value.data
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return value
+
+
+def to_geodataframe(df: pd.DataFrame, geom_col: str = 'geom', crs: int = 4326) -> gpd.GeoDataFrame:
+    '''
+    converts the binary WKB geometries of a query result to a GeoDataFrame,
+    all geometries are decoded in one vectorized call instead of row by row.
+    '''
+    values = df[geom_col].to_numpy()
+    geoms = np.empty(len(values), dtype=object)
+    # decoded in slices, so the bytes copies of only one slice are held at once
+    for start in range(0, len(values), WKB_DECODE_SLICE):
+        wkb = [_wkb_bytes(i) for i in values[start:start + WKB_DECODE_SLICE]]
+        geoms[start:start + WKB_DECODE_SLICE] = shapely.from_wkb(wkb)
+    df[geom_col] = gpd.GeoSeries(geoms, index=df.index, crs=crs)
+    return gpd.GeoDataFrame(df, geometry=geom_col, crs=crs)
+
+
+def read_geodataframe(sql, con, crs: int = 4326, chunksize: int = None, params: dict = None):
+    '''
+    reads the result of sql with the geometries in the geom column as binary WKB.
+    ORM statements return geometry columns as WKBElements of EWKB, raw SQL should select
+    ST_AsBinary(geom) AS geom. Returns an iterator of GeoDataFrames if chunksize is set.
+    '''
+    if chunksize:
+        return (to_geodataframe(df, crs=crs)
+                for df in pd.read_sql(sql=sql, con=con, chunksize=chunksize, params=params))
+    return to_geodataframe(pd.read_sql(sql=sql, con=con, params=params), crs=crs)
+
+
+def iter_query_chunks(statement, bind, chunksize: int = QUERY_CHUNK_SIZE):
+    '''
+    yields the result of statement as GeoDataFrames of at most chunksize rows,
+    an empty result yields one empty GeoDataFrame. The rows are read through a
+    server-side cursor, so only one chunk of the result is held in memory at once.
+    '''
+    with bind.connect() as connection:
+        connection = connection.execution_options(stream_results=True,
+                                                  max_row_buffer=chunksize)
+        for gdf in read_geodataframe(sql=statement, con=connection, crs=4326,
+                                     chunksize=chunksize):
+            yield gdf
+
+
+def reduce_chunks(chunks, func=None) -> pd.DataFrame:
+    '''
+    concatenates the chunks into one frame, func reduces every chunk before it is kept,
+    e.g. to drop the footprints or aggregate, so the full chunks are never held together.
+    '''
+    frames = [func(chunk) if func else chunk for chunk in chunks]
+    if isinstance(frames[0], gpd.GeoDataFrame):
+        return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True),
+                                geometry=frames[0].geometry.name, crs=frames[0].crs)
+    return pd.concat(frames, ignore_index=True)
+
+
+def sat_images_query(_session: session.Session,
+                     sat_names: list,
+                     cloud_cover: float,
+                     start_date: datetime.date,
+                     end_date: datetime.date,
+                     country_name: str):
+    '''
+    query of all sat images with applied filters.
+    Satellite name, pixel resolution and the land cover classes of every image are
+    fetched in the same statement, lat/lon and area are stored at ingest.
+    The time filter is repeated to prune the sat_images partitions.
+    '''
+    context = filter_context(sat_names, cloud_cover, start_date, end_date, country_name)
+
+    land_cover_class = func.array_remove(
+        func.array_agg(LandCoverClass.featureclass.distinct()), None)
+
+    query = _session.query(SatImage.id,
+                           SatImage.clear_confidence_percent,
+                           SatImage.cloud_cover,
+                           SatImage.time_acquired,
+                           SatImage.geom,
+                           SatImage.sat_id,
+                           SatImage.item_type_id,
+                           Satellite.name.label('sat_name'),
+                           Satellite.pixel_res,
+                           SatImage.lat,
+                           SatImage.lon,
+                           SatImage.area_sqkm,
+                           land_cover_class.label('land_cover_class'))\
+        .join(SatImage.satellites)
+    return join_filtered_images(query, context, SatImage.id)\
+        .outerjoin(SatImage.land_cover_class)\
+        .filter(filtered_images.c.time_acquired == SatImage.time_acquired,
+                SatImage.time_acquired >= start_date,
+                SatImage.time_acquired <= end_date)\
+        .group_by(SatImage.id, SatImage.time_acquired, Satellite.id)
+
+
+def iter_sat_images_with_filter(_session: session.Session,
+                                sat_names: list,
+                                cloud_cover: float,
+                                start_date: datetime.date,
+                                end_date: datetime.date,
+                                country_name: str,
+                                chunksize: int = QUERY_CHUNK_SIZE):
+    '''
+    yields the sat images with applied filters in GeoDataFrames of at most chunksize rows.
+    '''
+    query = sat_images_query(_session, sat_names, cloud_cover,
+                             start_date, end_date, country_name)
+    yield from iter_query_chunks(query.statement, _session.bind, chunksize)
+
+
+@cache.cached
 def query_sat_images_with_filter(_session: session.Session,
                                  sat_names: list,
                                  cloud_cover: float,
@@ -36,33 +287,14 @@ def query_sat_images_with_filter(_session: session.Session,
                                  end_date: datetime.date,
                                  country_name: str) -> gpd.GeoDataFrame:
     '''
-    gets all sat images objects from postgis with applied filters. 
+    gets all sat images objects from postgis with applied filters.
+    Read in chunks, so the raw rows of the full result are never buffered client-side,
+    the returned frame still holds every footprint. Use query_image_points_with_filter
+    if only the image locations are needed.
     '''
     t1 = time.time()
-    subquery = _session.query(Country.geom).filter(
-        Country.name == country_name).scalar_subquery()
-
-    query = _session.query(SatImage)\
-        .join(SatImage.satellites)\
-        .filter(SatImage.geom.ST_Intersects(subquery),
-                Satellite.name.in_(sat_names),
-                SatImage.time_acquired >= start_date,
-                SatImage.time_acquired <= end_date,
-                SatImage.cloud_cover <= cloud_cover).group_by(SatImage.id)
-
-    gdf = gpd.read_postgis(sql=query.statement,
-                           con=query.session.bind, crs=4326)
-
-    # TODO get list of land cover classes directly in query (then all other extra queries here can be in one)
-    gdf['land_cover_class'] = [query_land_cover_class_from_image(
-        image) for image in query if image]
-    gdf['lat'] = [i.lat for i in query]
-    gdf['lon'] = [i.lon for i in query]
-    gdf['area_sqkm'] = [i.area_sqkm for i in query]
-    gdf['sat_name'] = [i.satellites.name for i in query]
-    gdf['pixel_res'] = [i.satellites.pixel_res for i in query]
-    gdf['area_sqkm'] = gdf['area_sqkm'].round(3)
-    gdf = gdf.drop('centroid', axis=1)
+    gdf = reduce_chunks(iter_sat_images_with_filter(_session, sat_names, cloud_cover,
+                                                    start_date, end_date, country_name))
 
     t2 = time.time()
     LOGGER.info(f'query sat images took {t2-t1} seconds')
@@ -71,47 +303,64 @@ def query_sat_images_with_filter(_session: session.Session,
     return gdf
 
 
-def query_land_cover_class_from_image(_image: SatImage) -> list[str]:
-    return list(set([i.featureclass for i in _image.land_cover_class]))
+@cache.cached
+def query_image_points_with_filter(_session: session.Session,
+                                   sat_names: list,
+                                   cloud_cover: float,
+                                   start_date: datetime.date,
+                                   end_date: datetime.date,
+                                   country_name: str) -> pd.DataFrame:
+    '''
+    gets id, satellite name, acquisition time and lat/lon of the sat images with applied
+    filters, the footprints of every chunk are dropped while streaming.
+    '''
+    t1 = time.time()
+    columns = ['id', 'sat_name', 'time_acquired', 'lat', 'lon']
+    df = reduce_chunks(iter_sat_images_with_filter(_session, sat_names, cloud_cover,
+                                                   start_date, end_date, country_name),
+                       func=lambda chunk: pd.DataFrame(chunk[columns]))
+
+    t2 = time.time()
+    LOGGER.info(f'query image points took {t2-t1} seconds')
+    return df
+
 
-@st.experimental_memo
+@cache.cached
 def query_cities_with_filters(_session: session.Session,
                               sat_names: list,
                               cloud_cover: float,
                               start_date: datetime.date,
                               end_date: datetime.date,
-                              country_name: str) -> gpd.GeoDataFrame:
+                              country_name: str,
+                              radius: int = CITY_BUFFER_RADII[0]) -> gpd.GeoDataFrame:
     '''
-    gets all cities with total images per city from postgis with applied filters.
+    gets all cities with their stored buffer of radius meters and total images
+    per city buffer from postgis with applied filters.
     '''
     t1 = time.time()
-    sq_country_geom, sq_country_iso = _session.query(Country.geom, Country.iso).filter(
-        Country.name == country_name).one()
-
-    subquery_sat = _session.query(Satellite.id).filter(
-        Satellite.name.in_(sat_names)).subquery()
+    context = filter_context(sat_names, cloud_cover, start_date, end_date, country_name)
+    sq_country_iso = _session.query(Country.iso).filter(
+        Country.name == country_name).scalar_subquery()
 
     query = _session.query(City.id,
                            City.name,
-                           City.buffer.label('geom'),
-                           func.count(SatImage.id).label('total_images'))\
-        .join(City.sat_images)\
+                           CityBuffer.geom,
+                           func.count(sat_images_cities.c.sat_image_id).label('total_images'))\
+        .join(CityBuffer, and_(CityBuffer.city_id == City.id, CityBuffer.radius == radius))\
+        .join(sat_images_cities, and_(sat_images_cities.c.city_id == City.id,
+                                      sat_images_cities.c.radius == radius))
+    query = join_filtered_images(query, context, sat_images_cities.c.sat_image_id)\
         .filter(City.country_iso == sq_country_iso)\
-        .filter(SatImage.geom.ST_Intersects(sq_country_geom))\
-        .filter(SatImage.sat_id.in_(select(subquery_sat)))\
-        .filter(SatImage.time_acquired >= start_date,
-                SatImage.time_acquired <= end_date,
-                SatImage.cloud_cover <= cloud_cover)\
-        .group_by(City.id)
-
-    gdf = gpd.read_postgis(sql=query.statement,
-                           con=query.session.bind, crs=4326)
+        .group_by(City.id, CityBuffer.city_id, CityBuffer.radius)
+
+    gdf = read_geodataframe(sql=query.statement,
+                            con=query.session.bind, crs=4326)
     t2 = time.time()
     LOGGER.info(f'query cities took {t2-t1} seconds')
     return gdf
 
 
-@st.experimental_memo
+@cache.cached
 def query_land_cover_classes_with_filters(_session: session.Session,
                                           sat_names: list,
                                           cloud_cover: float,
@@ -119,70 +368,133 @@ def query_land_cover_classes_with_filters(_session: session.Session,
                                           end_date: datetime.date,
                                           country_name: str) -> list[LandCoverClass]:
     t1 = time.time()
-    subquery_country = _session.query(Country.geom).filter(
-        Country.name == country_name).scalar_subquery()
-    subquery_sat = _session.query(Satellite.id).filter(
-        Satellite.name.in_(sat_names)).subquery()
+    context = filter_context(sat_names, cloud_cover, start_date, end_date, country_name)
     query = _session.query(LandCoverClass,
-                           func.count(SatImage.id).label('total_images'))\
-        .join(LandCoverClass.sat_image)\
-        .filter(SatImage.geom.ST_Intersects(subquery_country))\
-        .filter(SatImage.sat_id.in_(select(subquery_sat)))\
-        .filter(SatImage.time_acquired >= start_date,
-                SatImage.time_acquired <= end_date,
-                SatImage.cloud_cover <= cloud_cover)\
+                           func.count(sat_images_land_cover.c.sat_image_id).label('total_images'))\
+        .join(sat_images_land_cover,
+              sat_images_land_cover.c.land_cover_class_id == LandCoverClass.id)
+    query = join_filtered_images(query, context, sat_images_land_cover.c.sat_image_id)\
         .group_by(LandCoverClass.id)
-    
-    gdf = gpd.read_postgis(sql=query.statement,
-                           con=query.session.bind, crs=4326)
+
+    gdf = read_geodataframe(sql=query.statement,
+                            con=query.session.bind, crs=4326)
         
     t2 = time.time()
     LOGGER.info(f'query land cover classes took {t2-t1} seconds')
     return gdf
 
-@st.experimental_memo
-def query_land_cover_classes_with_filters_image_coverage(_session: session.Session,
-                                          sat_names: list,
-                                          cloud_cover: float,
-                                          start_date: datetime.date,
-                                          end_date: datetime.date,
-                                          country_name: str) -> gpd.GeoDataFrame:
-    t1 = time.time()
-        
-    query = f"""
-    
+@dataclass(frozen=True)
+class PreparedQuery:
+    '''
+    Raw SQL run as a server-side prepared statement, planned by Postgres once per pooled
+    connection and reused on every filter change. The parameters are referenced as
+    $1, $2, ... in the order of params and bound, not formatted into the SQL.
+    '''
+    name: str
+    sql: str
+    params: tuple
+
+    def prepare(self, connection):
+        """prepares the statement on the connection if not prepared on it before."""
+        # info lives as long as the DBAPI connection, like its prepared statements
+        prepared = connection.info.setdefault('prepared_statements', set())
+        if self.name not in prepared:
+            types = ', '.join(param_type for _, param_type in self.params)
+            connection.exec_driver_sql(f'PREPARE {self.name} ({types}) AS {self.sql}')
+            prepared.add(self.name)
+
+    @property
+    def execute_sql(self) -> str:
+        arguments = ', '.join(f'%({name})s' for name, _ in self.params)
+        return f'EXECUTE {self.name} ({arguments})'
+
+    def log_timing(self, connection, params: dict):
+        """logs the planning and execution time Postgres reports for an execution."""
+        plan = connection.exec_driver_sql(
+            f'EXPLAIN (ANALYZE, FORMAT JSON) {self.execute_sql}', params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        LOGGER.info('{} planning took {} ms, execution took {} ms'.format(
+            self.name, plan[0]['Planning Time'], plan[0]['Execution Time']))
+
+    def read(self, bind, **params) -> gpd.GeoDataFrame:
+        """
+        executes the prepared statement with params on a pooled connection.
+        Runs it once more with EXPLAIN ANALYZE to log the timing if QUERY_TIMING is set.
+        """
+        with bind.connect() as connection:
+            self.prepare(connection)
+            if QUERY_TIMING:
+                self.log_timing(connection, params)
+            return read_geodataframe(sql=self.execute_sql, con=connection, crs=4326,
+                                     params=params)
+
+
+LAND_COVER_PARTS_IN_COUNTRY = """
+    SELECT land_cover_parts.land_cover_class_id
+    FROM land_cover_parts
+    JOIN country_parts ON ST_INTERSECTS(land_cover_parts.geom, country_parts.geom)
+    JOIN countries ON countries.iso = country_parts.country_iso
+    WHERE countries.name = $1
+"""
+
+LAND_COVER_IMAGE_COVERAGE = PreparedQuery(
+    name='land_cover_image_coverage',
+    sql=f"""
     SELECT foo.featureclass as featureclass,
-            ST_INTERSECTION(foo.geom, bar.geom) as geom, 
+            ST_AsBinary(ST_INTERSECTION(foo.geom, bar.geom)) as geom,
             ST_AREA(ST_INTERSECTION(foo.geom, bar.geom)) / ST_AREA(foo.geom) AS coverage_percentage
     FROM (
         SELECT featureclass, ST_TRANSFORM(ST_UNION(ST_BUFFER(ST_TRANSFORM(geom, 3035), 1)), 4326) as geom
         FROM land_cover_classes
-        WHERE ST_INTERSECTS(geom, ((SELECT countries.geom AS geom 
-                                FROM countries 
-                                WHERE countries.name = '{country_name}')))
+        WHERE id IN ({LAND_COVER_PARTS_IN_COUNTRY})
         GROUP BY featureclass
     ) AS foo, (
-        SELECT ST_UNION(geom) as geom
-        FROM sat_images
-        WHERE ST_INTERSECTS(geom,((SELECT countries.geom AS geom 
-                                FROM countries 
-                                WHERE countries.name = '{country_name}')))
-        AND sat_images.sat_id IN 
-                (SELECT satellites.id
-                FROM satellites
-                WHERE satellites.name IN {tuple(sat_names)})
-        AND sat_images.time_acquired >= '{start_date.strftime('%Y-%m-%d')}'
-        AND sat_images.time_acquired <= '{end_date.strftime('%Y-%m-%d')}'
-        AND sat_images.cloud_cover <= {cloud_cover}
-        
+        SELECT ST_UNION(footprint_unions.geom) as geom
+        FROM footprint_unions
+        JOIN countries ON countries.iso = footprint_unions.country_iso
+        JOIN satellites ON satellites.id = footprint_unions.sat_id
+        WHERE countries.name = $1
+        AND satellites.name = ANY($2)
+        AND footprint_unions.day >= $3
+        AND footprint_unions.day < $4
+        AND footprint_unions.cc_bucket <= $5
     ) AS bar
     WHERE ST_INTERSECTS(foo.geom, bar.geom)
-    
-    
-    ;"""
+    """,
+    params=(('country_name', 'text'), ('sat_names', 'text[]'),
+            ('start_date', 'date'), ('end_date', 'date'), ('cc_bucket', 'integer')))
 
-    gdf = gpd.read_postgis(sql=query,
-                           con=_session.bind, crs=4326)
+LAND_COVER_DISSOLVED = PreparedQuery(
+    name='land_cover_dissolved',
+    sql=f"""
+    SELECT featureclass, ST_AsBinary(ST_UNION(geom)) as geom
+    FROM land_cover_classes
+    WHERE id IN ({LAND_COVER_PARTS_IN_COUNTRY})
+    GROUP BY featureclass
+    """,
+    params=(('country_name', 'text'),))
+
+
+@cache.cached
+def query_land_cover_classes_with_filters_image_coverage(_session: session.Session,
+                                          sat_names: list,
+                                          cloud_cover: float,
+                                          start_date: datetime.date,
+                                          end_date: datetime.date,
+                                          country_name: str) -> gpd.GeoDataFrame:
+    '''
+    gets the percentage of every land cover class covered by the sat images with applied
+    filters. The footprints are unioned from the daily footprint unions, filtered by day
+    and cloud cover bucket of 0.1 like the image counts.
+    '''
+    t1 = time.time()
+    gdf = LAND_COVER_IMAGE_COVERAGE.read(_session.bind,
+                                         country_name=country_name,
+                                         sat_names=list(sat_names),
+                                         start_date=start_date,
+                                         end_date=end_date,
+                                         cc_bucket=round(cloud_cover * 10))
 
     gdf['coverage_percentage'] = gdf['coverage_percentage'] * 100
     gdf['coverage_percentage'] = gdf['coverage_percentage'].round(3)
@@ -192,23 +504,82 @@ def query_land_cover_classes_with_filters_image_coverage(_session: session.Sessi
     return gdf
 
 
-@st.experimental_memo
+@cache.cached
 def query_land_cover_geom_dissolved(_session: session.Session,
                                     country_name: str) -> gpd.GeoDataFrame:
     t1 = time.time()
-        
-    query = f"""
-    SELECT featureclass, ST_UNION(geom) as geom
-    FROM land_cover_classes
-    WHERE ST_INTERSECTS(geom, ((SELECT countries.geom AS geom 
-                            FROM countries 
-                            WHERE countries.name = '{country_name}')))
-    GROUP BY featureclass
-    ;"""
 
-    gdf = gpd.read_postgis(sql=query,
-                           con=_session.bind, crs=4326)
+    gdf = LAND_COVER_DISSOLVED.read(_session.bind, country_name=country_name)
 
     t2 = time.time()
     LOGGER.info(f'query land cover dissolved took {t2-t1} seconds')
-    return gdf
\ No newline at end of file
+    return gdf
+
+
+FOOTPRINT_UNIONS = PreparedQuery(
+    name='footprint_unions',
+    sql="""
+    SELECT footprint_unions.day, ST_AsBinary(footprint_unions.geom) as geom
+    FROM footprint_unions
+    JOIN countries ON countries.iso = footprint_unions.country_iso
+    JOIN satellites ON satellites.id = footprint_unions.sat_id
+    WHERE countries.name = $1
+    AND satellites.name = ANY($2)
+    AND footprint_unions.day >= $3
+    AND footprint_unions.day < $4
+    AND footprint_unions.cc_bucket <= $5
+    """,
+    params=(('country_name', 'text'), ('sat_names', 'text[]'),
+            ('start_date', 'date'), ('end_date', 'date'), ('cc_bucket', 'integer')))
+
+
+@cache.cached
+def query_footprint_unions_with_filters(_session: session.Session,
+                                        sat_names: list,
+                                        cloud_cover: float,
+                                        start_date: datetime.date,
+                                        end_date: datetime.date,
+                                        country_name: str) -> gpd.GeoDataFrame:
+    '''
+    gets the daily footprint unions matching the filters, without unioning them any further.
+    '''
+    t1 = time.time()
+    gdf = FOOTPRINT_UNIONS.read(_session.bind,
+                                country_name=country_name,
+                                sat_names=list(sat_names),
+                                start_date=start_date,
+                                end_date=end_date,
+                                cc_bucket=round(cloud_cover * 10))
+
+    t2 = time.time()
+    LOGGER.info(f'query footprint unions took {t2-t1} seconds')
+    return gdf
+
+
+@cache.cached
+def query_land_cover_grid_coverage(_session: session.Session,
+                                   sat_names: list,
+                                   cloud_cover: float,
+                                   start_date: datetime.date,
+                                   end_date: datetime.date,
+                                   country_name: str,
+                                   resolution: int) -> gpd.GeoDataFrame:
+    '''
+    gets the percentage of every land cover class covered by the sat images with applied
+    filters, approximated on a grid of resolution meters instead of intersecting the geometries.
+    Also returns the error bound of each percentage as error_percentage.
+    '''
+    gdf_land_cover_dissolved = query_land_cover_geom_dissolved(_session=_session,
+                                                               country_name=country_name)
+    gdf_footprints = query_footprint_unions_with_filters(_session=_session,
+                                                         sat_names=sat_names,
+                                                         cloud_cover=cloud_cover,
+                                                         start_date=start_date,
+                                                         end_date=end_date,
+                                                         country_name=country_name)
+    t1 = time.time()
+    gdf = coverage.grid_coverage(gdf_land_cover_dissolved, gdf_footprints, resolution)
+
+    t2 = time.time()
+    LOGGER.info(f'grid land cover image coverage took {t2-t1} seconds')
+    return gdf
@@ -0,0 +1,246 @@
+"""
+Measures wall time and peak resident memory of the app queries with the given filters.
+The benchmarked query functions are called without the streamlit cache.
+"""
+import argparse
+import datetime
+import multiprocessing
+import resource
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from app import coverage, query
+from config import QUERY_CHUNK_SIZE
+from database import db
+
+
+def _read_postgis(session, filters, chunksize):
+    statement = query.sat_images_query(session, **filters).statement
+    return gpd.read_postgis(sql=statement, con=session.bind, crs=4326)
+
+
+def _buffered(session, filters, chunksize):
+    statement = query.sat_images_query(session, **filters).statement
+    return query.read_geodataframe(sql=statement, con=session.bind, crs=4326)
+
+
+def _chunked(session, filters, chunksize):
+    return query.reduce_chunks(query.iter_sat_images_with_filter(session, **filters,
+                                                                 chunksize=chunksize))
+
+
+def _points(session, filters, chunksize):
+    columns = ['id', 'sat_name', 'time_acquired', 'lat', 'lon']
+    return query.reduce_chunks(query.iter_sat_images_with_filter(session, **filters,
+                                                                 chunksize=chunksize),
+                               func=lambda chunk: pd.DataFrame(chunk[columns]))
+
+
+BENCHMARKS = {
+    'sat_images_read_postgis': _read_postgis,
+    'sat_images_buffered': _buffered,
+    'sat_images_chunked': _chunked,
+    'image_points_chunked': _points,
+}
+
+
+def _max_rss_mib():
+    """peak resident set size of the process, reported in KiB on Linux and bytes on macOS."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10
+
+
+def _measure_child(conn, func, args):
+    try:
+        # the pooled connections of the parent are left to it
+        db.get_db_engine().dispose(close=False)
+        baseline = _max_rss_mib()
+        t1 = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - t1
+        conn.send((len(result.index), seconds, _max_rss_mib() - baseline, None))
+    except Exception as e:
+        conn.send((None, None, None, repr(e)))
+    finally:
+        conn.close()
+
+
+def measure(func, *args):
+    """
+    Calls func with args in a forked process for its wall time and the growth of its
+    peak resident set size. Unlike traced Python allocations, the resident memory also
+    holds the result set libpq buffers in C. Every call starts from a fresh process,
+    as the peak of a process only grows.
+
+    returns tuple of the amount of result rows, seconds taken and peak memory growth in MiB.
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_child, args=(child_conn, func, args))
+    process.start()
+    child_conn.close()
+    rows, seconds, peak, error = parent_conn.recv()
+    process.join()
+    if error:
+        raise RuntimeError('{} failed: {}'.format(getattr(func, '__name__', func), error))
+    return rows, seconds, peak
+
+
+def run(session, filters, names, chunksize=QUERY_CHUNK_SIZE, repeat=1):
+    """
+    Runs the benchmarks in names with the filters.
+
+    returns DataFrame with the rows, best seconds and highest peak MiB per benchmark.
+    """
+    report = []
+    for name in names:
+        timings, peaks = [], []
+        for _ in range(repeat):
+            rows, seconds, peak = measure(BENCHMARKS[name], session, filters, chunksize)
+            timings.append(seconds)
+            peaks.append(peak)
+        report.append({'benchmark': name,
+                       'rows': rows,
+                       'seconds': min(timings),
+                       'peak_mib': max(peaks)})
+    return pd.DataFrame(report)
+
+
+def fake_wkb_frame(rows, vertices=5, seed=0):
+    """
+    Builds a frame like a query result with rows random footprints as binary WKB,
+    as psycopg2 returns them.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([5, 47], [15, 55], size=(rows, 2))
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    ring = np.stack([np.cos(angles), np.sin(angles)], axis=1) * 0.1
+    polygons = shapely.polygons(centers[:, None, :] + ring[None, :, :])
+    return pd.DataFrame({'id': np.arange(rows),
+                         'geom': [memoryview(i) for i in shapely.to_wkb(polygons)]})
+
+
+def _decode_rowwise(df):
+    return gpd.GeoDataFrame(df.assign(geom=df['geom'].apply(lambda i: shapely.wkb.loads(bytes(i)))),
+                            geometry='geom', crs=4326)
+
+
+def _decode_vectorized(df):
+    return query.to_geodataframe(df)
+
+
+def run_decode(rows, repeat=1):
+    """
+    Decodes rows fake footprints row by row like read_postgis and vectorized,
+    needs no database.
+
+    returns DataFrame with the rows, best seconds and highest peak MiB per decoder.
+    """
+    report = []
+    for name, func in [('decode_rowwise', _decode_rowwise),
+                       ('decode_vectorized', _decode_vectorized)]:
+        timings, peaks = [], []
+        for _ in range(repeat):
+            df = fake_wkb_frame(rows)
+            rows, seconds, peak = measure(lambda: func(df.copy()))
+            timings.append(seconds)
+            peaks.append(peak)
+        report.append({'benchmark': name,
+                       'rows': rows,
+                       'seconds': min(timings),
+                       'peak_mib': max(peaks)})
+    return pd.DataFrame(report)
+
+
+def fake_land_cover_frames(footprints, seed=0):
+    """
+    Builds ten country sized land cover classes and footprints amount of 30 km footprints
+    in EPSG:3035, like the dissolved land cover and daily footprint unions of a country.
+    """
+    rng = np.random.default_rng(seed)
+    classes = [shapely.box(x, 2700000, x + 60000, 3500000) for x in range(4000000, 4600000, 60000)]
+    gdf_land_cover = gpd.GeoDataFrame({'featureclass': [str(i) for i in range(len(classes))],
+                                       'geom': classes}, geometry='geom', crs=3035)
+    origins = rng.uniform((4000000, 2700000), (4570000, 3470000), size=(footprints, 2))
+    gdf_footprints = gpd.GeoDataFrame({'geom': shapely.box(origins[:, 0], origins[:, 1],
+                                                           origins[:, 0] + 30000, origins[:, 1] + 30000)},
+                                      geometry='geom', crs=3035)
+    return gdf_land_cover, gdf_footprints
+
+
+def run_grid_coverage(footprints, repeat=1):
+    """
+    Approximates the land cover coverage of fake footprints on the grid resolutions of
+    the dashboard, needs no database.
+
+    returns DataFrame with the rows, best seconds and highest peak MiB per resolution.
+    """
+    gdf_land_cover, gdf_footprints = fake_land_cover_frames(footprints)
+    report = []
+    for resolution in coverage.GRID_RESOLUTIONS:
+        timings, peaks = [], []
+        for _ in range(repeat):
+            rows, seconds, peak = measure(coverage.grid_coverage, gdf_land_cover, gdf_footprints,
+                                          resolution)
+            timings.append(seconds)
+            peaks.append(peak)
+        report.append({'benchmark': f'grid_coverage_{resolution}m',
+                       'rows': rows,
+                       'seconds': min(timings),
+                       'peak_mib': max(peaks)})
+    return pd.DataFrame(report)
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app queries")
+    parser.add_argument("--country_name", help="Name of the country to filter on.")
+    parser.add_argument("--sat_names", nargs='+', help="Names of the satellites to filter on.")
+    parser.add_argument("--start_date", type=datetime.date.fromisoformat,
+                        help="Start date in ISO (YYYY-MM-DD) format.")
+    parser.add_argument("--end_date", type=datetime.date.fromisoformat,
+                        help="End date in ISO (YYYY-MM-DD) format.")
+    parser.add_argument("--cloud_cover", type=float, default=1.0,
+                        help="Optional. Max cloud cover, defaults to 1.")
+    parser.add_argument("--chunksize", type=int, default=QUERY_CHUNK_SIZE,
+                        help="Optional. Rows per chunk of the chunked queries.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Optional. Amount of runs per benchmark, defaults to 3.")
+    parser.add_argument("--benchmarks", nargs='+', choices=list(BENCHMARKS),
+                        default=list(BENCHMARKS),
+                        help="Optional. Benchmarks to run, defaults to all.")
+    parser.add_argument("--decode_rows", type=int,
+                        help="Optional. Only benchmark decoding this amount of fake footprints,"
+                        " needs no database.")
+    parser.add_argument("--grid_footprints", type=int,
+                        help="Optional. Only benchmark the grid coverage of this amount of fake"
+                        " footprints, needs no database.")
+    args = parser.parse_args(argv)
+
+    filters = [args.country_name, args.sat_names, args.start_date, args.end_date]
+    if not args.decode_rows and not args.grid_footprints and not all(filters):
+        parser.error('--country_name, --sat_names, --start_date and --end_date are required'
+                     ' unless --decode_rows or --grid_footprints is given')
+    return args
+
+
+if __name__ == '__main__':
+    args = arguments()
+    if args.decode_rows:
+        print(run_decode(args.decode_rows, repeat=args.repeat).to_string(index=False))
+        raise SystemExit
+    if args.grid_footprints:
+        print(run_grid_coverage(args.grid_footprints, repeat=args.repeat).to_string(index=False))
+        raise SystemExit
+    filters = {'sat_names': args.sat_names,
+               'cloud_cover': args.cloud_cover,
+               'start_date': args.start_date,
+               'end_date': args.end_date,
+               'country_name': args.country_name}
+
+    print(run(db.get_db_session(), filters, args.benchmarks,
+              chunksize=args.chunksize, repeat=args.repeat).to_string(index=False))
@@ -12,6 +12,27 @@ DB_PORT = os.environ['DB_PORT']
 
 POSTGIS_URL = f"postgresql://{DB_USER}:{DB_PW}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+# rows fetched per round trip of the server-side cursor of chunked app queries
+QUERY_CHUNK_SIZE = int(os.environ.get('QUERY_CHUNK_SIZE', 10000))
+
+# log the planning and execution time of the prepared app queries, runs them twice
+QUERY_TIMING = os.environ.get('QUERY_TIMING', 'false').lower() == 'true'
+
+# seconds the sat images matching a set of dashboard filters are kept
+FILTER_SET_TTL = int(os.environ.get('FILTER_SET_TTL', 3600))
+
+# radii in meters of the stored buffers around cities, the first one is the dashboard default
+CITY_BUFFER_RADII = [int(i) for i in os.environ.get('CITY_BUFFER_RADII', '30000').split(',')]
+
+# app query result cache, in memory and as Parquet files shared by the app replicas
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join('.cache', 'query'))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 2 ** 20))
+CACHE_DISK_MAX_BYTES = int(os.environ.get('CACHE_DISK_MAX_BYTES', 2 ** 30))
+
 PL_API_KEY = os.environ['PL_API_KEY']
 
 logging.basicConfig(level=logging.INFO, format="%(processName)s:%(message)s")
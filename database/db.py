@@ -1,15 +1,22 @@
 """Module containing the database"""
 import os
+import argparse
+import datetime
+import threading
+from contextlib import contextmanager
 import psycopg2
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, foreign
 from sqlalchemy import create_engine, Table, Column, Integer, Float, String,\
-    DateTime, ForeignKey, select, func, inspect, event
+    DateTime, Date, ForeignKey, select, func, inspect, event, insert, delete, cast, Numeric, \
+    tuple_, literal, literal_column, and_, Computed
 from sqlalchemy.types import TypeDecorator
+from sqlalchemy.schema import DDL
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql.expression import Insert
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.dialects import postgresql
 from sqlalchemy_utils import database_exists, create_database
 
 from geoalchemy2 import Geometry
@@ -17,28 +24,388 @@ from geoalchemy2.shape import to_shape
 from geojson import Feature
 
 
-from config import POSTGIS_URL
+from config import POSTGIS_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, FILTER_SET_TTL, \
+    CITY_BUFFER_RADII
 
 Base = declarative_base()
 
+# max vertices of the pieces countries and land cover classes are subdivided into
+SUBDIVIDE_MAX_VERTICES = 256
+
+# key of the advisory lock serializing the refreshes of the tables derived from the sat images
+DERIVED_TABLES_LOCK = 7301
+
+_engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker()
+Session = scoped_session(SessionLocal)
+
 
 def get_db_engine():
-    return create_engine(POSTGIS_URL, echo=False)
+    """
+    Returns the process wide engine, it is created on first use.
+    Every session of the importer, the app and alembic shares its connection pool.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(POSTGIS_URL,
+                                        echo=False,
+                                        pool_size=DB_POOL_SIZE,
+                                        max_overflow=DB_MAX_OVERFLOW,
+                                        pool_pre_ping=DB_POOL_PRE_PING)
+                SessionLocal.configure(bind=_engine)
+    return _engine
 
 
 def get_db_session():
-    engine = get_db_engine()
-    Session = sessionmaker(bind=engine)
+    """Returns a new session bound to the shared engine."""
+    get_db_engine()
+    return SessionLocal()
+
+
+def get_scoped_session():
+    """Returns the thread-local session bound to the shared engine."""
+    get_db_engine()
     return Session()
 
 
-session = get_db_session()
+@contextmanager
+def session_scope():
+    """
+    Provides a transactional scope around a series of operations.
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    session = get_db_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
 
 def sql_alch_commit(model):
-    session = get_db_session()
-    session.add(model)
-    session.commit()
+    with session_scope() as session:
+        session.add(model)
+
+
+def bulk_insert(session, table, rows):
+    """
+    Inserts all rows into the table with one multi-row INSERT statement.
+    Rows that already exist are skipped by the ON CONFLICT DO NOTHING compile hook.
+
+    :param Session session
+        Session to execute the statement in, the caller commits.
+    :param Table table
+        Table to insert the rows into.
+    :param list rows
+        Dictionaries with column names as keys.
+    """
+    if rows:
+        session.execute(insert(table).values(rows))
+
+
+def upsert_import_ledger(session, rows):
+    """
+    Moves the watermarks of the import ledger forward.
+    Inserts new (aoi_hash, item_type_id, cc) rows, existing rows cover the time interval
+    of the new row and keep the latest acquired and published timestamp of both.
+    The whole new interval was searched up to the run, so the stored watermark holds for it.
+
+    :param Session session
+        Session to execute the statement in, the caller commits.
+    :param list rows
+        Dictionaries with aoi_hash, item_type_id, start_date, end_date, cc,
+        acquired and published keys.
+    """
+    if not rows:
+        return
+    stmt = postgresql.insert(ImportLedger.__table__).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['aoi_hash', 'item_type_id', 'cc'],
+        set_={'start_date': stmt.excluded.start_date,
+              'end_date': stmt.excluded.end_date,
+              'acquired': func.greatest(ImportLedger.acquired, stmt.excluded.acquired),
+              'published': func.greatest(ImportLedger.published, stmt.excluded.published)})
+    session.execute(stmt)
+
+
+def link_sat_images(session, image_ids=None):
+    """
+    Stores which countries, cities and land cover classes every sat image intersects
+    in the association tables, so queries join on ids instead of intersecting geometries.
+    Countries and land cover classes are intersected through their subdivided parts,
+    cities through their stored buffers of every radius.
+    Existing links are skipped by the ON CONFLICT DO NOTHING compile hook.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param list image_ids
+        Only links these sat images, links all sat images if None.
+    """
+    if image_ids is not None and not image_ids:
+        return
+
+    links = [
+        (sat_images_countries, ['sat_image_id', 'country_iso'], [CountryPart.country_iso],
+         func.ST_Intersects(CountryPart.geom, SatImage.geom)),
+        (sat_images_cities, ['sat_image_id', 'city_id', 'radius'], [CityBuffer.city_id, CityBuffer.radius],
+         func.ST_Intersects(CityBuffer.geom, SatImage.geom)),
+        (sat_images_land_cover, ['sat_image_id', 'land_cover_class_id'], [LandCoverPart.land_cover_class_id],
+         func.ST_Intersects(LandCoverPart.geom, SatImage.geom)),
+    ]
+    for table, columns, layer_columns, intersects in links:
+        query = select(SatImage.id, *layer_columns).where(intersects).distinct()
+        if image_ids is not None:
+            query = query.where(SatImage.id.in_(image_ids))
+        session.execute(insert(table).from_select(columns, query))
+
+
+def cc_bucket(cloud_cover):
+    """Cloud cover bucket of the image counts, bucket b holds cloud cover values in ((b - 1) / 10, b / 10]."""
+    return cast(func.ceil(func.round(cast(cloud_cover * 10, Numeric), 6)), Integer)
+
+
+def lock_derived_tables(session):
+    """
+    Takes the transaction level advisory lock of the tables derived from the sat images.
+    Concurrent writers recount the same cells, under READ COMMITTED a recount does not see
+    the images of the other writer's uncommitted transaction and would overwrite its cells
+    with an undercount. Holding the lock until commit lets the next writer's recount start
+    after the earlier one committed, so it counts the images of both.
+    """
+    session.execute(select(func.pg_advisory_xact_lock(DERIVED_TABLES_LOCK)))
+
+
+def refresh_image_counts(session, image_ids=None):
+    """
+    Recomputes the image_counts cells of the sat images from the stored images,
+    so rerunning it for the same images gives the same counts.
+    Serialized with the other writers by lock_derived_tables.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param list image_ids
+        Only recomputes the cells these sat images fall in, recomputes all cells if None.
+    """
+    if image_ids is not None and not image_ids:
+        return
+    lock_derived_tables(session)
+
+    dims = [sat_images_countries.c.country_iso,
+            SatImage.sat_id,
+            SatImage.item_type_id,
+            cast(SatImage.time_acquired, Date).label('day'),
+            cc_bucket(SatImage.cloud_cover).label('cc_bucket')]
+    images = SatImage.__table__.join(sat_images_countries,
+                                     sat_images_countries.c.sat_image_id == SatImage.id)
+
+    counts = select(*dims, func.count()).select_from(images)
+    if image_ids is None:
+        session.execute(ImageCount.__table__.delete())
+    else:
+        cells = select(*dims).select_from(images).where(SatImage.id.in_(image_ids))\
+            .distinct().cte('cells')
+        # the day range keeps the recount on the time_acquired index
+        counts = counts.where(SatImage.time_acquired >= select(func.min(cells.c.day)).scalar_subquery(),
+                              SatImage.time_acquired < select(func.max(cells.c.day) + 1).scalar_subquery(),
+                              tuple_(*dims).in_(select(cells)))
+    counts = counts.group_by(*dims)
+
+    stmt = postgresql.insert(ImageCount.__table__).from_select(
+        ['country_iso', 'sat_id', 'item_type_id', 'day', 'cc_bucket', 'total'], counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['country_iso', 'sat_id', 'item_type_id', 'day', 'cc_bucket'],
+        set_={'total': stmt.excluded.total})
+    session.execute(stmt)
+
+
+def refresh_footprint_unions(session, image_ids=None):
+    """
+    Recomputes the footprint_unions cells of the sat images from the stored images,
+    the union of all footprints per country, satellite, day and cloud cover bucket.
+    Serialized with the other writers by lock_derived_tables.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param list image_ids
+        Only recomputes the cells these sat images fall in, recomputes all cells if None.
+    """
+    if image_ids is not None and not image_ids:
+        return
+    lock_derived_tables(session)
+
+    dims = [sat_images_countries.c.country_iso,
+            SatImage.sat_id,
+            cast(SatImage.time_acquired, Date).label('day'),
+            cc_bucket(SatImage.cloud_cover).label('cc_bucket')]
+    images = SatImage.__table__.join(sat_images_countries,
+                                     sat_images_countries.c.sat_image_id == SatImage.id)
+
+    unions = select(*dims, func.ST_Multi(func.ST_Union(SatImage.geom))).select_from(images)
+    if image_ids is None:
+        session.execute(FootprintUnion.__table__.delete())
+    else:
+        cells = select(*dims).select_from(images).where(SatImage.id.in_(image_ids))\
+            .distinct().cte('cells')
+        unions = unions.where(SatImage.time_acquired >= select(func.min(cells.c.day)).scalar_subquery(),
+                              SatImage.time_acquired < select(func.max(cells.c.day) + 1).scalar_subquery(),
+                              tuple_(*dims).in_(select(cells)))
+    unions = unions.group_by(*dims)
+
+    stmt = postgresql.insert(FootprintUnion.__table__).from_select(
+        ['country_iso', 'sat_id', 'day', 'cc_bucket', 'geom'], unions)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['country_iso', 'sat_id', 'day', 'cc_bucket'],
+        set_={'geom': stmt.excluded.geom})
+    session.execute(stmt)
+
+
+def materialize_filtered_images(session, filter_key, sat_names, cloud_cover,
+                                start_date, end_date, country_name):
+    """
+    Stores the ids of the sat images matching the dashboard filters under filter_key,
+    once per key, so the dashboard queries join the stored ids instead of evaluating
+    the country, satellite, time and cloud cover filters each.
+    Filter sets older than FILTER_SET_TTL seconds are removed when a new one is stored,
+    reusing a set moves its created timestamp forward, so it is not removed while read.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param str filter_key
+        Key identifying the filters.
+    :param list sat_names
+        Names of the satellites of the images.
+    :param float cloud_cover
+        Max cloud cover of the images.
+    :param datetime start_date
+        Images acquired at or after start_date.
+    :param datetime end_date
+        Images acquired at or before end_date.
+    :param str country_name
+        Name of the country the images intersect.
+
+    returns bool, True if the filter set was stored by this call.
+    """
+    stmt = postgresql.insert(FilterSet.__table__).values(key=filter_key, created=func.now())
+    stmt = stmt.on_conflict_do_update(index_elements=['key'], set_={'created': stmt.excluded.created})
+    # xmax is 0 for a row inserted by the statement, not for an updated one
+    created = session.execute(stmt.returning(literal_column('xmax') == 0)).scalar()
+    if not created:
+        return False
+
+    session.execute(delete(FilterSet).where(
+        FilterSet.created < func.now() - datetime.timedelta(seconds=FILTER_SET_TTL)))
+
+    country_iso = select(Country.iso).where(Country.name == country_name).scalar_subquery()
+    sat_ids = select(Satellite.id).where(Satellite.name.in_(sat_names))
+    query = select(literal(filter_key), SatImage.id, SatImage.time_acquired)\
+        .join(sat_images_countries, sat_images_countries.c.sat_image_id == SatImage.id)\
+        .where(sat_images_countries.c.country_iso == country_iso,
+               SatImage.sat_id.in_(sat_ids),
+               SatImage.time_acquired >= start_date,
+               SatImage.time_acquired <= end_date,
+               SatImage.cloud_cover <= cloud_cover)
+    session.execute(insert(filtered_images).from_select(
+        ['filter_key', 'sat_image_id', 'time_acquired'], query))
+    return True
+
+
+def bump_data_generation(session):
+    """
+    Moves the data generation forward after sat images or static layers were imported,
+    cached query results of earlier generations are no longer used.
+    The filter sets are derived from the earlier data and removed.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    """
+    stmt = postgresql.insert(DataGeneration.__table__).values(id=1, generation=1, updated=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={'generation': DataGeneration.generation + 1, 'updated': func.now()})
+    session.execute(stmt)
+    session.execute(delete(FilterSet))
+
+
+def get_data_generation(session):
+    """
+    Current data generation, 0 before anything was imported.
+
+    :param Session session
+        Session to execute the query in.
+
+    returns int
+    """
+    return session.query(DataGeneration.generation).scalar() or 0
+
+
+def refresh_country_parts(session):
+    """
+    Recreates the subdivided parts of all countries.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    """
+    _refresh_parts(session, CountryPart.__table__, 'country_iso', Country.iso, Country.geom)
+
+
+def refresh_land_cover_parts(session):
+    """
+    Recreates the subdivided parts of all land cover classes.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    """
+    _refresh_parts(session, LandCoverPart.__table__, 'land_cover_class_id',
+                   LandCoverClass.id, LandCoverClass.geom)
+
+
+def refresh_city_buffers(session, radii=CITY_BUFFER_RADII):
+    """
+    Recreates the buffers around all cities, computed in EPSG:3035 so the radius is in meters.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param list radii
+        Radii in meters to store a buffer of every city for.
+    """
+    session.execute(CityBuffer.__table__.delete())
+    for radius in radii:
+        buffers = select(City.id, literal(radius),
+                         City.geom.ST_Transform(3035).ST_Buffer(radius).ST_Transform(4326))
+        session.execute(insert(CityBuffer.__table__).from_select(['city_id', 'radius', 'geom'], buffers))
+
+
+def _refresh_parts(session, table, id_column, layer_id, layer_geom):
+    """Replaces the rows of a parts table with pieces of at most SUBDIVIDE_MAX_VERTICES vertices."""
+    session.execute(table.delete())
+    pieces = select(layer_id, func.ST_Subdivide(layer_geom, SUBDIVIDE_MAX_VERTICES))
+    session.execute(insert(table).from_select([id_column, 'geom'], pieces))
+
+
+def rebuild_links(session):
+    """
+    Recreates the subdivided parts, the city buffers, all association tables and the image counts,
+    needed when the countries, cities or land cover classes changed.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    """
+    refresh_country_parts(session)
+    refresh_land_cover_parts(session)
+    refresh_city_buffers(session)
+    for table in (sat_images_countries, sat_images_cities, sat_images_land_cover):
+        session.execute(table.delete())
+    link_sat_images(session)
+    refresh_footprint_unions(session)
+    refresh_image_counts(session)
+
 
 def create_postgis_db(engine):
     create_database(url=engine.url)
@@ -66,7 +433,10 @@ def create_tables(engine, Base):
 def prefix_inserts(insert, compiler, **kw):
     """
     set every insert to ON CONFLICT DO NOTHING for efficient skipping op double items
+    inserts that define their own ON CONFLICT clause (upserts) are left as is
     """
+    if getattr(insert, '_post_values_clause', None) is not None:
+        return compiler.visit_insert(insert, **kw)
     return compiler.visit_insert(insert, **kw) + " ON CONFLICT DO NOTHING"
 
 
@@ -84,6 +454,14 @@ class CentroidFromPolygon(TypeDecorator):
             .ST_Transform(4326)
 
 
+# lat, lon and area are generated by PostGIS from the stored footprint,
+# centroid in equal area proj CRS:3035 like ``CentroidFromPolygon``
+CENTROID_4326 = 'ST_Transform(ST_Centroid(ST_Transform(geom, 3035)), 4326)'
+LAT_FROM_GEOM = 'ST_Y({})'.format(CENTROID_4326)
+LON_FROM_GEOM = 'ST_X({})'.format(CENTROID_4326)
+AREA_SQKM_FROM_GEOM = 'round(CAST(ST_Area(ST_Transform(geom, 3035)) / 1000000 AS numeric), 3)'
+
+
 class Satellite(Base):
     __tablename__ = 'satellites'
     id = Column(String(50), primary_key=True, index=True)
@@ -101,21 +479,32 @@ class Satellite(Base):
 
 
 class SatImage(Base):
+    '''
+    Range partitioned by month of time_acquired, rows outside the created monthly
+    partitions go to the sat_images_default partition, see ``database.partitions``.
+    The partition key is part of the primary key, so link tables have no foreign key to it.
+    '''
     __tablename__ = 'sat_images'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (time_acquired)'}
     id = Column(String(50), primary_key=True, index=True)
     clear_confidence_percent = Column(Float)
     cloud_cover = Column(Float, nullable=False, index=True)
-    time_acquired = Column(DateTime, nullable=False, index=True)
+    time_acquired = Column(DateTime, primary_key=True, nullable=False, index=True)
     geom = Column(Geometry(srid=4326, spatial_index=True), nullable=False)
     centroid = Column(CentroidFromPolygon(
         srid=4326, geometry_type='POINT', nullable=False, spatial_index=True))
+    lat = Column(Float, Computed(LAT_FROM_GEOM, persisted=True))
+    lon = Column(Float, Computed(LON_FROM_GEOM, persisted=True))
+    area_sqkm = Column(Float, Computed(AREA_SQKM_FROM_GEOM, persisted=True))
     sat_id = Column(String(50), ForeignKey('satellites.id'), nullable=False)
     item_type_id = Column(String(50), ForeignKey(
         'item_types.id'), nullable=False)
 
     land_cover_class = relationship(
         'LandCoverClass',
-        primaryjoin='func.ST_Intersects(foreign(SatImage.geom), remote(LandCoverClass.geom)).as_comparison(1,2)',
+        secondary='sat_images_land_cover',
+        primaryjoin='SatImage.id == foreign(sat_images_land_cover.c.sat_image_id)',
+        secondaryjoin='LandCoverClass.id == foreign(sat_images_land_cover.c.land_cover_class_id)',
         backref='sat_image',
         lazy='select',
         viewonly=True,
@@ -125,38 +514,12 @@ class SatImage(Base):
 
     @hybrid_property
     def sat_name(self):
-        return session.scalar(self.satellites.name)
+        return self.satellites.name
 
     @sat_name.expression
     def sat_name(cls):
         return cls.satellites.name
 
-    @hybrid_property
-    def lon(self):
-        return session.scalar(self.centroid.ST_X())
-
-    @lon.expression
-    def lon(cls):
-        return cls.centroid.ST_X()
-
-    @hybrid_property
-    def lat(self):
-        return session.scalar(self.centroid.ST_Y())
-
-    @lat.expression
-    def lat(cls):
-        return cls.centroid.ST_Y()
-
-    @hybrid_property
-    def area_sqkm(self):
-        area_mm = session.scalar((self.geom.ST_Transform(3035).ST_Area()))
-        return round((area_mm / 1000000), 3)
-    
-    @area_sqkm.expression
-    def area_sqkm(cls):
-        area_mm = cls.geom.ST_Transform(3035).ST_Area()
-        return (area_mm / 1000000)
-
     @hybrid_property
     def geojson(self):
         return Feature(
@@ -177,6 +540,11 @@ class SatImage(Base):
             })
 
 
+# rows of months without a partition of their own
+event.listen(SatImage.__table__, 'after_create',
+             DDL('CREATE TABLE sat_images_default PARTITION OF sat_images DEFAULT'))
+
+
 items_assets = Table(
     'items_assets',
     Base.metadata,
@@ -185,6 +553,32 @@ items_assets = Table(
 )
 
 
+sat_images_countries = Table(
+    'sat_images_countries',
+    Base.metadata,
+    Column('sat_image_id', String(50), primary_key=True),
+    Column('country_iso', ForeignKey('countries.iso', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
+
+sat_images_cities = Table(
+    'sat_images_cities',
+    Base.metadata,
+    Column('sat_image_id', String(50), primary_key=True),
+    Column('city_id', ForeignKey('cities.id', ondelete='CASCADE'), primary_key=True, index=True),
+    Column('radius', Integer, primary_key=True)
+)
+
+
+sat_images_land_cover = Table(
+    'sat_images_land_cover',
+    Base.metadata,
+    Column('sat_image_id', String(50), primary_key=True),
+    Column('land_cover_class_id', ForeignKey('land_cover_classes.id', ondelete='CASCADE'),
+           primary_key=True, index=True)
+)
+
+
 class ItemType(Base):
     __tablename__ = 'item_types'
     id = Column(String(50), primary_key=True, index=True)
@@ -218,7 +612,9 @@ class Country(Base):
 
     sat_images = relationship(
         'SatImage',
-        primaryjoin='func.ST_Intersects(foreign(Country.geom), remote(SatImage.geom)).as_comparison(1,2)',
+        secondary='sat_images_countries',
+        primaryjoin='Country.iso == foreign(sat_images_countries.c.country_iso)',
+        secondaryjoin='SatImage.id == foreign(sat_images_countries.c.sat_image_id)',
         backref='countries',
         viewonly=True,
         uselist=True)
@@ -235,14 +631,24 @@ class City(Base):
 
     sat_images = relationship(
         'SatImage',
-        primaryjoin='func.ST_Intersects(foreign(City.buffer), remote(SatImage.geom)).as_comparison(1,2)',
+        secondary='sat_images_cities',
+        primaryjoin=lambda: and_(City.id == foreign(sat_images_cities.c.city_id),
+                                 sat_images_cities.c.radius == CITY_BUFFER_RADII[0]),
+        secondaryjoin='SatImage.id == foreign(sat_images_cities.c.sat_image_id)',
         backref='cities',
         viewonly=True,
         uselist=True)
 
-    @hybrid_property
-    def buffer(self):
-        return self.geom.ST_Transform(3035).ST_Buffer(30000).ST_Transform(4326)
+
+class CityBuffer(Base):
+    '''
+    Buffer of radius meters around a city, stored so links and queries use its spatial index.
+    '''
+    __tablename__ = 'city_buffers'
+    city_id = Column(Integer, ForeignKey('cities.id', ondelete='CASCADE'), primary_key=True)
+    radius = Column(Integer, primary_key=True)
+    geom = Column(Geometry(geometry_type='POLYGON', srid=4326, spatial_index=True),
+                  nullable=False)
 
 
 class LandCoverClass(Base):
@@ -253,10 +659,122 @@ class LandCoverClass(Base):
                   nullable=False)
 
 
+class CountryPart(Base):
+    '''
+    Piece of a country geometry with at most SUBDIVIDE_MAX_VERTICES vertices.
+    Spatial predicates on the pieces only compare small polygons.
+    '''
+    __tablename__ = 'country_parts'
+    id = Column(Integer, primary_key=True)
+    country_iso = Column(String(3), ForeignKey('countries.iso', ondelete='CASCADE'),
+                         nullable=False, index=True)
+    geom = Column(Geometry(srid=4326, spatial_index=True),
+                  nullable=False)
+
+
+class LandCoverPart(Base):
+    '''
+    Piece of a land cover class geometry with at most SUBDIVIDE_MAX_VERTICES vertices.
+    '''
+    __tablename__ = 'land_cover_parts'
+    id = Column(Integer, primary_key=True)
+    land_cover_class_id = Column(Integer, ForeignKey('land_cover_classes.id', ondelete='CASCADE'),
+                                 nullable=False, index=True)
+    geom = Column(Geometry(srid=4326, spatial_index=True),
+                  nullable=False)
+
+
+class ImageCount(Base):
+    '''
+    Amount of sat images per country, satellite, item type, day and cloud cover bucket.
+    Maintained on import, so aggregate questions do not scan the sat images.
+    '''
+    __tablename__ = 'image_counts'
+    country_iso = Column(String(3), ForeignKey('countries.iso', ondelete='CASCADE'), primary_key=True)
+    sat_id = Column(String(50), ForeignKey('satellites.id'), primary_key=True)
+    item_type_id = Column(String(50), ForeignKey('item_types.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    cc_bucket = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False)
+
+
+class FootprintUnion(Base):
+    '''
+    Union of the sat image footprints per country, satellite, day and cloud cover bucket.
+    Maintained on import, so coverage questions union a cell per day instead of every image.
+    '''
+    __tablename__ = 'footprint_unions'
+    country_iso = Column(String(3), ForeignKey('countries.iso', ondelete='CASCADE'), primary_key=True)
+    sat_id = Column(String(50), ForeignKey('satellites.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    cc_bucket = Column(Integer, primary_key=True)
+    geom = Column(Geometry(srid=4326, geometry_type='MULTIPOLYGON', spatial_index=True), nullable=False)
+
+
+class ImportLedger(Base):
+    '''
+    Latest acquired/published timestamp imported per AOI, item type and cloud cover,
+    with the acquired time interval of the last import. Items acquired outside the interval
+    may have been published before the watermark, so they are not covered by it.
+    AOIs are identified by the sha256 hash of their GeoJSON geometry.
+    '''
+    __tablename__ = 'import_ledger'
+    aoi_hash = Column(String(64), primary_key=True)
+    item_type_id = Column(String(50), primary_key=True)
+    cc = Column(Float, primary_key=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    acquired = Column(DateTime)
+    published = Column(DateTime)
+
+
+class FilterSet(Base):
+    '''
+    A set of dashboard filters whose matching sat images are stored in filtered_images.
+    Unlogged, as the sets are derived and recomputed when missing.
+    '''
+    __tablename__ = 'filter_sets'
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+    key = Column(String(64), primary_key=True)
+    created = Column(DateTime, nullable=False)
+
+
+filtered_images = Table(
+    'filtered_images',
+    Base.metadata,
+    Column('filter_key', ForeignKey('filter_sets.key', ondelete='CASCADE'), primary_key=True),
+    Column('sat_image_id', String(50), primary_key=True),
+    Column('time_acquired', DateTime, nullable=False),
+    prefixes=['UNLOGGED']
+)
+
+
+class DataGeneration(Base):
+    '''
+    Single row counter moved forward by every import, part of the app's result cache keys.
+    '''
+    __tablename__ = 'data_generation'
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False)
+    updated = Column(DateTime, nullable=False)
+
 
 if __name__ == '__main__':
-    engine = get_db_engine()
-    if not database_exists(engine.url):
-        create_postgis_db(engine)
-    create_tables(engine, Base)
+    parser = argparse.ArgumentParser(description="Create the PostGIS database and tables")
+    parser.add_argument(
+        "--rebuild_links",
+        action='store_true',
+        help="Only recreate the sat image to country/city/land cover class links,"
+        " after the static layers changed.")
+    args = parser.parse_args()
+
+    if args.rebuild_links:
+        with session_scope() as session:
+            rebuild_links(session)
+            bump_data_generation(session)
+    else:
+        engine = get_db_engine()
+        if not database_exists(engine.url):
+            create_postgis_db(engine)
+        create_tables(engine, Base)
 
@@ -0,0 +1,187 @@
+"""Module to manage the monthly partitions of the sat_images table"""
+import argparse
+from datetime import date
+
+from sqlalchemy import text, delete
+
+from config import LOGGER
+from database import db
+
+DEFAULT_PARTITION = 'sat_images_default'
+
+
+def partition_name(month):
+    """Name of the partition holding the month of the date."""
+    return 'sat_images_y{:04d}m{:02d}'.format(month.year, month.month)
+
+
+def month_start(day, months=0):
+    """First day of the month of day, shifted by an amount of months."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def stored_columns():
+    """Names of the sat_images columns that are not generated by PostGIS."""
+    return [column.name for column in db.SatImage.__table__.columns if column.computed is None]
+
+
+def list_partitions(session):
+    """
+    Lists the attached monthly partitions of sat_images.
+
+    :param Session session
+        Session to execute the statements in.
+
+    returns list of (name, month) tuples ordered by month.
+    """
+    rows = session.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'sat_images'
+    """)).scalars()
+
+    partitions = []
+    for name in rows:
+        if name == DEFAULT_PARTITION:
+            continue
+        year, month = name[len('sat_images_y'):].split('m')
+        partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda i: i[1])
+
+
+def create_partition(session, month):
+    """
+    Creates the partition of the month if it does not exist yet.
+    Images of the month already stored in the default partition are moved into it,
+    the spatial and B-tree indexes of sat_images are created on it as a partition.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param date month
+        Any day of the month to create the partition for.
+
+    returns bool, True if the partition was created.
+    """
+    start = month_start(month)
+    end = month_start(month, 1)
+    name = partition_name(start)
+
+    if name in [i[0] for i in list_partitions(session)]:
+        return False
+
+    # a new partition may not overlap rows still in the default partition,
+    # the generated columns are left out and computed again on insert
+    columns = ', '.join(stored_columns())
+    bounds = {'start': start, 'end': end}
+    session.execute(text(f"""
+        CREATE TEMP TABLE {name}_moved AS
+        SELECT {columns} FROM {DEFAULT_PARTITION}
+        WHERE time_acquired >= :start AND time_acquired < :end
+    """), bounds)
+    session.execute(text(f"""
+        DELETE FROM {DEFAULT_PARTITION}
+        WHERE time_acquired >= :start AND time_acquired < :end
+    """), bounds)
+    session.execute(text(
+        f"CREATE TABLE {name} PARTITION OF sat_images "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"))
+    session.execute(text(
+        f'INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_moved'))
+    session.execute(text(f'DROP TABLE {name}_moved'))
+
+    LOGGER.info('Created partition {}'.format(name))
+    return True
+
+
+def create_partitions(session, start, months):
+    """
+    Creates the monthly partitions from the month of start on.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param date start
+        Any day of the first month to create a partition for.
+    :param int months
+        Amount of months to create partitions for.
+
+    returns list of names of the created partitions.
+    """
+    created = []
+    for i in range(months):
+        month = month_start(start, i)
+        if create_partition(session, month):
+            created.append(partition_name(month))
+    return created
+
+
+def detach_partitions(session, before):
+    """
+    Detaches the monthly partitions that end before or on a date, the detached tables
+    are kept and can be archived or dropped. Links, image counts and footprint unions of
+    the detached images are removed, a partition holds every image of its days.
+    Moves the data generation forward if any partition was detached.
+
+    :param Session session
+        Session to execute the statements in, the caller commits.
+    :param date before
+        Partitions of months ending on or before this date are detached.
+
+    returns list of names of the detached partitions.
+    """
+    detached = []
+    for name, month in list_partitions(session):
+        end = month_start(month, 1)
+        if end > before:
+            continue
+        if not detached:
+            db.lock_derived_tables(session)
+        session.execute(text(f'ALTER TABLE sat_images DETACH PARTITION {name}'))
+        for table in (db.sat_images_countries, db.sat_images_cities, db.sat_images_land_cover):
+            session.execute(text(
+                f'DELETE FROM {table.name} WHERE sat_image_id IN (SELECT id FROM {name})'))
+        for model in (db.ImageCount, db.FootprintUnion):
+            session.execute(delete(model).where(model.day >= month, model.day < end))
+        LOGGER.info('Detached partition {}'.format(name))
+        detached.append(name)
+
+    if detached:
+        db.bump_data_generation(session)
+    return detached
+
+
+def arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of sat_images")
+    parser.add_argument(
+        "--create_months",
+        type=int,
+        required=False,
+        default=3,
+        help="Optional. Amount of months from the current month on to create partitions for."
+        " Defaults to 3.")
+
+    parser.add_argument(
+        "--start_date",
+        required=False,
+        default=date.today().isoformat(),
+        help="Optional. Any day of the first month to create a partition for,"
+        " in ISO (YYYY-MM-DD) format. Defaults to today.")
+
+    parser.add_argument(
+        "--detach_before",
+        required=False,
+        help="Optional. Detach the partitions of months ending before this date,"
+        " in ISO (YYYY-MM-DD) format.")
+
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = arguments()
+
+    with db.session_scope() as session:
+        create_partitions(session, date.fromisoformat(args.start_date), args.create_months)
+        if args.detach_before:
+            detach_partitions(session, date.fromisoformat(args.detach_before))
@@ -1,7 +1,12 @@
 from concurrent.futures import ThreadPoolExecutor
+import datetime
+import hashlib
+import itertools
 import json
+import time
+import pandas as pd
 
-from api_importer import arg_parser
+from api_importer import arg_parser, pipeline
 from api_importer.clients import data, geojson_xyz
 from config import LOGGER
 from database import db
@@ -25,16 +30,47 @@ def importer(args):
                 End date of the time interval in ISO (YYYY-MM-DD) format (lte).
             float cc
                 Cloud cover value (0.0 - 1.0)
+            int batch_size
+                Number of image features written per transaction, 0 writes them one by one.
+            int time_shards
+                Amount of sub-windows the time interval is split in for concurrent searches.
+            int tiles
+                Amount of grid cells per side the AOI is split in for concurrent searches.
+            int max_tile_depth
+                Max amount of times a dense tile is split into quadrants.
+            int workers
+                Max amount of concurrent searches.
+            int parse_workers
+                Amount of threads parsing the found features.
+            int write_workers
+                Amount of threads writing batches to PostGIS.
+            int queue_size
+                Max amount of features waiting between the fetch and parse stage.
+            bool full_scan
+                Ignore the import ledger and search the whole time interval.
      '''
     session = db.get_db_session()
+    geojson_client = geojson_xyz.GeojsonXYZClient()
 
+    static_imported = False
     if not session.query(db.Country.iso).first():
-        country_table_import()
+        country_table_import(geojson_client)
+        static_imported = True
     if not session.query(db.City.id).first():
-        city_table_import()
+        city_table_import(geojson_client)
+        static_imported = True
 
     if not session.query(db.LandCoverClass.id).first():
-        land_cover_import()
+        land_cover_import(geojson_client)
+        static_imported = True
+
+    # links of already imported images to the new static layers
+    if static_imported:
+        with db.session_scope() as link_session:
+            db.link_sat_images(link_session)
+            db.refresh_footprint_unions(link_session)
+            db.refresh_image_counts(link_session)
+            db.bump_data_generation(link_session)
 
     data_api_importer(args)
 
@@ -52,12 +88,17 @@ def importer(args):
         session.query(db.SatImage).count()))
     LOGGER.info('Total of {} asset types in db'.format(
         session.query(db.AssetType).count()))
+    session.close()
 
 
 def data_api_importer(args):
     """
     Imports features from Planets Data API in AOI,TOI, below provided cloud cover threshold.
     If item types are provided only searches for those, otherwise searches all available item_types
+    Every AOI in the aoi_file is searched concurrently through one client,
+    images found for several AOIs are only written once.
+    Found features run through a fetch -> parse -> write pipeline connected by bounded
+    queues, slow PostGIS writes throttle the searches. A failing stage stops the import.
 
     :param object args
         ArgumentParser object containing:
@@ -71,27 +112,197 @@ def data_api_importer(args):
             End date of the time interval in ISO (YYYY-MM-DD) format (lte).
         float cc
             Cloud cover value (0.0 - 1.0)
+        int batch_size
+            Number of image features written per transaction, 0 writes them one by one.
+        int time_shards
+            Amount of sub-windows the time interval is split in for concurrent searches.
+        int tiles
+            Amount of grid cells per side the AOI is split in for concurrent searches.
+        int max_tile_depth
+            Max amount of times a dense tile is split into quadrants.
+        int workers
+            Max amount of concurrent searches.
+        int parse_workers
+            Amount of threads parsing the found features.
+        int write_workers
+            Amount of threads writing batches to PostGIS.
+        int queue_size
+            Max amount of features waiting between the fetch and parse stage.
+        bool full_scan
+            Ignore the import ledger and search the whole time interval.
     """
 
-    client = data.DataAPIClient(api_key=args.api_key)
-    geometry = geojson_import(args.aoi_file)
+    client = data.DataAPIClient(api_key=args.api_key, pool_maxsize=args.workers)
+    aois = aoi_import(args.aoi_file)
 
-    features = client.get_features(start_date=args.start_date,
-                                   end_date=args.end_date,
-                                   cc=args.cc,
-                                   geometry=geometry)
+    search = (datetime.date.fromisoformat(args.start_date),
+              datetime.date.fromisoformat(args.end_date),
+              args.cc)
+    published_after = {} if args.full_scan else load_watermarks(aois, *search)
 
-    def to_postgis(feature):
-        feature.to_satellite_model()
-        feature.to_item_asset_model()
-        feature.to_sat_image_model()
+    aoi_features = client.iter_aoi_features(aois=aois,
+                                            start_date=args.start_date,
+                                            end_date=args.end_date,
+                                            cc=args.cc,
+                                            time_shards=args.time_shards,
+                                            tiles=args.tiles,
+                                            max_tile_depth=args.max_tile_depth,
+                                            workers=args.workers,
+                                            published_after=published_after)
 
-    with ThreadPoolExecutor(4) as executor:
-        executor.map(to_postgis, features)
+    stats = {aoi: {'images': 0, 'seconds': 0.0, 'watermarks': {}} for aoi in aois}
+
+    def parse(batch):
+        aoi_ids = [aoi for aoi, _ in batch]
+        features = data.ImageDataFeature.from_features([f for _, f in batch], client=client)
+        return list(zip(aoi_ids, features))
+
+    def write(batch):
+        features = [feature for _, feature in batch]
+        if args.batch_size:
+            data.to_postgis_bulk(features)
+        else:
+            for feature in features:
+                feature.to_satellite_model()
+                feature.to_item_asset_model()
+                feature.to_sat_image_model()
+        return batch
+
+    written = pipeline.Pipeline(aoi_features, name='fetch', maxsize=args.queue_size)\
+        .add_stage('parse', parse, workers=args.parse_workers,
+                   batch_size=args.batch_size or 1,
+                   maxsize=args.write_workers)\
+        .add_stage('write', write, workers=args.write_workers,
+                   maxsize=args.write_workers)
+
+    for _ in _track_aois(itertools.chain.from_iterable(written), stats, start=time.time()):
+        pass
+
+    # cached app results of the earlier data are no longer used
+    if sum(stat['images'] for stat in stats.values()) > 0:
+        with db.session_scope() as session:
+            db.bump_data_generation(session)
+
+    # only reached when every feature is written
+    save_watermarks(aois, stats, *search)
+
+    for aoi, stat in stats.items():
+        LOGGER.info('AOI {}: {} unique images in {:.1f} seconds ({:.1f} images/s)'.format(
+            aoi, stat['images'], stat['seconds'],
+            stat['images'] / stat['seconds'] if stat['seconds'] else 0.0))
+
+
+def _track_aois(aoi_features, stats, start):
+    """
+    Yields the features of (aoi_id, feature) tuples and counts per AOI
+    the amount of images and the seconds from start until its last image was imported.
+    Keeps the latest acquired and published timestamp per AOI and item type.
+    """
+    for aoi, feature in aoi_features:
+        stats[aoi]['images'] += 1
+        stats[aoi]['seconds'] = time.time() - start
+
+        watermark = stats[aoi]['watermarks'].setdefault(feature.item_type_id, [None, None])
+        watermark[0] = _latest(watermark[0], feature.time_acquired)
+        watermark[1] = _latest(watermark[1], feature.published)
+        yield feature
+
+
+def _latest(current, timestamp):
+    if timestamp is None or pd.isnull(timestamp):
+        return current
+    if current is None:
+        return timestamp
+    return max(current, timestamp)
+
+
+def aoi_hash(geometry):
+    """Identifies an AOI by the sha256 hash of its GeoJSON geometry, independent of key order."""
+    return hashlib.sha256(json.dumps(geometry, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_watermarks(aois, start_date, end_date, cc):
+    """
+    Reads the import ledger for the AOIs searched with the same cloud cover and
+    a time interval overlapping this one. Only the overlap was imported before,
+    the rest of this time interval may hold items published before the watermark.
+
+    :param dict aois
+        GeoJSON geometries keyed by AOI id.
+    :param date start_date
+        Start date of the searched time interval.
+    :param date end_date
+        End date of the searched time interval.
+    :param float cc
+        Searched cloud cover value.
 
+    returns dict with AOI id as key and a dict of item type to ``data.Watermark``
+    of the overlap and the latest imported publication as value.
+    """
+    hashes = {aoi_hash(geometry): aoi for aoi, geometry in aois.items()}
+
+    with db.session_scope() as session:
+        rows = session.query(db.ImportLedger)\
+            .filter(db.ImportLedger.aoi_hash.in_(list(hashes)))\
+            .filter(db.ImportLedger.cc == cc,
+                    db.ImportLedger.start_date < end_date,
+                    db.ImportLedger.end_date > start_date)\
+            .filter(db.ImportLedger.published.isnot(None))\
+            .all()
+
+        watermarks = {}
+        for row in rows:
+            watermarks.setdefault(hashes[row.aoi_hash], {})[row.item_type_id] = data.Watermark(
+                start_date=max(start_date, row.start_date).isoformat(),
+                end_date=min(end_date, row.end_date).isoformat(),
+                published=row.published.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+
+    for aoi, item_types in watermarks.items():
+        LOGGER.info('AOI {}: searching {} item types from their watermark'.format(aoi, len(item_types)))
+    return watermarks
+
+
+def save_watermarks(aois, stats, start_date, end_date, cc):
+    """
+    Moves the import ledger forward to the latest acquired/published timestamp
+    per AOI, item type and cloud cover, covering this run's time interval.
+
+    :param dict aois
+        GeoJSON geometries keyed by AOI id.
+    :param dict stats
+        Per AOI id the stats collected by ``_track_aois``.
+    :param date start_date
+        Start date of the searched time interval.
+    :param date end_date
+        End date of the searched time interval.
+    :param float cc
+        Searched cloud cover value.
+    """
+    rows = [{'aoi_hash': aoi_hash(aois[aoi]),
+             'item_type_id': item_type,
+             'start_date': start_date,
+             'end_date': end_date,
+             'cc': cc,
+             'acquired': _naive_utc(acquired),
+             'published': _naive_utc(published)}
+            for aoi, stat in stats.items()
+            for item_type, (acquired, published) in stat['watermarks'].items()]
+
+    with db.session_scope() as session:
+        db.upsert_import_ledger(session, rows)
+
+
+def _naive_utc(timestamp):
+    if timestamp is None:
+        return None
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_pydatetime()
 
-def country_table_import():
-    client = geojson_xyz.GeojsonXYZClient()
+
+def country_table_import(client=None):
+    client = client or geojson_xyz.GeojsonXYZClient()
     features = client.get_countries()
 
     def to_postgis(feature):
@@ -100,9 +311,12 @@ def country_table_import():
     with ThreadPoolExecutor(4) as executor:
         executor.map(to_postgis, features)
 
+    with db.session_scope() as session:
+        db.refresh_country_parts(session)
+
 
-def city_table_import():
-    client = geojson_xyz.GeojsonXYZClient()
+def city_table_import(client=None):
+    client = client or geojson_xyz.GeojsonXYZClient()
     features = client.get_cities()
 
     def to_postgis(feature):
@@ -111,9 +325,12 @@ def city_table_import():
     with ThreadPoolExecutor(4) as executor:
         executor.map(to_postgis, features)
 
+    with db.session_scope() as session:
+        db.refresh_city_buffers(session)
+
 
-def land_cover_import():
-    client = geojson_xyz.GeojsonXYZClient()
+def land_cover_import(client=None):
+    client = client or geojson_xyz.GeojsonXYZClient()
     features = client.get_land_cover_classes()
 
     def to_postgis(feature):
@@ -121,6 +338,9 @@ def land_cover_import():
 
     with ThreadPoolExecutor(4) as executor:
         executor.map(to_postgis, features)
+
+    with db.session_scope() as session:
+        db.refresh_land_cover_parts(session)
         
 
 
@@ -130,6 +350,29 @@ def geojson_import(aoi_file):
     return geometry['features'][0]['geometry']
 
 
+def aoi_import(aoi_file):
+    """
+    Reads every feature of a geojson FeatureCollection as an AOI.
+    AOIs are keyed by the feature id, the name property or else their position in the file.
+
+    :param str aoi_file
+        Path to geojson file containing AOIs
+
+    returns dict with AOI id as key and GeoJSON geometry as value.
+    """
+    with open(aoi_file) as f:
+        collection = json.load(f)
+
+    aois = {}
+    for i, feature in enumerate(collection['features']):
+        properties = feature.get('properties') or {}
+        aoi = str(feature.get('id') or properties.get('name') or i)
+        if aoi in aois:
+            aoi = '{}_{}'.format(aoi, i)
+        aois[aoi] = feature['geometry']
+    return aois
+
+
 if __name__ == "__main__":
     args = arg_parser.parser()
     importer(args)
@@ -1,4 +1,14 @@
 import os
+import pytest
 
 os.environ['DB_NAME'] = 'planet_test'
-os.environ['PL_API_KEY'] = 'PLAK084944b07bb24c0ba7af02e88062cbf1'
\ No newline at end of file
+os.environ['PL_API_KEY'] = 'PLAK084944b07bb24c0ba7af02e88062cbf1'
+# query results are only cached in memory, see clear_result_cache
+os.environ['CACHE_DIR'] = ''
+
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    """every test starts with an empty query result cache, test databases share generation 0"""
+    from app import cache
+    cache.RESULT_CACHE.clear()
@@ -1,5 +1,6 @@
 import pytest
 from datetime import datetime
+from sqlalchemy import event
 from shapely.geometry import Point
 from geoalchemy2.shape import from_shape, to_shape
 from database import db
@@ -22,7 +23,7 @@ def test_query_distinc_satellite_names(db_session, setup_test_db):
         db_session.commit()
 
     # act
-    sat_names = query.query_distinct_satellite_names(db_session)
+    sat_names = query.query_distinct_satellite_names(db_session, 0)
 
     # assert
     assert sat_names == ['fake', 'fake2']
@@ -56,6 +57,8 @@ def test_query_cities_with_filter(db_session, setup_models, city_berlin):
     # add Berlin to cities table in db
     db_session.add(city_berlin)
     db_session.commit()
+    db.rebuild_links(db_session)
+    db_session.commit()
 
     # setup filters
     cloud_cover = 1.0
@@ -72,6 +75,35 @@ def test_query_cities_with_filter(db_session, setup_models, city_berlin):
     assert gdf_cities['name'][0] == 'Berlin'
 
 
+def test_query_cities_with_filter_radius(db_session, setup_models, city_berlin):
+    """test that every stored buffer radius has its own links"""
+    db_session.add(city_berlin)
+    db_session.commit()
+    db.refresh_city_buffers(db_session, [30000, 50000])
+    db.link_sat_images(db_session)
+    db_session.commit()
+    args = (db_session, ['Planetscope'], 1.0, datetime(2022, 9, 1), datetime.utcnow(), 'Germany')
+
+    gdf_30km = query.query_cities_with_filters(*args, radius=30000)
+    gdf_50km = query.query_cities_with_filters(*args, radius=50000)
+
+    assert gdf_30km['name'].tolist() == gdf_50km['name'].tolist() == ['Berlin']
+    assert gdf_50km.to_crs(3035).area[0] > gdf_30km.to_crs(3035).area[0]
+
+
+def test_query_all_countries_catalog(db_session, setup_models):
+    """test that the catalog holds iso, name and bbox and the geometry is only fetched per iso"""
+    query.query_all_countries.clear()
+    query.query_country_geom.clear()
+
+    countries = query.query_all_countries(db_session, 0)
+    geom = query.query_country_geom(db_session, 0, countries[0].iso)
+
+    assert [(i.iso, i.name) for i in countries] == [('DEU', 'Germany')]
+    assert countries[0].bbox == pytest.approx(geom.bounds)
+    assert query.query_country_geom(db_session, 0, 'XXX') is None
+
+
 def test_query_sat_images_with_filter(db_session, setup_models):
 
     # setup filters
@@ -98,6 +130,50 @@ def test_query_sat_images_with_filter(db_session, setup_models):
     assert gdf_images['land_cover_class'][0] == ['fake_area']
     assert gdf_images['geom'].any()
 
+def test_query_sat_images_with_filter_single_statement(db_session, setup_models):
+    """test that all columns are fetched in one round trip"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_session.bind, 'before_cursor_execute', count)
+    try:
+        gdf_images = query.query_sat_images_with_filter(
+            db_session, ['Planetscope'], 0.99, datetime(2022, 9, 2), datetime.utcnow(), 'Germany')
+    finally:
+        event.remove(db_session.bind, 'before_cursor_execute', count)
+
+    # the data generation and filter set statements of the cache and filter context run as well
+    sat_image_selects = [i for i in statements
+                         if i.lstrip().startswith('SELECT') and 'FROM sat_images' in i]
+    assert len(sat_image_selects) == 1
+    assert gdf_images['land_cover_class'][0] == ['fake_area']
+
+def test_filter_context_materialized_once(db_session, setup_models):
+    """test that the matching images are stored once per filters and shared by the queries"""
+    filters = (['Planetscope'], 0.99, datetime(2022, 9, 2), datetime(2022, 11, 1), 'Germany')
+
+    context = query.filter_context(*filters)
+    created = db.materialize_filtered_images(db_session, context.key, *filters)
+    gdf_cities = query.query_cities_with_filters(db_session, *filters)
+    gdf_land_cover = query.query_land_cover_classes_with_filters(db_session, *filters)
+
+    rows = db_session.query(db.filtered_images).all()
+
+    assert not created
+    assert [(i.filter_key, i.sat_image_id) for i in rows] == [(context.key, 'ss20221002')]
+    assert gdf_cities.empty
+    assert gdf_land_cover['total_images'][0] == 1
+
+
+@pytest.mark.parametrize('cloud_cover, expected_output', [(0.7, 1), (0.6, 0)])
+def test_query_image_counts(db_session, setup_models, cloud_cover, expected_output):
+    df_counts = query.query_image_counts(
+        db_session, ['Planetscope'], cloud_cover, datetime(2022, 9, 1), datetime.utcnow(), 'Germany')
+
+    assert df_counts['total'].sum() == expected_output
+
 def test_query_images_with_filters_queries_unique_image_ids(db_session, setup_models):
     
     # setup filters
@@ -129,3 +205,33 @@ def test_query_land_cover_classes_with_filters(db_session, setup_models):
     assert gdf_land_cover['featureclass'][0] == 'fake_area'
     assert gdf_land_cover['geom'].any()
 
+
+
+def test_query_land_cover_geom_dissolved_prepared(db_session, setup_models):
+    """test that the prepared statement is reused and names are bound, not formatted"""
+    gdf_land_cover = query.query_land_cover_geom_dissolved(db_session, 'Germany')
+    query.cache.RESULT_CACHE.clear()
+    gdf_quoted = query.query_land_cover_geom_dissolved(db_session, "Côte d'Ivoire")
+
+    assert gdf_land_cover['featureclass'].tolist() == ['fake_area']
+    assert gdf_quoted.empty
+
+
+@pytest.mark.parametrize('cloud_cover, expected_output', [(0.7, 1), (0.6, 0)])
+def test_query_land_cover_image_coverage(db_session, setup_models, cloud_cover, expected_output):
+    """test that the coverage is computed from the daily footprint unions"""
+    gdf_coverage = query.query_land_cover_classes_with_filters_image_coverage(
+        db_session, ['Planetscope'], cloud_cover, datetime(2022, 9, 1), datetime.utcnow(), 'Germany')
+
+    assert len(gdf_coverage.index) == expected_output
+
+
+def test_query_land_cover_grid_coverage(db_session, setup_models):
+    """test that the grid coverage stays within its error bound of the exact coverage"""
+    args = (db_session, ['Planetscope'], 0.7, datetime(2022, 9, 1), datetime.utcnow(), 'Germany')
+    gdf_exact = query.query_land_cover_classes_with_filters_image_coverage(*args)
+    gdf_grid = query.query_land_cover_grid_coverage(*args, resolution=5000)
+
+    assert gdf_grid['featureclass'].tolist() == gdf_exact['featureclass'].tolist()
+    assert abs(gdf_grid['coverage_percentage'][0] - gdf_exact['coverage_percentage'][0]) \
+        <= gdf_grid['error_percentage'][0]
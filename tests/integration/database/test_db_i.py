@@ -1,8 +1,8 @@
 
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import os
-from datetime import datetime
+from datetime import datetime, date
 from geoalchemy2.shape import from_shape, to_shape
 from shapely.geometry import shape
 import geopandas as gpd
@@ -11,7 +11,7 @@ import psycopg2
 
 
 from config import POSTGIS_URL
-from database import db
+from database import db, partitions
 
 from tests.resources import fake_feature
 
@@ -148,6 +148,13 @@ def setup_models(db_session,
     db_session.add(city)
     db_session.add(land_cover_class)
     db_session.commit()
+    db.refresh_country_parts(db_session)
+    db.refresh_land_cover_parts(db_session)
+    db.refresh_city_buffers(db_session)
+    db.link_sat_images(db_session)
+    db.refresh_footprint_unions(db_session)
+    db.refresh_image_counts(db_session)
+    db_session.commit()
     return db_session
 
 
@@ -209,7 +216,7 @@ def test_SatImage(db_session, setup_models, geom_shape):
     assert [i.featureclass for i in query.land_cover_class] == ['fake_area']
     assert [i.iso for i in query.countries] == ['DEU']
 
-    # properties
+    # derived columns
     assert query.lon == 8.804454520157185
     assert query.lat == 55.474220203855445
     assert query.area_sqkm == 1244037.118
@@ -256,6 +263,8 @@ def test_City_success(db_session, setup_models, city_berlin):
     # add city within germany to test sat_images spatial relationship
     db_session.add(city_berlin)
     db_session.commit()
+    db.rebuild_links(db_session)
+    db_session.commit()
 
     query_with_berlin = db_session.query(db.City).filter_by(name='Berlin').one()
 
@@ -302,3 +311,105 @@ def test_prefix_insert(db_session, setup_models, sat_image):
 
     # assert query only returns one item
     assert query
+
+
+def test_upsert_import_ledger(db_session):
+    """test that the ledger only moves forward and covers the latest time interval"""
+    row = {'aoi_hash': 'a' * 64,
+           'item_type_id': 'PSScene',
+           'start_date': date(2022, 10, 1),
+           'end_date': date(2022, 10, 2),
+           'cc': 1.0,
+           'acquired': datetime(2022, 10, 2),
+           'published': datetime(2022, 10, 3)}
+
+    db.upsert_import_ledger(db_session, [row])
+    db.upsert_import_ledger(db_session, [dict(row, start_date=date(2022, 10, 2),
+                                              end_date=date(2022, 10, 3),
+                                              acquired=datetime(2022, 10, 1),
+                                              published=datetime(2022, 10, 4))])
+    db_session.commit()
+
+    query = db_session.query(db.ImportLedger).one()
+
+    assert (query.start_date, query.end_date) == (date(2022, 10, 2), date(2022, 10, 3))
+    assert query.acquired == datetime(2022, 10, 2)
+    assert query.published == datetime(2022, 10, 4)
+
+
+def test_upsert_import_ledger_per_cloud_cover(db_session):
+    """test that searches with another cloud cover get their own watermark"""
+    row = {'aoi_hash': 'a' * 64,
+           'item_type_id': 'PSScene',
+           'start_date': date(2022, 10, 1),
+           'end_date': date(2022, 10, 2),
+           'cc': 1.0,
+           'acquired': datetime(2022, 10, 2),
+           'published': datetime(2022, 10, 3)}
+
+    db.upsert_import_ledger(db_session, [row, dict(row, cc=0.5)])
+    db_session.commit()
+
+    assert db_session.query(db.ImportLedger).count() == 2
+
+
+def test_link_sat_images_only_given_images(db_session, setup_models, sat_image_nl_germany_border):
+    """test that incremental linking only links the new images, once"""
+    db_session.add(sat_image_nl_germany_border)
+    db_session.commit()
+
+    db.link_sat_images(db_session, ['fake_not_in_bounds'])
+    db.link_sat_images(db_session, ['fake_not_in_bounds'])
+    db_session.commit()
+
+    links = db_session.query(db.sat_images_countries).all()
+
+    assert [(i.sat_image_id, i.country_iso) for i in links] == [('ss20221002', 'DEU')]
+
+
+def test_refresh_country_parts(db_session, setup_models, country):
+    """test that the parts are small and together cover the country"""
+    parts = db_session.query(db.CountryPart).all()
+
+    assert len(parts) > 1
+    assert all(i.country_iso == 'DEU' for i in parts)
+    assert max(len(to_shape(i.geom).exterior.coords) for i in parts) <= db.SUBDIVIDE_MAX_VERTICES
+    assert sum(to_shape(i.geom).area for i in parts) == pytest.approx(to_shape(country.geom).area)
+
+
+def test_refresh_image_counts(db_session, setup_models):
+    """test that recounting the same image keeps the count"""
+    db.refresh_image_counts(db_session, ['ss20221002'])
+    db_session.commit()
+
+    query = db_session.query(db.ImageCount).one()
+
+    assert query.country_iso == 'DEU'
+    assert query.sat_id == 's145'
+    assert query.item_type_id == 'PSScene'
+    assert query.day == datetime(2022, 10, 1).date()
+    assert query.cc_bucket == 7
+    assert query.total == 1
+
+
+def test_sat_images_partitioned(db_session, setup_models):
+    """test that an image is moved out of the default partition when its month gets one"""
+    partitions.create_partition(db_session, datetime(2022, 10, 1).date())
+    db_session.commit()
+
+    rows = db_session.execute(text(
+        'SELECT tableoid::regclass::text, id FROM sat_images')).all()
+
+    assert [tuple(i) for i in rows] == [('sat_images_y2022m10', 'ss20221002')]
+
+
+def test_refresh_footprint_unions(db_session, setup_models, geom_shape):
+    """test that recomputing the cell of the same image keeps its footprint"""
+    db.refresh_footprint_unions(db_session, ['ss20221002'])
+    db_session.commit()
+
+    query = db_session.query(db.FootprintUnion).one()
+
+    assert (query.country_iso, query.sat_id, query.day, query.cc_bucket) == \
+        ('DEU', 's145', datetime(2022, 10, 1).date(), 7)
+    assert to_shape(query.geom).equals(geom_shape)
@@ -5,7 +5,7 @@ import httplib2
 from concurrent.futures import ThreadPoolExecutor
 
 from database import db
-from api_importer.clients.data import DataAPIClient, ImageDataFeature
+from api_importer.clients.data import DataAPIClient, ImageDataFeature, to_postgis_bulk
 
 from tests.integration.database.test_db_i import asset_type, db_session, setup_test_db
 # TODO test rate limit
@@ -95,3 +95,29 @@ def test_to_postgis_in_parallel_i(fake_response_list, setup_test_db, db_session)
     assert sorted(fake_item_type_list) == sorted([i.id for i in item_types_in_db])
     assert sorted(fake_image_list) == sorted([i.id for i in sat_images_in_db])
     assert sorted(fake_asset_type_list) == sorted(i.id for i in asset_types_in_db)
+
+
+def test_to_postgis_bulk_i(fake_response_list, setup_test_db, db_session):
+    """
+    Test if all metadata from a batch of features is imported with multi-row inserts,
+    and that writing the same batch twice does not raise or duplicate rows.
+    """
+    fake_features_list = [ImageDataFeature(f) for f in fake_response_list]
+
+    fake_sat_list = set([f.sat_id for f in fake_features_list])
+    fake_item_type_list = set([f.item_type_id for f in fake_features_list])
+    fake_image_list = set([f.id for f in fake_features_list])
+    fake_asset_type_list = set([i for f in fake_features_list for i in f.asset_types])
+
+    to_postgis_bulk(fake_features_list)
+    to_postgis_bulk(fake_features_list)
+
+    satellites_in_db = db_session.query(db.Satellite)
+    item_types_in_db = db_session.query(db.ItemType)
+    sat_images_in_db = db_session.query(db.SatImage)
+    asset_types_in_db = db_session.query(db.AssetType)
+
+    assert sorted(fake_sat_list) == sorted([i.id for i in satellites_in_db])
+    assert sorted(fake_item_type_list) == sorted([i.id for i in item_types_in_db])
+    assert sorted(fake_image_list) == sorted([i.id for i in sat_images_in_db])
+    assert sorted(fake_asset_type_list) == sorted(i.id for i in asset_types_in_db)
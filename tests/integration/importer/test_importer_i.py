@@ -42,6 +42,58 @@ def fake_args(arg_input):
         required=False,
         default=1.0)
 
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        required=False,
+        default=500)
+
+    parser.add_argument(
+        "--time_shards",
+        type=int,
+        required=False,
+        default=1)
+
+    parser.add_argument(
+        "--tiles",
+        type=int,
+        required=False,
+        default=1)
+
+    parser.add_argument(
+        "--max_tile_depth",
+        type=int,
+        required=False,
+        default=0)
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=4)
+
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        required=False,
+        default=2)
+
+    parser.add_argument(
+        "--write_workers",
+        type=int,
+        required=False,
+        default=2)
+
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        required=False,
+        default=1000)
+
+    parser.add_argument(
+        "--full_scan",
+        action='store_true')
+
     return parser.parse_args(arg_input)
 
 
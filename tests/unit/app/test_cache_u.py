@@ -0,0 +1,93 @@
+import os
+import pytest
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import shape
+
+from app import cache
+from tests.resources import fake_feature
+
+
+@pytest.fixture()
+def geom_shape():
+    return shape(fake_feature.feature['geometry'])
+
+
+@pytest.fixture()
+def gdf_images(geom_shape):
+    return gpd.GeoDataFrame({'id': ['a', 'b'],
+                             'land_cover_class': [['fake_area'], []],
+                             'geom': [geom_shape, geom_shape]},
+                            geometry='geom', crs=4326)
+
+
+def test_result_cache_returns_copies(gdf_images):
+    """test that callers changing a cached frame do not change the cache"""
+    result_cache = cache.ResultCache(directory=None)
+    result_cache.put('key', gdf_images)
+
+    df = result_cache.get('key')
+    df['interval'] = 1
+
+    assert 'interval' not in result_cache.get('key')
+    assert result_cache.get('other') is None
+
+
+def test_result_cache_lru_eviction():
+    """test that the least recently used frames are evicted beyond the byte limit"""
+    frames = {i: pd.DataFrame({'total': range(100)}) for i in 'abc'}
+    nbytes = cache.frame_nbytes(frames['a'])
+    result_cache = cache.ResultCache(directory=None, max_bytes=2 * nbytes)
+
+    result_cache.put('a', frames['a'])
+    result_cache.put('b', frames['b'])
+    result_cache.get('a')
+    result_cache.put('c', frames['c'])
+
+    assert result_cache.get('b') is None
+    assert result_cache.get('a') is not None
+    assert result_cache.get('c') is not None
+    assert result_cache.nbytes == 2 * nbytes
+
+
+def test_result_cache_disk(tmp_path, gdf_images):
+    """test that results survive a new cache on the same directory"""
+    cache.ResultCache(directory=str(tmp_path)).put('key', gdf_images)
+
+    df = cache.ResultCache(directory=str(tmp_path)).get('key')
+
+    assert isinstance(df, gpd.GeoDataFrame)
+    assert df.crs == 4326
+    assert df['land_cover_class'].tolist() == [['fake_area'], []]
+    assert df.geometry.equals(gdf_images.geometry)
+    assert os.listdir(tmp_path) == ['key.geo.parquet']
+
+
+def test_result_cache_disk_eviction(tmp_path):
+    df = pd.DataFrame({'total': range(1000)})
+    result_cache = cache.ResultCache(directory=str(tmp_path), disk_max_bytes=1)
+
+    result_cache.put('a', df)
+    result_cache.put('b', df)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_cached(monkeypatch):
+    """test that results are keyed by arguments and data generation, not by the session"""
+    generation = [1]
+    calls = []
+    monkeypatch.setattr(cache.db, 'get_data_generation', lambda session: generation[0])
+
+    @cache.cached(cache=cache.ResultCache(directory=None))
+    def query_totals(_session, sat_names):
+        calls.append(sat_names)
+        return pd.DataFrame({'total': [len(calls)]})
+
+    query_totals('session', ['Planetscope'])
+    df = query_totals(_session='other session', sat_names=['Planetscope'])
+    generation[0] = 2
+    query_totals('session', ['Planetscope'])
+
+    assert df['total'][0] == 1
+    assert calls == [['Planetscope'], ['Planetscope']]
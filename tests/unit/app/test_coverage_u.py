@@ -0,0 +1,113 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely import affinity
+from shapely.geometry import box, Point
+
+from app import coverage
+
+
+@pytest.fixture
+def gdf_land_cover():
+    # two 10 x 10 km classes next to each other in EPSG:3035
+    return gpd.GeoDataFrame({'featureclass': ['Forest', 'Urban'],
+                             'geom': [box(4000000, 3000000, 4010000, 3010000),
+                                      box(4010000, 3000000, 4020000, 3010000)]},
+                            geometry='geom', crs=3035).to_crs(4326)
+
+
+def footprints(*geoms):
+    return gpd.GeoDataFrame({'geom': list(geoms)}, geometry='geom', crs=3035).to_crs(4326)
+
+
+def test_grid_axes():
+    xs, ys = coverage.grid_axes((0, 0, 1000, 500), 250)
+
+    assert xs.tolist() == [125, 375, 625, 875]
+    assert ys.tolist() == [125, 375]
+
+
+def test_rasterize_only_cells_in_bounds():
+    xs, ys = coverage.grid_axes((0, 0, 1000, 1000), 100)
+
+    mask = coverage.rasterize(box(0, 0, 500, 300), xs, ys)
+
+    assert mask.shape == (10, 10)
+    assert mask.sum() == 15
+    assert mask[:3, :5].all()
+
+
+def test_rasterize_empty():
+    xs, ys = coverage.grid_axes((0, 0, 1000, 1000), 100)
+
+    assert not coverage.rasterize(box(0, 0, 0, 0).buffer(-1), xs, ys).any()
+
+
+def test_grid_coverage(gdf_land_cover):
+    """test that the coverage of every class is within the reported error of the exact coverage"""
+    gdf_footprints = footprints(box(4002500, 3000000, 4007500, 3010000),
+                                box(4005000, 3000000, 4015000, 3005000))
+
+    gdf = coverage.grid_coverage(gdf_land_cover, gdf_footprints, resolution=500)
+
+    assert gdf.crs == gdf_land_cover.crs
+    assert gdf.columns.tolist() == ['featureclass', 'geom', 'coverage_percentage', 'error_percentage']
+    exact = {'Forest': 62.5, 'Urban': 25.0}
+    for featureclass, percentage, error in gdf[['featureclass', 'coverage_percentage',
+                                                'error_percentage']].values:
+        assert abs(percentage - exact[featureclass]) <= error
+        assert 0 < error < 100
+
+    # the covered part of the class is drawn, like the exact coverage
+    forest = gdf.set_index('featureclass').to_crs(3035).geometry['Forest']
+    assert forest.area == pytest.approx(62.5e6, rel=1e-3)
+
+
+def test_grid_coverage_error_shrinks_with_resolution(gdf_land_cover):
+    gdf_footprints = footprints(box(4001234, 3001234, 4008765, 3008765))
+
+    coarse = coverage.grid_coverage(gdf_land_cover, gdf_footprints, resolution=2000)
+    fine = coverage.grid_coverage(gdf_land_cover, gdf_footprints, resolution=250)
+
+    assert fine['error_percentage'][0] < coarse['error_percentage'][0]
+    assert fine['featureclass'].tolist() == ['Forest']
+
+
+def test_grid_coverage_bound_holds(gdf_land_cover):
+    """test that the error bound holds for boundaries along the grid lines, through the cell
+    centers and for curved and rotated footprints"""
+    rng = np.random.default_rng(0)
+    forest = box(4000000, 3000000, 4010000, 3010000)
+    candidates = [box(4000000, 3000000, 4005000, 3010000),
+                  box(4000250, 3000250, 4004250, 3009250),
+                  Point(4004000, 3006000).buffer(3100),
+                  affinity.rotate(box(4001000, 3001000, 4007000, 3004000), 33)]
+    candidates += [affinity.rotate(box(x, y, x + w, y + h), angle)
+                   for x, y, w, h, angle in zip(rng.uniform(4000000, 4008000, 10),
+                                                rng.uniform(3000000, 3008000, 10),
+                                                rng.uniform(500, 6000, 10),
+                                                rng.uniform(500, 6000, 10),
+                                                rng.uniform(0, 90, 10))]
+
+    for footprint in candidates:
+        for resolution in (500, 1000):
+            gdf = coverage.grid_coverage(gdf_land_cover, footprints(footprint), resolution=resolution)
+            gdf = gdf[gdf['featureclass'] == 'Forest']
+            exact = 100 * footprint.intersection(forest).area / forest.area
+
+            assert abs(gdf['coverage_percentage'].iloc[0] - exact) <= gdf['error_percentage'].iloc[0]
+
+
+def test_coverage_bound():
+    assert coverage.coverage_bound(covered=50, total=100, covered_edge=0, total_edge=0) == 0
+    assert coverage.coverage_bound(covered=50, total=100, covered_edge=10, total_edge=0) == pytest.approx(10)
+    assert coverage.coverage_bound(covered=50, total=100, covered_edge=10, total_edge=10) \
+        == pytest.approx(100 * (60 / 90 - 0.5))
+    assert coverage.coverage_bound(covered=5, total=10, covered_edge=5, total_edge=10) == 100
+
+
+def test_grid_coverage_no_footprints(gdf_land_cover):
+    gdf = coverage.grid_coverage(gdf_land_cover, footprints())
+
+    assert gdf.empty
+    assert 'error_percentage' in gdf.columns
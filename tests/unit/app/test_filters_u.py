@@ -3,12 +3,12 @@ import pytest
 from datetime import datetime, timedelta
 
 from app import filters
-from test_query_u import FakeCountry
+from app.query import CountryEntry
 
 
 @pytest.fixture
 def fake_country():
-    return FakeCountry(iso='NL', name='Germany', total_images=50, geom='fake')
+    return CountryEntry(iso='DEU', name='Germany', bbox=(5.99, 47.3, 15.02, 54.98))
 
 def test_display_sat_name_filter():
     fake_sat_name_list = ['Planetscope', 'Skysat']
@@ -38,3 +38,31 @@ def test_display_country_filter(fake_country):
     country_filter = filters.display_country_filter([fake_country])
 
     assert country_filter == 'Germany'
+
+
+def test_display_city_buffer_filter():
+
+    radius = filters.display_city_buffer_filter([10000, 30000, 50000])
+
+    assert radius == 30000
+
+
+def test_display_city_buffer_filter_no_buffers():
+
+    radius = filters.display_city_buffer_filter([])
+
+    assert radius == 30000
+
+
+def test_display_coverage_engine_filter():
+
+    coverage_engine = filters.display_coverage_engine_filter()
+
+    assert coverage_engine == 'Exact'
+
+
+def test_display_grid_resolution_filter():
+
+    resolution = filters.display_grid_resolution_filter()
+
+    assert resolution == 1000
@@ -5,15 +5,13 @@ import plotly.graph_objects as go
 
 def test_plot_images_per_satellite():
 
-    fake_df_images = pd.DataFrame({'id': ['6050990_3363309_2022-11-02_2446'],
-                                   'cloud_cover': [0.0],
-                                   'pixel_res': [3.125],
-                                   'time_acquired': ['2022-11-02 10:44:57'],
-                                   'sat_name': ['Planetscope']})
-    fig, st_fig = plots.plot_images_per_satellite(fake_df_images)
+    fake_df_counts = pd.DataFrame({'sat_name': ['Planetscope', 'Skysat'],
+                                   'total': [12, 3]})
+    fig, st_fig = plots.plot_images_per_satellite(fake_df_counts)
 
     assert fig.__dict__['_data_objs'][0]['x'][0] == 'Planetscope'
-    assert fig.__dict__['_data_objs'][0]['y'][0] == 1
+    assert fig.__dict__['_data_objs'][0]['y'][0] == 12
+    assert fig.__dict__['_data_objs'][1]['y'][0] == 3
     
 
 
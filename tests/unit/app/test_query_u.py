@@ -1,4 +1,5 @@
 import pytest
+from types import SimpleNamespace
 from dataclasses import dataclass
 from datetime import datetime
 import pandas as pd
@@ -6,6 +7,7 @@ from shapely import geometry
 import geopandas as gpd
 from shapely.geometry import shape, Point
 from geoalchemy2.shape import from_shape
+from geoalchemy2.elements import WKBElement
 
 from app import query
 from tests.resources import fake_feature
@@ -125,3 +127,188 @@ def test_get_lat_lon_from_images(fake_image):
     lat_lon_list = query.get_lat_lon_from_images(gdf_images)
 
     assert lat_lon_list == [(-15.0452, 23.0235)]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.options = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execution_options(self, **options):
+        self.options.update(options)
+        return self
+
+
+class FakeBind:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    def connect(self):
+        return self.connection
+
+
+def test_iter_query_chunks(monkeypatch, geom_shape):
+    """test that chunks are read through a server-side cursor of the chunk size"""
+    calls = []
+
+    def fake_read_sql(sql, con, chunksize, params):
+        calls.append((sql, con.options, chunksize))
+        return iter([pd.DataFrame({'id': [1], 'geom': [memoryview(geom_shape.wkb)]}),
+                     pd.DataFrame({'id': [2], 'geom': [memoryview(geom_shape.wkb)]})])
+
+    monkeypatch.setattr(query.pd, 'read_sql', fake_read_sql)
+
+    chunks = list(query.iter_query_chunks('SELECT 1', FakeBind(), chunksize=1))
+
+    assert [i.id.tolist() for i in chunks] == [[1], [2]]
+    assert all(i.geometry.iloc[0].equals(geom_shape) for i in chunks)
+    assert calls == [('SELECT 1', {'stream_results': True, 'max_row_buffer': 1}, 1)]
+
+
+def test_to_geodataframe(monkeypatch, geom_shape):
+    """test that binary, hex and missing geometries are decoded over several slices"""
+    monkeypatch.setattr(query, 'WKB_DECODE_SLICE', 2)
+    df = pd.DataFrame({'id': [1, 2, 3],
+                       'geom': [memoryview(geom_shape.wkb), None, geom_shape.wkb_hex],
+                       'total_images': [4, 5, 6]})
+
+    gdf = query.to_geodataframe(df)
+
+    assert gdf.crs == 4326
+    assert gdf.geometry.name == 'geom'
+    assert gdf.columns.tolist() == ['id', 'geom', 'total_images']
+    assert gdf.geom.iloc[0].equals(geom_shape)
+    assert gdf.geom.iloc[1] is None
+    assert gdf.geom.iloc[2].equals(geom_shape)
+
+
+def test_to_geodataframe_wkb_elements(geom_shape):
+    """test that the WKBElements of ORM geometry columns are decoded, with and without SRID"""
+    df = pd.DataFrame({'id': [1, 2],
+                       'geom': [from_shape(geom_shape, srid=4326, extended=True),
+                                WKBElement(memoryview(geom_shape.wkb), srid=4326)]})
+
+    gdf = query.to_geodataframe(df)
+
+    assert gdf.geom.iloc[0].equals(geom_shape)
+    assert gdf.geom.iloc[1].equals(geom_shape)
+
+
+def test_to_geodataframe_empty():
+    gdf = query.to_geodataframe(pd.DataFrame({'id': [], 'geom': []}))
+
+    assert gdf.empty
+    assert gdf.geometry.name == 'geom'
+
+
+def test_reduce_chunks(geom_shape):
+    chunks = [gpd.GeoDataFrame({'id': [i]}, geometry=[geom_shape], crs=4326) for i in range(3)]
+
+    gdf = query.reduce_chunks(iter(chunks))
+
+    assert isinstance(gdf, gpd.GeoDataFrame)
+    assert gdf.crs == 4326
+    assert gdf.id.tolist() == [0, 1, 2]
+
+
+def test_reduce_chunks_func(geom_shape):
+    """test that only the reduced chunks are kept"""
+    chunks = [gpd.GeoDataFrame({'id': [i]}, geometry=[geom_shape], crs=4326) for i in range(3)]
+
+    df = query.reduce_chunks(iter(chunks), func=lambda chunk: pd.DataFrame(chunk[['id']]))
+
+    assert not isinstance(df, gpd.GeoDataFrame)
+    assert df.columns.tolist() == ['id']
+    assert df.index.tolist() == [0, 1, 2]
+
+
+def test_filter_context_key():
+    """test that the key identifies the filters independent of the satellite order"""
+    context = query.FilterContext(('Planetscope', 'Skysat'), 0.5,
+                                  datetime(2022, 9, 1), datetime(2022, 10, 1), 'Germany')
+
+    assert context.key == query.FilterContext(('Skysat', 'Planetscope'), 0.5, datetime(2022, 9, 1),
+                                              datetime(2022, 10, 1), 'Germany').key
+    assert context.key != query.FilterContext(('Planetscope', 'Skysat'), 0.6, datetime(2022, 9, 1),
+                                              datetime(2022, 10, 1), 'Germany').key
+    assert len(context.key) == 64
+
+
+class FakeDriverConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.info = {}
+        self.statements = []
+
+    def exec_driver_sql(self, statement, params=None):
+        self.statements.append((statement, params))
+        return SimpleNamespace(scalar=lambda: [{'Planning Time': 1.5, 'Execution Time': 20.0}])
+
+
+def test_prepared_query_prepares_once_per_connection(monkeypatch, geom_shape):
+    """test that the statement is prepared on the first read and executed with bound parameters"""
+    reads = []
+
+    def fake_read_sql(sql, con, params):
+        reads.append((sql, params))
+        return pd.DataFrame({'featureclass': ['fake_area'], 'geom': [geom_shape.wkb]})
+
+    monkeypatch.setattr(query.pd, 'read_sql', fake_read_sql)
+    monkeypatch.setattr(query, 'QUERY_TIMING', False)
+    bind = FakeBind()
+    bind.connection = FakeDriverConnection()
+
+    for _ in range(2):
+        gdf = query.LAND_COVER_DISSOLVED.read(bind, country_name="Côte d'Ivoire")
+
+    assert bind.connection.statements == [
+        ('PREPARE land_cover_dissolved (text) AS ' + query.LAND_COVER_DISSOLVED.sql, None)]
+    assert reads == [('EXECUTE land_cover_dissolved (%(country_name)s)',
+                      {'country_name': "Côte d'Ivoire"})] * 2
+    assert gdf['featureclass'][0] == 'fake_area'
+
+
+def test_prepared_query_parameters_in_order():
+    assert query.LAND_COVER_IMAGE_COVERAGE.execute_sql == \
+        'EXECUTE land_cover_image_coverage (%(country_name)s, %(sat_names)s, %(start_date)s, ' \
+        '%(end_date)s, %(cc_bucket)s)'
+    assert '$5' in query.LAND_COVER_IMAGE_COVERAGE.sql
+    assert '{' not in query.LAND_COVER_IMAGE_COVERAGE.sql
+
+
+def test_prepared_query_log_timing(caplog):
+    connection = FakeDriverConnection()
+
+    with caplog.at_level('INFO'):
+        query.LAND_COVER_DISSOLVED.log_timing(connection, {'country_name': 'Germany'})
+
+    assert connection.statements == [
+        ('EXPLAIN (ANALYZE, FORMAT JSON) EXECUTE land_cover_dissolved (%(country_name)s)',
+         {'country_name': 'Germany'})]
+    assert 'land_cover_dissolved planning took 1.5 ms, execution took 20.0 ms' in caplog.text
+
+
+def test_query_distinct_satellite_names_per_generation():
+    """test that the memoized satellite names are queried again after an import"""
+    class FakeSession:
+        def __init__(self):
+            self.names = ['fake']
+            self.queries = 0
+
+        def query(self, *args):
+            self.queries += 1
+            return SimpleNamespace(distinct=lambda: [SimpleNamespace(name=i) for i in self.names])
+
+    fake_session = FakeSession()
+    query.query_distinct_satellite_names.clear()
+
+    assert query.query_distinct_satellite_names(fake_session, 1) == ['fake']
+    fake_session.names = ['fake2', 'fake']
+    assert query.query_distinct_satellite_names(fake_session, 1) == ['fake']
+    assert query.query_distinct_satellite_names(fake_session, 2) == ['fake', 'fake2']
+    assert fake_session.queries == 2
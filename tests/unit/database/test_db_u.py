@@ -0,0 +1,214 @@
+import pytest
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from database import db
+
+
+def test_get_db_engine_is_shared():
+    """test that every call returns the same pooled engine"""
+    engine = db.get_db_engine()
+
+    assert db.get_db_engine() is engine
+    assert engine.pool.size() == db.DB_POOL_SIZE
+
+
+def test_get_db_session_bound_to_shared_engine():
+    session = db.get_db_session()
+
+    assert session.get_bind() is db.get_db_engine()
+    assert db.get_db_session() is not session
+    session.close()
+
+
+def test_get_scoped_session_is_thread_local():
+    session = db.get_scoped_session()
+
+    assert db.get_scoped_session() is session
+    db.Session.remove()
+
+
+def test_session_scope_rolls_back_on_error():
+    with pytest.raises(ValueError):
+        with db.session_scope() as session:
+            session.add(db.AssetType(id='analytic'))
+            raise ValueError
+
+    assert not session.new
+
+
+def test_upsert_keeps_single_conflict_clause():
+    """test that the ON CONFLICT DO NOTHING compile hook leaves upserts alone"""
+    stmt = postgresql.insert(db.ImportLedger.__table__).values(aoi_hash='a', item_type_id='PSScene')
+    stmt = stmt.on_conflict_do_update(index_elements=['aoi_hash', 'item_type_id'],
+                                      set_={'published': stmt.excluded.published})
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    plain = str(db.insert(db.AssetType.__table__).values(id='analytic').compile(dialect=postgresql.dialect()))
+
+    assert sql.count('ON CONFLICT') == 1
+    assert 'DO UPDATE' in sql
+    assert plain.endswith('ON CONFLICT DO NOTHING')
+
+
+def test_derived_columns_computed_from_geom():
+    """test that lat, lon and area are generated from geom"""
+    ddl = str(CreateTable(db.SatImage.__table__).compile(dialect=postgresql.dialect()))
+
+    assert 'lat FLOAT GENERATED ALWAYS AS (ST_Y(ST_Transform(ST_Centroid(ST_Transform(geom, 3035)), 4326))) STORED' in ddl
+    assert 'lon FLOAT GENERATED ALWAYS AS (ST_X(ST_Transform(ST_Centroid(ST_Transform(geom, 3035)), 4326))) STORED' in ddl
+    assert 'area_sqkm FLOAT GENERATED ALWAYS AS (round(CAST(ST_Area(ST_Transform(geom, 3035)) / 1000000 AS numeric), 3)) STORED' in ddl
+    assert str(db.SatImage.lat > 52.5) == 'sat_images.lat > :lat_1'
+
+
+class FakeSession:
+    def __init__(self, rowcount=1):
+        self.statements = []
+        self.rowcount = rowcount
+
+    def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(rowcount=self.rowcount, scalar=lambda: bool(self.rowcount))
+
+
+def test_link_sat_images():
+    """test that new images are linked to every layer with one INSERT ... SELECT each"""
+    session = FakeSession()
+
+    db.link_sat_images(session, ['ss20221002'])
+
+    assert [i.split(' (')[0] for i in session.statements] == ['INSERT INTO sat_images_countries',
+                                                               'INSERT INTO sat_images_cities',
+                                                               'INSERT INTO sat_images_land_cover']
+    assert all('ON CONFLICT DO NOTHING' in i for i in session.statements)
+
+
+def test_link_sat_images_cities_per_buffer_radius():
+    """test that cities are linked through their stored buffers, once per radius"""
+    session = FakeSession()
+
+    db.link_sat_images(session, ['ss20221002'])
+
+    assert session.statements[1].startswith('INSERT INTO sat_images_cities (sat_image_id, city_id, radius)')
+    assert 'ST_Intersects(city_buffers.geom, sat_images.geom)' in session.statements[1]
+
+
+def test_refresh_city_buffers():
+    """test that a buffer of every city is stored for each radius"""
+    session = FakeSession()
+
+    db.refresh_city_buffers(session, [10000, 30000])
+
+    assert session.statements[0] == 'DELETE FROM city_buffers'
+    assert len(session.statements) == 3
+    assert all(i.startswith('INSERT INTO city_buffers (city_id, radius, geom)') for i in session.statements[1:])
+    assert 'ST_Buffer(ST_Transform(cities.geom' in session.statements[1]
+
+
+def test_link_sat_images_no_images():
+    session = FakeSession()
+
+    db.link_sat_images(session, [])
+
+    assert session.statements == []
+
+
+def test_rebuild_links_refreshes_parts_first():
+    session = FakeSession()
+
+    db.rebuild_links(session)
+
+    assert session.statements[0] == 'DELETE FROM country_parts'
+    assert 'ST_Subdivide(countries.geom' in session.statements[1]
+    assert session.statements[2] == 'DELETE FROM land_cover_parts'
+    assert 'ST_Subdivide(land_cover_classes.geom' in session.statements[3]
+    assert session.statements[4] == 'DELETE FROM city_buffers'
+    assert 'FROM sat_images, country_parts' in session.statements[-9]
+    assert session.statements[-6].startswith('SELECT pg_advisory_xact_lock(')
+    assert session.statements[-5] == 'DELETE FROM footprint_unions'
+    assert session.statements[-3].startswith('SELECT pg_advisory_xact_lock(')
+    assert session.statements[-2] == 'DELETE FROM image_counts'
+
+
+def test_refresh_image_counts_only_touched_cells():
+    """test that only the cells of the new images are recounted, with an upsert"""
+    session = FakeSession()
+
+    db.refresh_image_counts(session, ['ss20221002'])
+
+    assert len(session.statements) == 2
+    assert session.statements[1].startswith('WITH cells AS')
+    assert 'sat_images.id IN' in session.statements[1]
+    assert session.statements[1].endswith('DO UPDATE SET total = excluded.total')
+
+
+def test_refresh_image_counts_serialized():
+    """test that the recount waits for the advisory lock held by other writers until they commit"""
+    session = FakeSession()
+
+    db.refresh_image_counts(session, ['ss20221002'])
+
+    assert session.statements[0].startswith('SELECT pg_advisory_xact_lock(')
+
+
+def test_refresh_footprint_unions_only_touched_cells():
+    """test that only the unions of the days of the new images are recomputed, with an upsert"""
+    session = FakeSession()
+
+    db.refresh_footprint_unions(session, ['ss20221002'])
+
+    assert len(session.statements) == 2
+    assert session.statements[0].startswith('SELECT pg_advisory_xact_lock(')
+    assert session.statements[1].startswith('WITH cells AS')
+    assert 'ST_Multi(ST_Union(sat_images.geom))' in session.statements[1]
+    assert session.statements[1].endswith('DO UPDATE SET geom = excluded.geom')
+
+
+def test_refresh_footprint_unions_no_images():
+    session = FakeSession()
+
+    db.refresh_footprint_unions(session, [])
+
+    assert session.statements == []
+
+
+def test_materialize_filtered_images():
+    """test that a new filter set expires old sets and stores its images with one INSERT ... SELECT"""
+    session = FakeSession()
+
+    created = db.materialize_filtered_images(session, 'key', ['Planetscope'], 0.5,
+                                             date(2022, 9, 1), date(2022, 10, 1), 'Germany')
+
+    assert created
+    assert [i.split(' (')[0] for i in session.statements] == ['INSERT INTO filter_sets',
+                                                               'DELETE FROM filter_sets WHERE filter_sets.created < now() - %(now_1)s',
+                                                               'INSERT INTO filtered_images']
+    assert 'JOIN sat_images_countries' in session.statements[-1]
+
+
+def test_materialize_filtered_images_existing_set():
+    """test that the images of an existing filter set are not evaluated again, its created time is touched"""
+    session = FakeSession(rowcount=0)
+
+    created = db.materialize_filtered_images(session, 'key', ['Planetscope'], 0.5,
+                                             date(2022, 9, 1), date(2022, 10, 1), 'Germany')
+
+    assert not created
+    assert len(session.statements) == 1
+    assert session.statements[0].endswith(
+        'ON CONFLICT (key) DO UPDATE SET created = excluded.created RETURNING xmax = %(xmax_1)s AS anon_1')
+
+
+def test_bump_data_generation():
+    """test that the generation is moved forward with an upsert and the filter sets are dropped"""
+    session = FakeSession()
+
+    db.bump_data_generation(session)
+
+    assert session.statements[0].startswith('INSERT INTO data_generation')
+    assert 'ON CONFLICT (id) DO UPDATE SET generation = (data_generation.generation + %(generation_1)s)' \
+        in session.statements[0]
+    assert session.statements[1] == 'DELETE FROM filter_sets'
@@ -0,0 +1,112 @@
+from datetime import date
+
+from database import partitions
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, partitions=()):
+        self.partitions = list(partitions)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = ' '.join(str(statement).split())
+        if sql.startswith('SELECT child.relname'):
+            return FakeResult(self.partitions + [partitions.DEFAULT_PARTITION])
+        self.statements.append((sql, params))
+        if sql.startswith('CREATE TABLE') and 'PARTITION OF sat_images' in sql:
+            self.partitions.append(sql.split()[2])
+
+
+def test_partition_name():
+    assert partitions.partition_name(date(2022, 3, 17)) == 'sat_images_y2022m03'
+
+
+def test_month_start():
+    assert partitions.month_start(date(2022, 11, 17)) == date(2022, 11, 1)
+    assert partitions.month_start(date(2022, 11, 17), 2) == date(2023, 1, 1)
+    assert partitions.month_start(date(2022, 1, 17), -1) == date(2021, 12, 1)
+
+
+def test_list_partitions():
+    session = FakeSession(['sat_images_y2022m10', 'sat_images_y2022m09'])
+
+    assert partitions.list_partitions(session) == [('sat_images_y2022m09', date(2022, 9, 1)),
+                                                   ('sat_images_y2022m10', date(2022, 10, 1))]
+
+
+def test_stored_columns():
+    """test that the columns generated from geom are not copied between partitions"""
+    columns = partitions.stored_columns()
+
+    assert 'geom' in columns
+    assert 'time_acquired' in columns
+    assert not {'lat', 'lon', 'area_sqkm'} & set(columns)
+
+
+def test_create_partition():
+    """test that rows of the month are moved out of the default partition before it is created"""
+    session = FakeSession()
+
+    assert partitions.create_partition(session, date(2022, 12, 5))
+
+    copy, delete, create, insert, drop = session.statements
+    assert copy[0].startswith('CREATE TEMP TABLE sat_images_y2022m12_moved AS')
+    assert 'FROM sat_images_default' in copy[0]
+    assert delete[0].startswith('DELETE FROM sat_images_default')
+    assert copy[1] == delete[1] == {'start': date(2022, 12, 1), 'end': date(2023, 1, 1)}
+    assert create[0] == "CREATE TABLE sat_images_y2022m12 PARTITION OF sat_images " \
+        "FOR VALUES FROM ('2022-12-01') TO ('2023-01-01')"
+    columns = ', '.join(partitions.stored_columns())
+    assert insert[0] == f'INSERT INTO sat_images_y2022m12 ({columns}) ' \
+        f'SELECT {columns} FROM sat_images_y2022m12_moved'
+    assert drop[0] == 'DROP TABLE sat_images_y2022m12_moved'
+
+
+def test_create_partitions_skips_existing():
+    session = FakeSession(['sat_images_y2022m11'])
+
+    created = partitions.create_partitions(session, date(2022, 10, 20), 3)
+
+    assert created == ['sat_images_y2022m10', 'sat_images_y2022m12']
+
+
+def test_detach_partitions():
+    """test that only months ending before the date are detached with their links and derived cells"""
+    session = FakeSession(['sat_images_y2022m09', 'sat_images_y2022m10'])
+
+    detached = partitions.detach_partitions(session, date(2022, 10, 1))
+
+    assert detached == ['sat_images_y2022m09']
+    statements = [i[0] for i in session.statements]
+    assert statements[0].startswith('SELECT pg_advisory_xact_lock(')
+    assert statements[1] == 'ALTER TABLE sat_images DETACH PARTITION sat_images_y2022m09'
+    assert [i.split()[2] for i in statements[2:7]] == ['sat_images_countries',
+                                                       'sat_images_cities',
+                                                       'sat_images_land_cover',
+                                                       'image_counts',
+                                                       'footprint_unions']
+    assert 'WHERE image_counts.day >= ' in statements[5]
+    assert statements[7].startswith('INSERT INTO data_generation')
+    assert statements[8].startswith('DELETE FROM filter_sets')
+
+
+def test_detach_partitions_nothing_to_detach():
+    session = FakeSession(['sat_images_y2022m10'])
+
+    assert partitions.detach_partitions(session, date(2022, 10, 1)) == []
+    assert session.statements == []
+
+
+def test_arguments():
+    args = partitions.arguments(['--create_months', '2', '--detach_before', '2022-01-01'])
+
+    assert args.create_months == 2
+    assert args.detach_before == '2022-01-01'
@@ -42,6 +42,58 @@ def fake_args(arg_input):
         required=False,
         default=1.0)
 
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        required=False,
+        default=500)
+
+    parser.add_argument(
+        "--time_shards",
+        type=int,
+        required=False,
+        default=1)
+
+    parser.add_argument(
+        "--tiles",
+        type=int,
+        required=False,
+        default=1)
+
+    parser.add_argument(
+        "--max_tile_depth",
+        type=int,
+        required=False,
+        default=0)
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=4)
+
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        required=False,
+        default=2)
+
+    parser.add_argument(
+        "--write_workers",
+        type=int,
+        required=False,
+        default=2)
+
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        required=False,
+        default=1000)
+
+    parser.add_argument(
+        "--full_scan",
+        action='store_true')
+
     return parser.parse_args(arg_input)
 
 
@@ -62,6 +114,15 @@ def test_arguments(arg_input):
     assert result.start_date == yesterday.strftime("%Y-%m-%d")
     assert result.end_date == datetime.utcnow().strftime("%Y-%m-%d")
     assert result.cc == 1.0
+    assert result.batch_size == 500
+    assert result.time_shards == 1
+    assert result.tiles == 1
+    assert result.max_tile_depth == 0
+    assert result.workers == 4
+    assert result.parse_workers == 2
+    assert result.write_workers == 2
+    assert result.queue_size == 1000
+    assert result.full_scan is False
 
 
 def test_args_validate_wrong_date(fake_args):
@@ -76,6 +137,27 @@ def test_args_validate_wrong_date(fake_args):
         assert True
 
 
+def test_args_validate_negative_batch_size(fake_args):
+    fake_args.batch_size = -1
+
+    with pytest.raises(ValueError):
+        args_validate(fake_args)
+
+
+def test_args_validate_no_workers(fake_args):
+    fake_args.workers = 0
+
+    with pytest.raises(ValueError):
+        args_validate(fake_args)
+
+
+def test_args_validate_no_write_workers(fake_args):
+    fake_args.write_workers = 0
+
+    with pytest.raises(ValueError):
+        args_validate(fake_args)
+
+
 def test_args_validate_success(fake_args):
     """
     Check if args_validate lets through valid dates and aoi.
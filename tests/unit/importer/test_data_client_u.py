@@ -5,9 +5,15 @@ import pandas as pd
 import vcr
 import os
 import logging
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
 import requests
 
-from api_importer.clients.data import ImageDataFeature, DataAPIClient
+from api_importer.clients import data
+from api_importer.clients.data import ImageDataFeature, DataAPIClient, _dedupe, \
+    _time_windows, _run_concurrently, _split_geometry, _group_by_watermark, \
+    _watermark_windows, Watermark
 
 TEST_URL = "https://api.planet.com/data/v1"
 SEARCH_ENDPOINT = "quick-search"
@@ -172,6 +178,216 @@ def test__query_paginate_vcr(fake_payload, fake_response_small_aoi, caplog):
         assert 'Paging results...' in caplog.text
 
 
+def test_iter_pages_streams_pages(fake_payload):
+    """test that the next page is only requested once the previous page is consumed"""
+    pages = [{'features': [{'id': 1}], '_links': {'_next': 'page2'}},
+             {'features': [{'id': 2}], '_links': {'_next': None}}]
+    requested = []
+
+    class FakeClient(DataAPIClient):
+        def _post(self, url, json_data):
+            requested.append(url)
+            return pages[0]
+
+        def _get(self, url, **params):
+            requested.append(url)
+            return pages[1]
+
+    client = FakeClient(api_key=API_KEY)
+    page_iter = client.iter_pages(endpoint=SEARCH_ENDPOINT, json_query=fake_payload)
+
+    assert next(page_iter) == pages[0]
+    assert requested == [SEARCH_URL]
+    assert list(page_iter) == [pages[1]]
+    assert requested == [SEARCH_URL, 'page2']
+
+
+def test__dedupe():
+    features = [{'id': 'a'}, {'id': 'b'}, {'id': 'a'}, {'id': 'c'}, {'id': 'b'}]
+
+    assert [f['id'] for f in _dedupe(features)] == ['a', 'b', 'c']
+
+
+def test__dedupe_window():
+    """test that only the last window ids are remembered"""
+    features = [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}, {'id': 'a'}, {'id': 'c'}]
+
+    assert [f['id'] for f in _dedupe(features, window=2)] == ['a', 'b', 'c', 'a']
+
+
+def test__time_windows():
+    windows = _time_windows('2022-01-01', '2022-01-11', 3)
+
+    assert windows == [('2022-01-01', '2022-01-04'),
+                       ('2022-01-04', '2022-01-08'),
+                       ('2022-01-08', '2022-01-11')]
+
+
+def test__time_windows_more_shards_than_days():
+    assert _time_windows('2022-01-01', '2022-01-03', 10) == [('2022-01-01', '2022-01-02'),
+                                                             ('2022-01-02', '2022-01-03')]
+    assert _time_windows('2022-01-01', '2022-01-01', 4) == [('2022-01-01', '2022-01-01')]
+
+
+def test__run_concurrently():
+    items = list(_run_concurrently(lambda task, submit: range(task), [3, 2, 1], workers=2))
+
+    assert sorted(items) == [0, 0, 0, 1, 1, 2]
+
+
+def test__run_concurrently_submit():
+    """test that submitted follow-up tasks are run before the workers stop"""
+    def func(task, submit):
+        if task > 1:
+            submit(task - 1)
+        yield task
+
+    assert sorted(_run_concurrently(func, [3], workers=2)) == [1, 2, 3]
+
+
+def test__run_concurrently_raises():
+    def func(task, submit):
+        if task == 2:
+            raise ValueError
+        yield task
+
+    with pytest.raises(ValueError):
+        list(_run_concurrently(func, [1, 2, 3], workers=2))
+
+
+def test_iter_features_time_shards(geometry):
+    """test that every time window is searched and duplicates across windows are dropped"""
+    searched = []
+
+    class FakeClient(DataAPIClient):
+        def _post(self, url, json_data):
+            window = json_data['filter']['config'][0]['config']
+            searched.append((window['gte'][:10], window['lte'][:10]))
+            return {'features': [{'id': window['gte']}, {'id': 'border'}],
+                    '_links': {'_next': None}}
+
+    client = FakeClient(api_key=API_KEY)
+    features = list(client.iter_features(start_date='2022-01-01',
+                                         end_date='2022-01-05',
+                                         cc=1.0,
+                                         geometry=geometry,
+                                         time_shards=2,
+                                         workers=2))
+
+    assert sorted(searched) == [('2022-01-01', '2022-01-03'), ('2022-01-03', '2022-01-05')]
+    assert sorted(f['id'] for f in features) == ['2022-01-01T00:00:00.000Z',
+                                                 '2022-01-03T00:00:00.000Z',
+                                                 'border']
+
+
+def test__group_by_watermark():
+    watermark = Watermark('2022-01-01', '2022-01-03', '2022-10-01T00:00:00.000000Z')
+    groups = _group_by_watermark(['PSScene', 'SkySatScene', 'Sentinel2L1C'],
+                                 {'PSScene': watermark,
+                                  'Sentinel2L1C': watermark})
+
+    assert groups == [(watermark, ['PSScene', 'Sentinel2L1C']),
+                      (None, ['SkySatScene'])]
+
+
+def test__watermark_windows():
+    """test that only the time interval covered by the watermark is searched from it"""
+    published = '2022-01-04T00:00:00.000000Z'
+
+    assert _watermark_windows('2022-01-01', '2022-01-05', None) == [('2022-01-01', '2022-01-05', None)]
+    assert _watermark_windows('2022-01-02', '2022-01-05',
+                              Watermark('2022-01-03', '2022-01-04', published)) == \
+        [('2022-01-02', '2022-01-03', None),
+         ('2022-01-03', '2022-01-04', published),
+         ('2022-01-04', '2022-01-05', None)]
+    assert _watermark_windows('2022-01-02', '2022-01-05',
+                              Watermark('2022-01-02', '2022-01-05', published)) == \
+        [('2022-01-02', '2022-01-05', published)]
+    # a shared border day is no covered time interval
+    assert _watermark_windows('2022-01-02', '2022-01-05',
+                              Watermark('2022-01-02', '2022-01-02', published)) == \
+        [('2022-01-02', '2022-01-05', None)]
+
+
+def test_iter_aoi_features_published_after(geometry):
+    """test that item types with a watermark only search items published since then in its time interval"""
+    searched = []
+
+    class FakeClient(DataAPIClient):
+        def _post(self, url, json_data):
+            filters = json_data['filter']['config']
+            acquired = [f['config'] for f in filters if f['field_name'] == 'acquired'][0]
+            published = [f['config']['gte'] for f in filters if f['field_name'] == 'published']
+            searched.append((json_data['item_types'], acquired['gte'][:10], acquired['lte'][:10],
+                             published))
+            return {'features': [], '_links': {'_next': None}}
+
+    client = FakeClient(api_key=API_KEY)
+    list(client.iter_aoi_features(aois={'a': geometry, 'b': geometry},
+                                  start_date='2022-01-01',
+                                  end_date='2022-01-05',
+                                  cc=1.0,
+                                  item_types=['PSScene', 'SkySatScene'],
+                                  published_after={'a': {'PSScene': Watermark(
+                                      '2022-01-01', '2022-01-03', '2022-01-03T00:00:00.000000Z')}}))
+
+    assert sorted(searched) == [(['PSScene'], '2022-01-01', '2022-01-03', ['2022-01-03T00:00:00.000000Z']),
+                                (['PSScene'], '2022-01-03', '2022-01-05', []),
+                                (['PSScene', 'SkySatScene'], '2022-01-01', '2022-01-05', []),
+                                (['SkySatScene'], '2022-01-01', '2022-01-05', [])]
+
+
+def test__split_geometry(geometry):
+    tiles = _split_geometry(geometry, 3)
+
+    assert len(tiles) <= 9
+    assert sum(shape(t).area for t in tiles) == pytest.approx(shape(geometry).area)
+    assert _split_geometry(geometry, 1) == [geometry]
+
+
+def test_iter_features_splits_dense_tiles(geometry):
+    """test that a tile with more than one page is searched as quadrants instead"""
+    searched = []
+
+    class FakeClient(DataAPIClient):
+        def _post(self, url, json_data):
+            tile = json_data['filter']['config'][2]['config']
+            searched.append(tile)
+            dense = len(searched) == 1
+            return {'features': [{'id': str(shape(tile).bounds)}, {'id': 'border'}],
+                    '_links': {'_next': 'next' if dense else None}}
+
+    client = FakeClient(api_key=API_KEY)
+    features = list(client.iter_features(start_date='2022-01-01',
+                                         end_date='2022-01-02',
+                                         cc=1.0,
+                                         geometry=geometry,
+                                         max_tile_depth=1,
+                                         workers=2))
+
+    assert len(searched) == 5
+    assert len(features) == 5
+    assert sum(shape(t).area for t in searched[1:]) == pytest.approx(shape(geometry).area)
+
+
+def test_iter_aoi_features_dedupes_across_aois(geometry):
+    """test that every AOI is searched and an image found for both AOIs is yielded once"""
+    class FakeClient(DataAPIClient):
+        def _post(self, url, json_data):
+            return {'features': [{'id': 'shared'}, {'id': str(len(json_data['item_types']))}],
+                    '_links': {'_next': None}}
+
+    client = FakeClient(api_key=API_KEY)
+    features = list(client.iter_aoi_features(aois={'a': geometry, 'b': geometry},
+                                             start_date='2022-01-01',
+                                             end_date='2022-01-02',
+                                             cc=1.0,
+                                             item_types=['PSScene']))
+
+    assert sorted(f['id'] for _, f in features) == ['1', 'shared']
+    assert set(aoi for aoi, _ in features) <= {'a', 'b'}
+
+
 @vcr.use_cassette('tests/resources/fixtures/test_get_items_vcr.yaml')
 def test_get_items_vcr(fake_item_types_with_deprecated):
     """test if all item types are retrieved from data_api"""
@@ -225,3 +441,63 @@ def test_ImageDataFeature(fake_response_list):
     assert fake_asset_list == [list(i["assets"]) for i in fake_response_list]
     assert fake_cloud_list == [float(i["properties"]["cloud_cover"]) for i in fake_response_list]
     assert fake_geom_list == [shape(i["geometry"]) for i in fake_response_list]
+
+
+def test_ImageDataFeature_from_features(fake_response_list):
+    """test that batch parsing gives the same features as parsing them one by one"""
+    features = ImageDataFeature.from_features(fake_response_list)
+
+    assert [f.to_dict() for f in features] == [ImageDataFeature(f).to_dict() for f in fake_response_list]
+
+
+def test_ImageDataFeature_keeps_only_persisted_fields(fake_response_list):
+    feature = ImageDataFeature(fake_response_list[0])
+
+    assert not hasattr(feature, '__dict__')
+    assert not hasattr(feature, 'properties')
+    assert 'client' not in feature.to_dict()
+
+
+def test_ImageDataFeature_shares_client(fake_response_list):
+    """test that features reference the client that found them and never create one"""
+    client = DataAPIClient(api_key=API_KEY, pool_maxsize=8)
+
+    features = ImageDataFeature.from_features(fake_response_list, client=client)
+
+    assert all(f.client is client for f in features)
+    assert ImageDataFeature(fake_response_list[0]).client is None
+    assert client.session.get_adapter('https://api.planet.com')._pool_maxsize == 8
+
+
+def test_to_postgis_bulk_sorts_rows(monkeypatch, geometry):
+    """test that satellites and item types are inserted ordered by id, whatever the feature order"""
+    inserts = []
+
+    @contextmanager
+    def session_scope():
+        yield None
+
+    fake_db = SimpleNamespace(
+        session_scope=session_scope,
+        bulk_insert=lambda session, table, rows: inserts.append((table, rows)),
+        link_sat_images=lambda session, ids: None,
+        refresh_footprint_unions=lambda session, ids: None,
+        refresh_image_counts=lambda session, ids: None,
+        Satellite=SimpleNamespace(__table__='satellites'),
+        ItemType=SimpleNamespace(__table__='item_types'),
+        AssetType=SimpleNamespace(__table__='asset_types'),
+        items_assets='items_assets',
+        SatImage=SimpleNamespace(__table__='sat_images'))
+    monkeypatch.setattr(data, 'db', fake_db)
+
+    features = [SimpleNamespace(id=id, sat_id=sat_id, satellite=sat_id, pixel_res=3.0,
+                                item_type_id=item_type_id, asset_types=['basic_udm2'],
+                                geom=shape(geometry), clear_confidence_percent=95,
+                                cloud_cover=0.1, time_acquired=datetime(2022, 10, 1))
+                for id, sat_id, item_type_id in [('b', 's2', 'SkySatScene'),
+                                                 ('a', 's1', 'PSScene')]]
+    data.to_postgis_bulk(features)
+
+    rows = dict(inserts)
+    assert [i['id'] for i in rows['satellites']] == ['s1', 's2']
+    assert [i['id'] for i in rows['item_types']] == ['PSScene', 'SkySatScene']
@@ -49,6 +49,7 @@ def test_get_countries_vcr(fake_countries):
     country = country_list[0]
 
     assert len(country_list) == 241
+    assert all(c.client is client for c in country_list)
     assert country.iso == str(fake_countries[0]['adm0_a3'])
     assert country.name == str(fake_countries[0]['name'])
     assert country.geom == shape(fake_countries[0]['geometry'])
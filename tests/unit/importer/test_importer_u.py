@@ -1,7 +1,14 @@
 import pytest
 import json
+from contextlib import nullcontext
+from datetime import date
+from types import SimpleNamespace
+import pandas as pd
 
-from importer import geojson_import
+import importer
+from importer import geojson_import, aoi_import, _track_aois, aoi_hash, _naive_utc, \
+    load_watermarks, save_watermarks
+from api_importer.clients.data import Watermark
 
 
 @pytest.fixture
@@ -16,3 +23,118 @@ def test_geojson_import(geometry):
     geometry = geojson_import(aoi_file='tests/resources/berlin.geojson')
     # assert
     assert geometry == geometry
+
+
+def test_aoi_import(tmp_path, geometry):
+    """test that every feature of the file is read as an AOI"""
+    aoi_file = tmp_path / 'aois.geojson'
+    aoi_file.write_text(json.dumps({
+        'type': 'FeatureCollection',
+        'features': [{'type': 'Feature', 'properties': {'name': 'berlin'}, 'geometry': geometry},
+                     {'type': 'Feature', 'properties': {}, 'geometry': geometry},
+                     {'type': 'Feature', 'properties': {'name': 'berlin'}, 'geometry': geometry}]}))
+
+    aois = aoi_import(aoi_file=str(aoi_file))
+
+    assert list(aois) == ['berlin', '1', 'berlin_2']
+    assert all(i == geometry for i in aois.values())
+
+
+def fake_feature(acquired, published, item_type_id='PSScene'):
+    return SimpleNamespace(item_type_id=item_type_id,
+                           time_acquired=pd.Timestamp(acquired),
+                           published=pd.Timestamp(published))
+
+
+def test__track_aois():
+    stats = {'a': {'images': 0, 'seconds': 0.0, 'watermarks': {}},
+             'b': {'images': 0, 'seconds': 0.0, 'watermarks': {}}}
+    one = fake_feature('2022-01-02', '2022-01-03')
+    two = fake_feature('2022-01-01', '2022-01-01')
+    three = fake_feature('2022-01-01', '2022-01-04')
+
+    features = list(_track_aois([('a', one), ('b', two), ('a', three)], stats, start=0))
+
+    assert features == [one, two, three]
+    assert stats['a']['images'] == 2
+    assert stats['b']['images'] == 1
+    assert stats['a']['seconds'] > 0
+    assert stats['a']['watermarks'] == {'PSScene': [pd.Timestamp('2022-01-02'), pd.Timestamp('2022-01-04')]}
+
+
+def test_save_watermarks_keyed_by_search(monkeypatch, geometry):
+    """test that the watermarks are stored for the time interval and cloud cover of the run"""
+    saved = []
+    monkeypatch.setattr(importer.db, 'session_scope', lambda: nullcontext('session'))
+    monkeypatch.setattr(importer.db, 'upsert_import_ledger', lambda session, rows: saved.extend(rows))
+    stats = {'a': {'images': 1, 'seconds': 1.0,
+                   'watermarks': {'PSScene': [pd.Timestamp('2022-01-02'), pd.Timestamp('2022-01-04')]}}}
+
+    save_watermarks({'a': geometry}, stats, date(2022, 1, 1), date(2022, 1, 2), 0.5)
+
+    assert [(i['item_type_id'], i['start_date'], i['end_date'], i['cc']) for i in saved] == \
+        [('PSScene', date(2022, 1, 1), date(2022, 1, 2), 0.5)]
+    assert saved[0]['aoi_hash'] == aoi_hash(geometry)
+
+
+def test_load_watermarks_clipped_to_search(monkeypatch, geometry):
+    """test that a watermark only covers the overlap of its time interval with the search"""
+    ledger = [SimpleNamespace(aoi_hash=aoi_hash(geometry), item_type_id='PSScene',
+                              start_date=date(2022, 1, 1), end_date=date(2022, 1, 3),
+                              published=pd.Timestamp('2022-01-04T12:00:00').to_pydatetime())]
+
+    class FakeQuery:
+        def filter(self, *args):
+            return self
+
+        def all(self):
+            return ledger
+
+    monkeypatch.setattr(importer.db, 'session_scope',
+                        lambda: nullcontext(SimpleNamespace(query=lambda *args: FakeQuery())))
+
+    watermarks = load_watermarks({'a': geometry}, date(2022, 1, 2), date(2022, 1, 5), 0.5)
+
+    assert watermarks == {'a': {'PSScene': Watermark('2022-01-02', '2022-01-03',
+                                                     '2022-01-04T12:00:00.000000Z')}}
+
+
+def test_aoi_hash(geometry):
+    """test that the hash identifies the geometry, not its key order"""
+    reordered = dict(reversed(list(geometry.items())))
+
+    assert aoi_hash(reordered) == aoi_hash(geometry)
+    assert len(aoi_hash(geometry)) == 64
+
+
+def test__naive_utc():
+    timestamp = _naive_utc(pd.Timestamp('2022-01-01T12:00:00+02:00'))
+
+    assert timestamp.tzinfo is None
+    assert timestamp.hour == 10
+
+
+def test_data_api_importer_no_images_keeps_generation(monkeypatch, geometry):
+    """test that an import without new images leaves the cached app results valid"""
+    bumped = []
+
+    class FakeClient:
+        def __init__(self, **kwargs):
+            pass
+
+        def iter_aoi_features(self, **kwargs):
+            return iter([])
+
+    monkeypatch.setattr(importer.data, 'DataAPIClient', FakeClient)
+    monkeypatch.setattr(importer, 'aoi_import', lambda aoi_file: {'a': geometry})
+    monkeypatch.setattr(importer, 'save_watermarks', lambda *args: None)
+    monkeypatch.setattr(importer.db, 'session_scope', lambda: nullcontext('session'))
+    monkeypatch.setattr(importer.db, 'bump_data_generation', lambda session: bumped.append(session))
+    args = SimpleNamespace(api_key='key', workers=1, aoi_file='aois.geojson',
+                           start_date='2022-01-01', end_date='2022-01-02', cc=0.5,
+                           full_scan=True, time_shards=1, tiles=1, max_tile_depth=0,
+                           batch_size=1, parse_workers=1, write_workers=1, queue_size=1)
+
+    importer.data_api_importer(args)
+
+    assert bumped == []
@@ -0,0 +1,68 @@
+import pytest
+import threading
+import time
+
+from api_importer.pipeline import Pipeline, PipelineError
+
+
+def test_pipeline():
+    results = Pipeline(range(10))\
+        .add_stage('double', lambda i: i * 2, workers=3)\
+        .add_stage('sum', sum, workers=2, batch_size=4)
+
+    assert sum(results) == sum(i * 2 for i in range(10))
+
+
+def test_pipeline_batches():
+    batches = list(Pipeline(range(7)).add_stage('batch', list, batch_size=3))
+
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_pipeline_backpressure():
+    """test that a slow stage keeps the source from running ahead"""
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    slow = threading.Event()
+
+    def write(i):
+        slow.wait(1)
+        return i
+
+    results = iter(Pipeline(source(), maxsize=2).add_stage('write', write, maxsize=1))
+    next(results)
+    slow.set()
+    time.sleep(0.2)
+
+    assert len(produced) < 100
+    results.close()
+
+
+@pytest.mark.parametrize('failing', ['fetch', 'parse', 'write'])
+def test_pipeline_raises_failing_stage(failing):
+    def fail_in(stage):
+        def func(item):
+            if stage == failing:
+                raise ValueError(stage)
+            return item
+        return func
+
+    def source():
+        yield 1
+        if failing == 'fetch':
+            raise ValueError('fetch')
+
+    results = Pipeline(source(), name='fetch')\
+        .add_stage('parse', fail_in('parse'), workers=2)\
+        .add_stage('write', fail_in('write'), batch_size=2)
+
+    with pytest.raises(PipelineError) as error:
+        list(results)
+
+    assert error.value.stage == failing
+    assert isinstance(error.value.error, ValueError)